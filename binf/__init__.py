@@ -30,12 +30,48 @@ class AbstractBinfNamedCallable(object):
         self._differentiable_variables = set()
         self._var_param_types = {}
         self._original_variables = set()
+        self._call_plan = None
 
     def _set_original_variables(self):
         """
         Stores the original set of named variables this object takes
         """
         self._original_variables.update(self.variables)
+        self._invalidate_call_plan()
+
+    def _invalidate_call_plan(self):
+        """
+        Discards the precompiled call plan. It is rebuilt lazily the
+        next time this object is called.
+        """
+        self._call_plan = None
+
+    def _build_call_plan(self):
+        """
+        Resolves the parameter objects holding the values of fixed
+        variables once, so that completing the variables passed to this
+        object does not require scanning all parameters on every call
+
+        Like _complete_variables, this only works for classes which can
+        hold parameters (that is, PDFs and models)
+
+        :returns: fixed variable name / parameter object pairs
+        :rtype: tuple
+        """
+        return tuple((p, self[p]) for p in self.parameters
+                     if p in self._original_variables)
+
+    def _get_call_plan(self):
+        """
+        Returns the precompiled call plan, building it if necessary
+
+        :returns: fixed variable name / parameter object pairs
+        :rtype: tuple
+        """
+        if self._call_plan is None:
+            self._call_plan = self._build_call_plan()
+
+        return self._call_plan
 
     def _register_variable(self, name, differentiable=False):
         """
@@ -59,6 +95,7 @@ class AbstractBinfNamedCallable(object):
             self._variables.add(name)
             if differentiable:
                 self._differentiable_variables.add(name)
+            self._invalidate_call_plan()
   
     def _delete_variable(self, name):
         """
@@ -71,6 +108,7 @@ class AbstractBinfNamedCallable(object):
             self._variables.remove(name)
             if name in self.differentiable_variables:
                 self._differentiable_variables.remove(name)
+            self._invalidate_call_plan()
         else:
             raise ValueError('\"' + name + '\": unknown variable name')
 
@@ -186,6 +224,53 @@ class AbstractBinfNamedCallable(object):
         """
         pass
     
+    def _get_batch_size(self, variables):
+        """
+        Returns the length of the leading ('batch') axis shared by
+        batched variable values
+
+        :param variables: batched variable name / value pairs
+        :type variables: dict
+
+        :returns: number of states in the batch
+        :rtype: int
+        """
+        sizes = set(len(value) for value in variables.values())
+        if len(sizes) != 1:
+            msg = 'Batched variables must be given and have a common ' + \
+                  'leading axis, got lengths {}'.format(sorted(sizes))
+            raise ValueError(msg)
+
+        return sizes.pop()
+
+    def _complete_variables_batch(self, variables, n):
+        """
+        Like _complete_variables, but adds values of fixed variables
+        broadcast (without copying) along a leading batch axis of length n
+        """
+        for name, param in self._get_call_plan():
+            value = numpy.asarray(param.value)
+            variables[name] = numpy.broadcast_to(value, (n,) + value.shape)
+
+    def _loop_batch(self, evaluate, variables):
+        """
+        Fallback for components without a vectorized implementation:
+        evaluates a function for each state of a batch separately
+
+        :param evaluate: function taking variables as keyword arguments
+        :type evaluate: callable
+
+        :param variables: batched variable name / value pairs
+        :type variables: dict
+
+        :returns: results stacked along a leading batch axis
+        :rtype: :class:`numpy.ndarray`
+        """
+        n = self._get_batch_size(variables)
+
+        return numpy.array([evaluate(**{k: v[i] for k, v in variables.items()})
+                            for i in range(n)])
+
     def _get_variables_intersection(self, test_variables):
         """
         Returns the intersection of the variables stored in the argument
@@ -224,6 +309,7 @@ class AbstractBinfNamedCallable(object):
             else:
                 msg = '{} is not a variable of {}'.format(self.__repr__(), v)
                 raise ValueError(msg)
+        self._invalidate_call_plan()
 
 
     # @abstractmethod
@@ -25,10 +25,47 @@ class ForwardModel(AbstractForwardModel):
 
         return self.polynomial(self.xses, coefficients)
 
+    def _evaluate_batch(self, coefficients):
+
+        return self.polynomial(self.xses, coefficients.T)
+
     def _evaluate_jacobi_matrix(self, coefficients):
 
         return np.vstack([self.xses ** i for i in range(len(coefficients))])
 
+    def _evaluate_vjp(self, cotangent, coefficients):
+
+        result = np.empty(len(coefficients))
+        powers = np.ones_like(self.xses)
+        for i in range(len(coefficients)):
+            result[i] = powers.dot(cotangent)
+            powers = powers * self.xses
+
+        return result
+
+    def _evaluate_vjp_batch(self, cotangents, coefficients):
+
+        powers = np.vstack([self.xses ** i for i in range(coefficients.shape[1])])
+
+        return cotangents.dot(powers.T)
+
+    def _evaluate_jvp(self, tangent, coefficients):
+
+        result = np.zeros_like(self.xses)
+        powers = np.ones_like(self.xses)
+        for i in range(len(coefficients)):
+            result += tangent[i] * powers
+            powers = powers * self.xses
+
+        return result
+
+    def _evaluate_jacobi_matrix_batch(self, coefficients):
+
+        jacobi_matrix = self._evaluate_jacobi_matrix(coefficients[0])
+
+        return np.broadcast_to(jacobi_matrix,
+                               (len(coefficients),) + jacobi_matrix.shape)
+
     def clone(self):
 
         copy = self.__class__(self.xses, self.polynomial)
@@ -56,10 +93,21 @@ class GaussianErrorModel(AbstractErrorModel):
         logZ = len(self.ys) * 0.5 * np.log(precision)
         return -0.5 * np.sum((mock_data - self.ys) ** 2) * precision + logZ
 
+    def _evaluate_log_prob_batch(self, mock_data, precision):
+
+        logZ = len(self.ys) * 0.5 * np.log(precision)
+        chi2 = np.sum((mock_data - self.ys) ** 2, 1)
+
+        return -0.5 * chi2 * precision + logZ
+
     def _evaluate_gradient(self, mock_data, precision):
 
         return (mock_data - self.ys) * precision
 
+    def _evaluate_gradient_batch(self, mock_data, precision):
+
+        return (mock_data - self.ys) * precision[:, None]
+
     def clone(self):
 
         copy = self.__class__(self.ys)
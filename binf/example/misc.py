@@ -1,25 +1,38 @@
 import numpy as np
+
+def get_samples(samples, name):
+    """
+    Returns the sampled values of a variable, with the sample index as
+    first axis, from a :class:`.Trace`, a :class:`.TraceReader` or a
+    list of states
+    """
+    from binf.samplers import Trace, TraceReader
+
+    if isinstance(samples, (Trace, TraceReader)):
+        return samples[name]
+
+    return np.array([s.variables[name] for s in samples])
     
 def predict(x, y, samples, polynomial):
 
     from csb.numeric import log_sum_exp
+    from binf.example.likelihood import make_likelihood
 
-    if True:
-        f = lambda coefficients, precision, x=x, y=y: -0.5 * (polynomial(x, coefficients) - y) ** 2 * precision + 0.5 * np.log(precision) - 0.5 * np.log(2.0 * np.pi)
-        integrands = np.array([f(**x.variables) for x in samples])
-    else:
-        from binf.example.likelihood import make_likelihood
-        
-        Lnew = make_likelihood(np.array([x]), np.array([y]), polynomial)
-        integrands = np.array([Lnew.log_prob(**x.variables) for x in samples])
+    Lnew = make_likelihood(np.array([x]), np.array([y]), polynomial)
+    coefficients = get_samples(samples, 'coefficients')
+    precisions = get_samples(samples, 'precision')
+    integrands = Lnew.log_prob_batch(coefficients=coefficients,
+                                     precision=precisions)
+    integrands -= 0.5 * np.log(2.0 * np.pi)
 
     return np.exp(log_sum_exp(integrands)) / len(samples)
 
 def get_MAP(samples, log_probs):
 
-    map_sample = samples[np.argmax(log_probs)]
+    i = np.argmax(log_probs)
 
-    return map_sample.variables['coefficients'], map_sample.variables['precision']
+    return (get_samples(samples, 'coefficients')[i],
+            get_samples(samples, 'precision')[i])
 
 def make_posterior(xses, ys, polynomial):
 
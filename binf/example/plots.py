@@ -39,8 +39,10 @@ def plot_fit(xses, ys, polynomial, predict_space, log_probs, samples,
     
 def plot_hists(samples, real_coeffs, real_precision, n_bins, fig):
 
-    coeffs = np.array([x.variables['coefficients'] for x in samples])
-    precisions = np.array([x.variables['precision'] for x in samples])
+    from binf.example.misc import get_samples
+
+    coeffs = get_samples(samples, 'coefficients')
+    precisions = get_samples(samples, 'precision')
 
     for i in range(len(real_coeffs)):
         coeff_str = chr(97 + i)
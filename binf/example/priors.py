@@ -24,9 +24,13 @@ class GammaPrior(AbstractPrior):
 
         return (self.shape - 1.0) * np.log(precision) - precision * self.rate
 
+    def _evaluate_log_prob_batch(self, precision):
+
+        return (self.shape - 1.0) * np.log(precision) - precision * self.rate
+
     def clone(self):
 
-        copy = self.__class__(self.shape, self.shape)
+        copy = self.__class__(self.shape, self.rate)
         copy.set_fixed_variables_from_pdf(self)
 
         return copy
@@ -52,12 +56,24 @@ class GaussianPrior(AbstractPrior):
         variances = self['variances'].value
 
         return -0.5 * np.sum((coefficients - means) ** 2 / variances)
+
+    def _evaluate_log_prob_batch(self, coefficients):
+
+        means = self['means'].value
+        variances = self['variances'].value
+
+        return -0.5 * np.sum((coefficients - means) ** 2 / variances, 1)
     
-    def _evaluate_gradient(self, **variables):
+    def _evaluate_gradient(self, coefficients):
 
-        coeff = variables[self.variable_name]
-        
-        return (coeff - self['mu'].value) / self['sigma'].value ** 2
+        return (coefficients - self['means'].value) / self['variances'].value
+
+    def _evaluate_gradient_into(self, out, coefficients):
+
+        np.subtract(coefficients, self['means'].value, out=out)
+        out /= self['variances'].value
+
+        return out
 
     def clone(self):
 
@@ -40,6 +40,14 @@ class GammaSampler(object):
         
         return r1 + r2
     
+    def checkpoint(self):
+
+        return {'state': self.state}
+
+    def restore(self, checkpoint):
+
+        self.state = checkpoint['state']
+
     def sample(self, state=42):
 
         rate = self._calculate_rate()        
@@ -73,6 +81,18 @@ class RWMCSampler(object):
         else:
             return 0.0
 
+    def checkpoint(self):
+
+        return {'state': np.copy(self.state),
+                'n_moves': self._n_moves,
+                'n_accepted_moves': self._n_accepted_moves}
+
+    def restore(self, checkpoint):
+
+        self.state = np.copy(checkpoint['state'])
+        self._n_moves = checkpoint['n_moves']
+        self._n_accepted_moves = checkpoint['n_accepted_moves']
+
     def sample(self):
 
         E_old = -self.pdf.log_prob(coefficients=self.state)
@@ -97,12 +117,12 @@ def make_sampler(posterior, rwmc_stepsize, start_state):
 
     coeffs = start_state.variables['coefficients']
     precision = start_state.variables['precision']
-    coefficients_pdf = posterior.conditional_factory(precision=precision)
+    coefficients_pdf = posterior.conditional_view(precision=precision)
     coefficients_sampler = RWMCSampler(coefficients_pdf,
                                        coeffs,
                                        rwmc_stepsize)
 
-    precision_pdf = posterior.conditional_factory(coefficients=coeffs)
+    precision_pdf = posterior.conditional_view(coefficients=coeffs)
     precision_sampler = GammaSampler(precision_pdf, precision)
 
     subsamplers = {'coefficients': coefficients_sampler,
@@ -5,6 +5,8 @@ and the error models.
 
 from abc import abstractmethod
 
+import numpy
+
 from csb.core import OrderedDict
 
 from binf.pdf import ParameterNotFoundError, AbstractBinfNamedCallable
@@ -47,6 +49,7 @@ class AbstractModel(AbstractBinfNamedCallable):
         if param in self._params: 
             self._validate(param, value)
             self._params[param] = value
+            self._invalidate_call_plan()
         else:
             raise ParameterNotFoundError(param)
 
@@ -75,6 +78,39 @@ class AbstractModel(AbstractBinfNamedCallable):
     def get_params(self):
         return [self._params[name] for name in self.parameters]
 
+    def evaluate_batch(self, **variables):
+        r"""
+        Evaluates this model for many states at once
+
+        :param \**variables: list of variable name / value pairs, where
+                             each value has a leading axis running over
+                             the states
+
+        :returns: model outputs stacked along a leading batch axis
+        :rtype: :class:`numpy.ndarray`
+        """
+        return self._call_batch(self._get_batch_size(variables), variables)
+
+    def _call_batch(self, n, variables):
+        """
+        Evaluates this model for a batch of n states
+        """
+        self._complete_variables_batch(variables, n)
+
+        return self._evaluate_batch(**variables)
+
+    def _evaluate_batch(self, **variables):
+        r"""
+        In this method, the actual evaluation for a batch of states takes
+        place. All values, including those of fixed variables, have a
+        leading batch axis. Override this with a vectorized
+        implementation; by default, the states are evaluated one after
+        another.
+
+        :param \**variables: list of variable name / value pairs
+        """
+        return self._loop_batch(self._evaluate, variables)
+
     def _complete_variables(self, variables):
         '''
         _complete_variables and _reduce_variables so far only work for classes
@@ -82,7 +118,8 @@ class AbstractModel(AbstractBinfNamedCallable):
         (that is, PDFs and models)
         '''
 
-        variables.update(**{p: self[p].value for p in self.parameters if p in self._original_variables})
+        for name, param in self._get_call_plan():
+            variables[name] = param.value
 
     def _reduce_variables(self, **variables):
 
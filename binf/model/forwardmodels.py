@@ -4,6 +4,8 @@ This module contains interfaces for forward models.
 
 from abc import abstractmethod, ABCMeta
 
+import numpy
+
 from binf.model import AbstractModel
 
 
@@ -32,6 +34,161 @@ class AbstractForwardModel(AbstractModel):
 
         self._check_differentiability(**model_parameters)
 
+    def vjp(self, cotangent, **variables):
+        r"""
+        Evaluates the vector-Jacobian product, that is, the Jacobi matrix
+        (of shape (# variables, # data points)) multiplied with a vector
+        in data space. Likelihood gradients need nothing else.
+
+        :param cotangent: vector in data space
+        :type cotangent: :class:`numpy.ndarray`
+
+        :param \**variables: list of variable name / value pairs
+
+        :returns: vector-Jacobian product
+        :rtype: :class:`numpy.ndarray`
+        """
+        self._complete_variables(variables)
+
+        return self._evaluate_vjp(cotangent, **variables)
+
+    def _evaluate_vjp(self, cotangent, **model_parameters):
+        r"""
+        In this method, the actual evaluation of the vector-Jacobian
+        product takes place. Override this if it can be calculated without
+        setting up the full Jacobi matrix; by default, the Jacobi matrix
+        is built.
+
+        :param cotangent: vector in data space
+        :type cotangent: :class:`numpy.ndarray`
+
+        :param \**model_parameters: list of variable name / value pairs
+        """
+        return self._evaluate_jacobi_matrix(**model_parameters).dot(cotangent)
+
+    def jvp(self, tangent, **variables):
+        r"""
+        Evaluates the Jacobian-vector product, that is, the change of the
+        forward model output along a direction in variable space
+
+        :param tangent: vector in variable space
+        :type tangent: :class:`numpy.ndarray`
+
+        :param \**variables: list of variable name / value pairs
+
+        :returns: Jacobian-vector product
+        :rtype: :class:`numpy.ndarray`
+        """
+        self._complete_variables(variables)
+
+        return self._evaluate_jvp(tangent, **variables)
+
+    def _evaluate_jvp(self, tangent, **model_parameters):
+        r"""
+        In this method, the actual evaluation of the Jacobian-vector
+        product takes place. Override this if it can be calculated without
+        setting up the full Jacobi matrix; by default, the Jacobi matrix
+        is built.
+
+        :param tangent: vector in variable space
+        :type tangent: :class:`numpy.ndarray`
+
+        :param \**model_parameters: list of variable name / value pairs
+        """
+        jacobi_matrix = self._evaluate_jacobi_matrix(**model_parameters)
+
+        return jacobi_matrix.T.dot(tangent)
+
+    @property
+    def provides_vjp(self):
+        """
+        Returns whether this forward model implements the vector-Jacobian
+        product without setting up the Jacobi matrix
+
+        :returns: whether _evaluate_vjp is overridden
+        :rtype: bool
+        """
+        method = type(self)._evaluate_vjp
+        default = AbstractForwardModel._evaluate_vjp
+
+        return getattr(method, '__func__', method) is not \
+               getattr(default, '__func__', default)
+
+    def vjp_batch(self, cotangents, **variables):
+        r"""
+        Evaluates the vector-Jacobian product for many states at once
+
+        :param cotangents: vectors in data space, one per state
+        :type cotangents: :class:`numpy.ndarray`
+
+        :param \**variables: list of variable name / value pairs, where
+                             each value has a leading axis running over
+                             the states
+
+        :returns: vector-Jacobian products, one per row
+        :rtype: :class:`numpy.ndarray`
+        """
+        return self._vjp_batch(len(cotangents), cotangents, variables)
+
+    def _vjp_batch(self, n, cotangents, variables):
+        """
+        Evaluates the vector-Jacobian product for a batch of n states
+        """
+        self._complete_variables_batch(variables, n)
+
+        return self._evaluate_vjp_batch(cotangents, **variables)
+
+    def _evaluate_vjp_batch(self, cotangents, **model_parameters):
+        r"""
+        In this method, the actual evaluation of the vector-Jacobian
+        product for a batch of states takes place. Override this with a
+        vectorized implementation; by default, the states are evaluated
+        one after another.
+
+        :param cotangents: vectors in data space, one per state
+        :type cotangents: :class:`numpy.ndarray`
+
+        :param \**model_parameters: list of variable name / value pairs
+        """
+        return numpy.array([self._evaluate_vjp(cotangents[i],
+                                               **{k: v[i] for k, v
+                                                  in model_parameters.items()})
+                            for i in range(len(cotangents))])
+
+    def jacobi_matrix_batch(self, **variables):
+        r"""
+        Evaluates the Jacobi matrix for many states at once
+
+        :param \**variables: list of variable name / value pairs, where
+                             each value has a leading axis running over
+                             the states
+
+        :returns: Jacobi matrices stacked along a leading batch axis
+        :rtype: :class:`numpy.ndarray`
+        """
+        n = self._get_batch_size(variables)
+
+        return self._jacobi_matrix_batch(n, variables)
+
+    def _jacobi_matrix_batch(self, n, variables):
+        """
+        Evaluates the Jacobi matrix for a batch of n states
+        """
+        self._complete_variables_batch(variables, n)
+
+        return self._evaluate_jacobi_matrix_batch(**variables)
+
+    def _evaluate_jacobi_matrix_batch(self, **model_parameters):
+        r"""
+        In this method, the actual evaluation of the Jacobi matrix for a
+        batch of states takes place. Override this with a vectorized
+        implementation; by default, the states are evaluated one after
+        another.
+
+        :param \**model_parameters: list of variable name / value pairs
+        """
+        return self._loop_batch(self._evaluate_jacobi_matrix, model_parameters)
+
     @abstractmethod
     def clone(self):
 
@@ -55,6 +212,7 @@ class AbstractForwardModel(AbstractModel):
             else:
                 msg = '{} is not a variable of {}'.format(self.__repr__(), v)
                 raise ValueError(msg)
+        self._invalidate_call_plan()
     
     def _set_parameters(self, copy):
         
@@ -0,0 +1,210 @@
+"""
+This module contains structured Jacobi matrices forward models can
+return from _evaluate_jacobi_matrix instead of dense arrays.
+
+Likelihoods only use Jacobi matrices through their dot() method and their
+transpose T, so scipy.sparse matrices work as well. The classes below
+cover common structures without requiring scipy.
+"""
+
+import numpy
+
+
+class BlockDiagonalJacobian(object):
+
+    def __init__(self, blocks):
+        """
+        A Jacobi matrix consisting of dense blocks along the diagonal, as
+        arising from forward models in which disjoint groups of data
+        points depend on disjoint groups of variables
+
+        :param blocks: dense blocks of shape (# variables, # data points)
+        :type blocks: list
+        """
+        self._blocks = [numpy.asarray(b) for b in blocks]
+        self._row_offsets = numpy.cumsum([0] + [b.shape[0] for b in self._blocks])
+        self._col_offsets = numpy.cumsum([0] + [b.shape[1] for b in self._blocks])
+
+    @property
+    def blocks(self):
+        """
+        Returns the diagonal blocks
+
+        :returns: diagonal blocks
+        :rtype: list
+        """
+        return list(self._blocks)
+
+    @property
+    def shape(self):
+        """
+        Returns the shape of the full matrix
+
+        :returns: shape of the full matrix
+        :rtype: tuple
+        """
+        return (int(self._row_offsets[-1]), int(self._col_offsets[-1]))
+
+    @property
+    def T(self):
+        """
+        Returns the transpose of this matrix
+
+        :returns: transposed matrix
+        :rtype: :class:`.BlockDiagonalJacobian`
+        """
+        return self.__class__([b.T for b in self._blocks])
+
+    def dot(self, vector):
+        """
+        Multiplies this matrix with a vector, block by block
+
+        :param vector: vector of length shape[1]
+        :type vector: :class:`numpy.ndarray`
+
+        :returns: matrix-vector product
+        :rtype: :class:`numpy.ndarray`
+        """
+        cols = self._col_offsets
+
+        return numpy.concatenate([b.dot(vector[cols[i]:cols[i+1]])
+                                  for i, b in enumerate(self._blocks)])
+
+    def toarray(self):
+        """
+        Returns the full matrix as a dense array
+
+        :returns: dense matrix
+        :rtype: :class:`numpy.ndarray`
+        """
+        result = numpy.zeros(self.shape)
+        rows, cols = self._row_offsets, self._col_offsets
+        for i, b in enumerate(self._blocks):
+            result[rows[i]:rows[i+1], cols[i]:cols[i+1]] = b
+
+        return result
+
+
+class BandedJacobian(object):
+
+    def __init__(self, data, offsets, shape):
+        """
+        A Jacobi matrix with non-zero entries only along a few diagonals,
+        as arising from forward models in which each data point depends
+        on only a few neighbouring variables
+
+        Storage follows the convention of scipy.sparse.dia_matrix: the
+        entry of row i and column j on the diagonal with offset
+        offsets[k] = j - i is stored in data[k, j].
+
+        :param data: values along the diagonals, of shape
+                     (# diagonals, shape[1])
+        :type data: :class:`numpy.ndarray`
+
+        :param offsets: offsets of the diagonals
+        :type offsets: list
+
+        :param shape: shape of the full matrix
+        :type shape: tuple
+        """
+        self._data = numpy.asarray(data)
+        self._offsets = numpy.asarray(offsets, dtype=int)
+        self._shape = tuple(shape)
+
+        if self._data.shape != (len(self._offsets), self._shape[1]):
+            msg = 'Banded data must have shape (# diagonals, # columns) ' + \
+                  '= {}, not {}'.format((len(self._offsets), self._shape[1]),
+                                        self._data.shape)
+            raise ValueError(msg)
+
+    @property
+    def data(self):
+        """
+        Returns the values along the diagonals
+
+        :returns: values along the diagonals
+        :rtype: :class:`numpy.ndarray`
+        """
+        return self._data
+
+    @property
+    def offsets(self):
+        """
+        Returns the offsets of the diagonals
+
+        :returns: diagonal offsets
+        :rtype: :class:`numpy.ndarray`
+        """
+        return self._offsets
+
+    @property
+    def shape(self):
+        """
+        Returns the shape of the full matrix
+
+        :returns: shape of the full matrix
+        :rtype: tuple
+        """
+        return self._shape
+
+    def _column_range(self, offset):
+        """
+        Returns the range of columns in which the diagonal with the given
+        offset lies within the matrix
+        """
+        n_rows, n_cols = self._shape
+
+        return max(0, offset), min(n_cols, n_rows + offset)
+
+    @property
+    def T(self):
+        """
+        Returns the transpose of this matrix
+
+        :returns: transposed matrix
+        :rtype: :class:`.BandedJacobian`
+        """
+        n_rows, n_cols = self._shape
+        data = numpy.zeros((len(self._offsets), n_rows), dtype=self._data.dtype)
+        for k, offset in enumerate(self._offsets):
+            lo, hi = self._column_range(offset)
+            if hi > lo:
+                data[k, lo - offset:hi - offset] = self._data[k, lo:hi]
+
+        return self.__class__(data, -self._offsets, (n_cols, n_rows))
+
+    def dot(self, vector):
+        """
+        Multiplies this matrix with a vector in O(# diagonals * shape[1])
+        operations
+
+        :param vector: vector of length shape[1]
+        :type vector: :class:`numpy.ndarray`
+
+        :returns: matrix-vector product
+        :rtype: :class:`numpy.ndarray`
+        """
+        result = numpy.zeros(self._shape[0],
+                             dtype=numpy.result_type(self._data, vector))
+        for k, offset in enumerate(self._offsets):
+            lo, hi = self._column_range(offset)
+            if hi > lo:
+                result[lo - offset:hi - offset] += self._data[k, lo:hi] * \
+                                                   vector[lo:hi]
+
+        return result
+
+    def toarray(self):
+        """
+        Returns the full matrix as a dense array
+
+        :returns: dense matrix
+        :rtype: :class:`numpy.ndarray`
+        """
+        result = numpy.zeros(self._shape, dtype=self._data.dtype)
+        for k, offset in enumerate(self._offsets):
+            lo, hi = self._column_range(offset)
+            cols = numpy.arange(lo, hi)
+            result[cols - offset, cols] = self._data[k, lo:hi]
+
+        return result
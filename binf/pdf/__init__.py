@@ -3,6 +3,8 @@ This module provides general functionality and classes
 related to probability density functions and their parameters.
 """
 
+import numpy
+
 from abc import ABCMeta, abstractmethod
 
 from binf import AbstractBinfNamedCallable
@@ -31,6 +33,7 @@ class AbstractBinfPDF(ParameterizedDensity, AbstractBinfNamedCallable):
 
         :param \**args: arguments required for instantiation
         """
+        self._version = 0
         ParameterizedDensity.__init__(self)
         AbstractBinfNamedCallable.__init__(self, name)
 
@@ -67,8 +70,25 @@ class AbstractBinfPDF(ParameterizedDensity, AbstractBinfNamedCallable):
         result = self.clone()
         result.fix_variables(**self._get_variables_intersection(fixed_vars))
 
-        return result            
-    
+        return result
+
+    def conditional_view(self, **fixed_vars):
+        r"""
+        Returns a PDF object conditioned on the given values which, unlike
+        the result of :meth:`conditional_factory`, may share components
+        and data with this object. Changing the values of the fixed
+        variables (the parameters of the returned object) is supposed to
+        be cheap. By default, this falls back to conditional_factory.
+
+        :param \**fixed_vars: keyword arguments containg name / value pairs
+                              for variables on which this PDF should be
+                              conditioned on
+
+        :returns: PDF object conditioned on the given values
+        :rtype: :class:`.AbstractBinfPDF`
+        """
+        return self.conditional_factory(**fixed_vars)
+
     @abstractmethod
     def _evaluate_log_prob(self, **variables):
         r"""
@@ -102,14 +122,196 @@ class AbstractBinfPDF(ParameterizedDensity, AbstractBinfNamedCallable):
         result = self._evaluate_log_prob(**variables)
 
         return result
+
+    def log_prob_batch(self, **variables):
+        r"""
+        Evaluates the log-probability for many states at once
+
+        :param \**variables: list of variable name / value pairs, where
+                             each value has a leading axis running over
+                             the states
+
+        :returns: log-probabilities of all states
+        :rtype: :class:`numpy.ndarray`
+        """
+        return self._log_prob_batch(self._get_batch_size(variables), variables)
+
+    def _log_prob_batch(self, n, variables):
+        """
+        Evaluates the log-probability for a batch of n states; used by
+        composite PDFs, whose components might not have any unfixed
+        variables to infer the batch size from
+        """
+        self._complete_variables_batch(variables, n)
+
+        return self._evaluate_log_prob_batch(**variables)
+
+    def _evaluate_log_prob_batch(self, **variables):
+        r"""
+        In this method, the actual evaluation of the log-probability for
+        a batch of states takes place. All values, including those of
+        fixed variables, have a leading batch axis. Override this with a
+        vectorized implementation; by default, the states are evaluated
+        one after another.
+
+        :param \**variables: list of variable name / value pairs
+        """
+        return self._loop_batch(self._evaluate_log_prob, variables)
     
-    def gradient(self, **variables):
+    def gradient(self, out=None, **variables):
+        r"""
+        Evaluates the gradient of the log-probability (or a related
+        function, depending on the convention of the implementation)
+
+        :param out: buffer to write the gradient into, which then is
+                    returned. Avoids allocating a new array where the
+                    implementation supports it.
+        :type out: :class:`numpy.ndarray`
+
+        :param \**variables: list of variable name / value pairs
 
+        :returns: gradient
+        :rtype: :class:`numpy.ndarray`
+        """
         self._complete_variables(variables)
+        if out is not None:
+            return self._evaluate_gradient_into(out, **variables)
         result = self._evaluate_gradient(**variables)
 
         return result
 
+    def _evaluate_gradient_into(self, out, **variables):
+        r"""
+        In this method, the gradient is evaluated and written into a
+        buffer. Override this if the implementation can write into the
+        buffer directly; by default, the result of
+        :meth:`_evaluate_gradient` is copied.
+
+        :param out: buffer to write the gradient into
+        :type out: :class:`numpy.ndarray`
+
+        :param \**variables: list of variable name / value pairs
+        """
+        out[...] = numpy.reshape(self._evaluate_gradient(**variables), out.shape)
+
+        return out
+
+    def log_prob_and_gradient(self, out=None, **variables):
+        r"""
+        Evaluates the log-probability and the gradient at the same point,
+        sharing intermediate results where the implementation allows
+
+        :param out: buffer to write the gradient into (see :meth:`gradient`)
+        :type out: :class:`numpy.ndarray`
+
+        :param \**variables: list of variable name / value pairs
+
+        :returns: log-probability and gradient (see :meth:`gradient`)
+        :rtype: (float, :class:`numpy.ndarray`)
+        """
+        self._complete_variables(variables)
+        if out is not None:
+            return self._evaluate_log_prob_and_gradient_into(out, **variables)
+
+        return self._evaluate_log_prob_and_gradient(**variables)
+
+    def _evaluate_log_prob_and_gradient_into(self, out, **variables):
+        r"""
+        In this method, the log-probability and the gradient are evaluated
+        and the latter is written into a buffer. By default, the result of
+        :meth:`_evaluate_log_prob_and_gradient` is copied.
+
+        :param out: buffer to write the gradient into
+        :type out: :class:`numpy.ndarray`
+
+        :param \**variables: list of variable name / value pairs
+        """
+        log_prob, gradient = self._evaluate_log_prob_and_gradient(**variables)
+        out[...] = numpy.reshape(gradient, out.shape)
+
+        return log_prob, out
+
+    def _evaluate_log_prob_and_gradient(self, **variables):
+        r"""
+        In this method, the actual joint evaluation of log-probability
+        and gradient takes place. Override this if both share expensive
+        intermediate results; by default, both are evaluated separately.
+
+        :param \**variables: list of variable name / value pairs
+        """
+        return (self._evaluate_log_prob(**variables),
+                self._evaluate_gradient(**variables))
+
+    def gradient_batch(self, **variables):
+        r"""
+        Evaluates the gradient for many states at once
+
+        :param \**variables: list of variable name / value pairs, where
+                             each value has a leading axis running over
+                             the states
+
+        :returns: gradients of all states, one per row
+        :rtype: :class:`numpy.ndarray`
+        """
+        return self._gradient_batch(self._get_batch_size(variables), variables)
+
+    def _gradient_batch(self, n, variables):
+        """
+        Evaluates the gradient for a batch of n states
+        """
+        self._complete_variables_batch(variables, n)
+
+        return self._evaluate_gradient_batch(**variables)
+
+    def _evaluate_gradient_batch(self, **variables):
+        r"""
+        In this method, the actual gradient evaluation for a batch of
+        states takes place. All values, including those of fixed variables,
+        have a leading batch axis. Override this with a vectorized
+        implementation; by default, the states are evaluated one after
+        another.
+
+        :param \**variables: list of variable name / value pairs
+        """
+        return self._loop_batch(self._evaluate_gradient, variables)
+
+    def log_prob_and_gradient_batch(self, **variables):
+        r"""
+        Evaluates the log-probability and the gradient for many states at
+        once, sharing intermediate results where the implementation allows
+
+        :param \**variables: list of variable name / value pairs, where
+                             each value has a leading axis running over
+                             the states
+
+        :returns: log-probabilities and gradients (one per row) of all
+                  states
+        :rtype: (:class:`numpy.ndarray`, :class:`numpy.ndarray`)
+        """
+        return self._log_prob_and_gradient_batch(
+            self._get_batch_size(variables), variables)
+
+    def _log_prob_and_gradient_batch(self, n, variables):
+        """
+        Evaluates the log-probability and the gradient for a batch of
+        n states
+        """
+        self._complete_variables_batch(variables, n)
+
+        return self._evaluate_log_prob_and_gradient_batch(**variables)
+
+    def _evaluate_log_prob_and_gradient_batch(self, **variables):
+        r"""
+        In this method, the actual joint evaluation of log-probability
+        and gradient for a batch of states takes place. Override this if
+        both share expensive intermediate results; by default, both are
+        evaluated separately.
+
+        :param \**variables: list of variable name / value pairs
+        """
+        return (self._evaluate_log_prob_batch(**variables),
+                self._evaluate_gradient_batch(**variables))
+
     def fix_variables(self, **fixed_vars):
         """
         Sets ('fixes') specific variables to values given as keyword
@@ -128,6 +330,36 @@ class AbstractBinfPDF(ParameterizedDensity, AbstractBinfNamedCallable):
             else:
                 msg = '{} is not a variable of {}'.format(self.__repr__(), v)
                 raise ValueError(msg)
+        self._invalidate_call_plan()
+
+    def _set(self, param, value):
+        """
+        Replaces a parameter object and invalidates the call plan,
+        which might still refer to the old parameter object
+        """
+        super(AbstractBinfPDF, self)._set(param, value)
+        self._invalidate_call_plan()
+        self._bump_version()
+
+    @property
+    def version(self):
+        """
+        Returns a counter which increases whenever this PDF changes in
+        a way which is not reflected by the values of its parameters,
+        e.g., when parameter objects are replaced. Samplers compare it
+        to find out whether results cached for a position are still valid.
+
+        :returns: version counter
+        :rtype: int
+        """
+        return self._version
+
+    def _bump_version(self):
+        """
+        Increases the version counter, invalidating results cached by
+        samplers
+        """
+        self._version += 1
 
     @abstractmethod
     def clone(self):
@@ -157,7 +389,8 @@ class AbstractBinfPDF(ParameterizedDensity, AbstractBinfNamedCallable):
         (that is, PDFs and models)
         '''
 
-        variables.update(**{p: self[p].value for p in self.parameters if p in self._original_variables})
+        for name, param in self._get_call_plan():
+            variables[name] = param.value
 
 
 class TestHO(AbstractBinfPDF):
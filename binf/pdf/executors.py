@@ -0,0 +1,352 @@
+"""
+This module contains executors evaluating the components (likelihoods and
+priors) of a posterior distribution, either one after another or
+concurrently
+"""
+
+import time
+
+from abc import ABCMeta, abstractmethod
+
+
+class AbstractComponentExecutor(object):
+
+    __metaclass__ = ABCMeta
+
+    def __init__(self):
+        """
+        Defines the interface for objects evaluating posterior components.
+        Calls are given as (component name, method name, positional
+        arguments, keyword arguments) tuples; results are returned in the
+        order of the calls, so that the reduction of the results does not
+        depend on the order in which the evaluations finish.
+
+        Executors record the wall time spent in each component and in
+        whole batches of calls, so one can check whether concurrent
+        evaluation pays off.
+        """
+        self._components = {}
+        self._timings = {}
+        self._n_maps = 0
+        self._wall_time = 0.0
+
+    def setup(self, components):
+        """
+        Makes the components known to this executor. Called by the
+        posterior distribution the executor is attached to.
+
+        :param components: name / object pairs of likelihoods and priors
+        :type components: dict
+        """
+        self._components = components
+
+    def _timed_call(self, call):
+        """
+        Performs a single call and measures how long it takes
+
+        :param call: component name, method name, positional and keyword
+                     arguments
+        :type call: tuple
+
+        :returns: component name, elapsed time and result
+        :rtype: tuple
+        """
+        name, method, args, kwargs = call
+        start = time.time()
+        result = getattr(self._components[name], method)(*args, **kwargs)
+
+        return name, time.time() - start, result
+
+    def map(self, calls):
+        """
+        Performs calls to component methods
+
+        :param calls: (component name, method name, positional arguments,
+                      keyword arguments) tuples
+        :type calls: list
+
+        :returns: results in the order of the calls
+        :rtype: list
+        """
+        start = time.time()
+        outcomes = self._map(calls)
+        self._wall_time += time.time() - start
+        self._n_maps += 1
+
+        results = []
+        for name, elapsed, result in outcomes:
+            timing = self._timings.setdefault(name, [0, 0.0])
+            timing[0] += 1
+            timing[1] += elapsed
+            results.append(result)
+
+        return results
+
+    @abstractmethod
+    def _map(self, calls):
+        """
+        Performs calls, e.g., by applying _timed_call to each of them, and
+        returns the outcomes in the order of the calls
+
+        :param calls: (component name, method name, positional arguments,
+                      keyword arguments) tuples
+        :type calls: list
+
+        :returns: (component name, elapsed time, result) tuples
+        :rtype: list
+        """
+        pass
+
+    @property
+    def timings(self):
+        """
+        Returns the number of calls and the total wall time spent in each
+        component
+
+        :returns: component name / (# calls, seconds) pairs
+        :rtype: dict
+        """
+        return {name: tuple(t) for name, t in self._timings.items()}
+
+    @property
+    def wall_time(self):
+        """
+        Returns the total wall time spent evaluating batches of calls and
+        the number of such batches. If components are evaluated
+        concurrently, this is less than the sum of the component timings.
+
+        :returns: # batches of calls, seconds
+        :rtype: tuple
+        """
+        return self._n_maps, self._wall_time
+
+    def reset_timings(self):
+        """
+        Resets all timings
+        """
+        self._timings = {}
+        self._n_maps = 0
+        self._wall_time = 0.0
+
+    def shutdown(self):
+        """
+        Releases resources (threads, processes) held by this executor
+        """
+        pass
+
+
+class SerialExecutor(AbstractComponentExecutor):
+    """
+    Evaluates components one after another; useful to get timings
+    to compare concurrent executors against
+    """
+
+    def _map(self, calls):
+
+        return [self._timed_call(call) for call in calls]
+
+
+class ThreadPoolExecutor(AbstractComponentExecutor):
+
+    def __init__(self, n_workers=4):
+        """
+        Evaluates components concurrently in a pool of threads. This pays
+        off for components spending most of their time in code releasing
+        the GIL, such as large NumPy operations.
+
+        :param n_workers: number of worker threads
+        :type n_workers: int
+        """
+        from multiprocessing.pool import ThreadPool
+
+        super(ThreadPoolExecutor, self).__init__()
+
+        self._n_workers = n_workers
+        self._pool = ThreadPool(n_workers)
+
+    @property
+    def n_workers(self):
+        """
+        Returns the number of worker threads
+
+        :returns: number of worker threads
+        :rtype: int
+        """
+        return self._n_workers
+
+    def _map(self, calls):
+
+        if len(calls) < 2:
+            return [self._timed_call(call) for call in calls]
+
+        return self._pool.map(self._timed_call, calls)
+
+    def shutdown(self):
+
+        self._pool.close()
+        self._pool.join()
+
+
+def _worker_loop(connection, components):
+    """
+    Main loop of a worker process of :class:`.ProcessPoolExecutor`. The
+    components stay resident in the worker; each request carries only
+    the current parameter values and the method arguments.
+    """
+    import traceback
+
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        name, method, args, kwargs, params = request
+        component = components[name]
+        try:
+            for p, value in params.items():
+                component[p].find_base_parameter().set(value)
+            start = time.time()
+            result = getattr(component, method)(*args, **kwargs)
+            connection.send((True, time.time() - start, result))
+        except Exception:
+            connection.send((False, 0.0, traceback.format_exc()))
+    connection.close()
+
+
+class ProcessPoolExecutor(AbstractComponentExecutor):
+
+    def __init__(self, n_workers=4, remote=None):
+        """
+        Evaluates components in persistent worker processes. This pays off
+        for CPU-bound, pure-Python forward models, which threads cannot
+        run concurrently.
+
+        Each worker receives its components (forward model, error model
+        and data) once, when the executor is attached to a posterior, and
+        keeps them resident. After that, only variable values, current
+        parameter values (e.g., of variables a conditional posterior is
+        conditioned on) and results are sent between processes.
+
+        :param n_workers: maximum number of worker processes
+        :type n_workers: int
+
+        :param remote: names of the components to evaluate in worker
+                       processes; by default, all likelihoods. The other
+                       components are evaluated in the calling process.
+        :type remote: list
+        """
+        super(ProcessPoolExecutor, self).__init__()
+
+        self._n_workers = n_workers
+        self._remote = remote
+        self._assignment = {}
+        self._connections = []
+        self._processes = []
+
+    @property
+    def n_workers(self):
+        """
+        Returns the maximum number of worker processes
+
+        :returns: maximum number of worker processes
+        :rtype: int
+        """
+        return self._n_workers
+
+    @property
+    def assignment(self):
+        """
+        Returns which worker process evaluates which component
+
+        :returns: component name / worker index pairs
+        :rtype: dict
+        """
+        return self._assignment.copy()
+
+    def setup(self, components):
+
+        from multiprocessing import Process, Pipe
+        from binf.pdf.likelihoods import Likelihood
+
+        self.shutdown()
+        super(ProcessPoolExecutor, self).setup(components)
+
+        if self._remote is None:
+            remote = [name for name, c in components.items()
+                      if isinstance(c, Likelihood)]
+        else:
+            remote = list(self._remote)
+        remote = sorted(remote)
+        n_workers = min(self._n_workers, len(remote))
+
+        self._assignment = {name: i % n_workers for i, name in enumerate(remote)}
+        for i in range(n_workers):
+            worker_components = {name: components[name] for name in remote
+                                 if self._assignment[name] == i}
+            parent_connection, child_connection = Pipe()
+            process = Process(target=_worker_loop,
+                              args=(child_connection, worker_components))
+            process.daemon = True
+            process.start()
+            child_connection.close()
+            self._connections.append(parent_connection)
+            self._processes.append(process)
+
+    def _map(self, calls):
+
+        outcomes = [None] * len(calls)
+        queues = [[] for _ in self._connections]
+        for i, call in enumerate(calls):
+            if call[0] in self._assignment:
+                queues[self._assignment[call[0]]].append(i)
+
+        ## failures are only reported after all outstanding replies have
+        ## been read, so that no stale reply is left in a pipe
+        error = None
+        first_round = True
+        while first_round or (error is None and any(len(q) > 0 for q in queues)):
+            ## at most one outstanding request per worker, so that neither
+            ## side can block on a full pipe while the other one does, too
+            busy = []
+            for worker, queue in enumerate(queues):
+                if len(queue) > 0:
+                    i = queue.pop(0)
+                    name, method, args, kwargs = calls[i]
+                    component = self._components[name]
+                    params = {p: component[p].value
+                              for p in component.parameters}
+                    self._connections[worker].send((name, method, args,
+                                                    kwargs, params))
+                    busy.append((worker, i))
+            try:
+                if first_round:
+                    first_round = False
+                    for i, call in enumerate(calls):
+                        if call[0] not in self._assignment:
+                            outcomes[i] = self._timed_call(call)
+            finally:
+                for worker, i in busy:
+                    success, elapsed, result = self._connections[worker].recv()
+                    if success:
+                        outcomes[i] = (calls[i][0], elapsed, result)
+                    elif error is None:
+                        msg = 'Evaluation of component "{}" failed in ' + \
+                              'worker process:\n{}'
+                        error = RuntimeError(msg.format(calls[i][0], result))
+        if error is not None:
+            raise error
+
+        return outcomes
+
+    def shutdown(self):
+
+        for connection in self._connections:
+            try:
+                connection.send(None)
+                connection.close()
+            except (IOError, EOFError):
+                pass
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+        self._assignment = {}
@@ -9,9 +9,186 @@ from csb.numeric import exp
 from binf.pdf import AbstractBinfPDF
 
 
+def make_input_key(version, parameter_values, variables):
+    """
+    Makes a key identifying the input of an evaluation: a version
+    counter, the values of parameters and variable values. Parameter
+    values are compared by identity, as setting a parameter replaces its
+    value object, so no conditioning data have to be copied or compared.
+    Parameter arrays modified in place thus are not noticed. The key
+    refers to the variable values; use :func:`copy_input_key` to store it.
+
+    :param version: version counter, see :attr:`.AbstractBinfPDF.version`
+    :type version: int
+
+    :param parameter_values: current parameter values
+    :type parameter_values: list
+
+    :param variables: variable name / value pairs
+    :type variables: dict
+
+    :returns: key
+    :rtype: tuple
+    """
+    return version, tuple(parameter_values), variables
+
+
+def copy_input_key(key, reuse=None):
+    """
+    Copies the variable values of a key made by :func:`make_input_key`,
+    so that it is not affected by later in-place changes of the arrays
+    passed as variables
+
+    :param key: key to copy
+    :type key: tuple
+
+    :param reuse: stored key which is not needed anymore. Its arrays are
+                  overwritten if shapes and data types match.
+    :type reuse: tuple
+
+    :returns: copied key
+    :rtype: tuple
+    """
+    version, parameter_values, variables = key
+    old_variables = {} if reuse is None else reuse[2]
+    copied = {}
+    for name, value in variables.items():
+        buffer = old_variables.get(name)
+        if buffer is not None and buffer.shape == numpy.shape(value) and \
+           buffer.dtype == numpy.result_type(value):
+            numpy.copyto(buffer, value)
+            copied[name] = buffer
+        else:
+            copied[name] = numpy.array(value)
+
+    return version, parameter_values, copied
+
+
+def input_key_matches(stored, key):
+    """
+    Checks whether a stored key matches a key made by
+    :func:`make_input_key`. Variable values are compared by content.
+
+    :param stored: key as returned by :func:`copy_input_key`
+    :type stored: tuple
+
+    :param key: key as returned by :func:`make_input_key`
+    :type key: tuple
+
+    :returns: whether the keys identify the same input
+    :rtype: bool
+    """
+    if stored is None:
+        return False
+    version, parameter_values, variables = stored
+    if version != key[0] or len(parameter_values) != len(key[1]) or \
+       any(a is not b for a, b in zip(parameter_values, key[1])):
+        return False
+    if len(variables) != len(key[2]):
+        return False
+    for name, value in key[2].items():
+        if name not in variables or \
+           not numpy.array_equal(variables[name], value):
+            return False
+
+    return True
+
+
+class ForwardModelCache(object):
+
+    def __init__(self, max_size=8):
+        """
+        A least-recently-used cache for forward model results (mock data,
+        Jacobi matrices), keyed on the version of the likelihood, the
+        values of the forward model parameters and the values of the
+        forward model variables (see :func:`make_input_key`)
+
+        :param max_size: maximum number of variable values to hold
+                         results for. 0 disables caching.
+        :type max_size: int
+        """
+        self._max_size = max_size
+        self._entries = []
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self):
+        """
+        Returns the maximum number of cached entries
+
+        :returns: maximum number of cached entries
+        :rtype: int
+        """
+        return self._max_size
+
+    def __len__(self):
+
+        return len(self._entries)
+
+    def clear(self):
+        """
+        Removes all entries and resets the hit / miss counters
+        """
+        del self._entries[:]
+        self.hits = 0
+        self.misses = 0
+
+    def get_entry(self, key):
+        """
+        Returns the results cached for an input, making it the most
+        recently used entry. On a miss, a new, empty entry is added,
+        evicting the least recently used one if the cache is full.
+
+        :param key: key as returned by :func:`make_input_key`
+        :type key: tuple
+
+        :returns: quantity name / result pairs
+        :rtype: dict
+        """
+        if self._max_size <= 0:
+            return {}
+
+        for i in range(len(self._entries) - 1, -1, -1):
+            if input_key_matches(self._entries[i][0], key):
+                stored, entry = self._entries.pop(i)
+                break
+        else:
+            evicted = None
+            if len(self._entries) >= self._max_size:
+                evicted = self._entries.pop(0)[0]
+            stored, entry = copy_input_key(key, evicted), {}
+        self._entries.append((stored, entry))
+
+        return entry
+
+    def lookup(self, entry, quantity, compute):
+        """
+        Returns a cached quantity, computing and storing it on a miss
+
+        :param entry: cache entry as returned by :meth:`get_entry`
+        :type entry: dict
+
+        :param quantity: name of the cached quantity, e.g., 'mock_data'
+        :type quantity: str
+
+        :param compute: function computing the quantity
+        :type compute: callable
+
+        :returns: the (possibly cached) quantity
+        """
+        if quantity in entry:
+            self.hits += 1
+        else:
+            self.misses += 1
+            entry[quantity] = compute()
+
+        return entry[quantity]
+
+
 class Likelihood(AbstractBinfPDF):
 
-    def __init__(self, name, forward_model, error_model):
+    def __init__(self, name, forward_model, error_model, cache_size=8):
         """
         A likelihood function (not exactly a PDF...) which is composed
         of a forward model to back-calculate idealized data from
@@ -27,11 +204,20 @@ class Likelihood(AbstractBinfPDF):
         :param error_model: error model to model deviations of the data
                             from the back-calculated data
         :type error_model: :class:`.AbstractErrorModel`
+
+        :param cache_size: number of forward model variable values to
+                           cache mock data and Jacobi matrices for. This
+                           saves forward model evaluations when only
+                           error model variables change. 0 disables
+                           caching.
+        :type cache_size: int
         """
         super(Likelihood, self).__init__(name)
         
         self._forward_model = forward_model
         self._error_model = error_model
+        self._split_plan = None
+        self._fwm_cache = ForwardModelCache(cache_size)
 
         self._inherit_variables()
 
@@ -119,6 +305,94 @@ class Likelihood(AbstractBinfPDF):
         """
         return self._error_model
 
+    @property
+    def fwm_cache(self):
+        """
+        Returns the cache holding forward model results
+
+        :returns: forward model result cache
+        :rtype: :class:`.ForwardModelCache`
+        """
+        return self._fwm_cache
+
+    def _get_fwm_entry(self, fwm_variables):
+        """
+        Returns the cache entry for forward model variables and the
+        current values of the forward model parameters
+        """
+        parameter_values = [p.value for p in self.forward_model.get_params()]
+        key = make_input_key(self.version, parameter_values, fwm_variables)
+
+        return self._fwm_cache.get_entry(key)
+
+    def _get_mock_data(self, fwm_variables, entry=None):
+        """
+        Returns the forward model output, either cached or newly calculated
+        """
+        if entry is None:
+            entry = self._get_fwm_entry(fwm_variables)
+        compute = lambda: self.forward_model(**fwm_variables)
+
+        return self._fwm_cache.lookup(entry, 'mock_data', compute)
+
+    def _get_jacobi_matrix(self, fwm_variables, entry=None):
+        """
+        Returns the forward model Jacobi matrix, either cached or newly
+        calculated
+        """
+        if entry is None:
+            entry = self._get_fwm_entry(fwm_variables)
+        compute = lambda: self.forward_model.jacobi_matrix(**fwm_variables)
+
+        return self._fwm_cache.lookup(entry, 'jacobi_matrix', compute)
+
+    def _pull_back(self, fwm_variables, emgrad, entry=None, out=None):
+        """
+        Maps the error model gradient w.r.t. the mock data to a gradient
+        w.r.t. the forward model variables, using the vector-Jacobian
+        product if the forward model implements it and the (cached)
+        Jacobi matrix otherwise. If a buffer is given, the result is
+        written into it, directly if the Jacobi matrix is a dense array.
+        """
+        if self.forward_model.provides_vjp:
+            result = self.forward_model.vjp(emgrad, **fwm_variables)
+        else:
+            jacobi_matrix = self._get_jacobi_matrix(fwm_variables, entry)
+            if (out is not None and type(jacobi_matrix) == numpy.ndarray
+                and jacobi_matrix.dtype == out.dtype == getattr(emgrad, 'dtype', None)
+                and out.flags.c_contiguous
+                and out.shape == jacobi_matrix.shape[:1]):
+                return numpy.dot(jacobi_matrix, emgrad, out=out)
+            result = jacobi_matrix.dot(emgrad)
+
+        if out is None:
+            return result
+        out[...] = numpy.reshape(result, out.shape)
+
+        return out
+
+    def _invalidate_call_plan(self):
+        """
+        Discards the precompiled call plan and the precomputed
+        routing of variables to the forward and error model
+        """
+        super(Likelihood, self)._invalidate_call_plan()
+        self._split_plan = None
+
+    def _get_split_plan(self):
+        """
+        Returns the names of the forward and error model variables,
+        computing them if necessary
+
+        :returns: forward model and error model variable names
+        :rtype: (tuple, tuple)
+        """
+        if self._split_plan is None:
+            self._split_plan = (tuple(self.forward_model.variables),
+                                tuple(self.error_model.variables))
+
+        return self._split_plan
+
     def _split_variables(self, variables):
         """
         Splits up variables into variables of the forward and
@@ -131,34 +405,122 @@ class Likelihood(AbstractBinfPDF):
                   error model variables
         :rtype: (dict, dict)
         """
-        fwm_variables = {v: variables[v] for v in variables
-                         if v in self.forward_model.variables}
-        em_variables = {v: variables[v] for v in variables
-                        if v in self.error_model.variables}
+        fwm_names, em_names = self._get_split_plan()
+        fwm_variables = {v: variables[v] for v in fwm_names if v in variables}
+        em_variables = {v: variables[v] for v in em_names if v in variables}
 
         return fwm_variables, em_variables
 
     def _evaluate_log_prob(self, **variables):
 
         fwm_variables, em_variables = self._split_variables(variables)
-        mock_data = self.forward_model(**fwm_variables)
+        mock_data = self._get_mock_data(fwm_variables)
         
         return self.error_model.log_prob(mock_data=mock_data, **em_variables)
 
+    def _evaluate_fwm_batch(self, n, fwm_variables, method, batch_method):
+        """
+        Evaluates a forward model method for a batch of n states. If the
+        forward model is fully conditioned, it is evaluated only once and
+        the result is broadcast along the batch axis.
+        """
+        if len(fwm_variables) == 0:
+            result = numpy.asarray(method())
+            return numpy.broadcast_to(result, (n,) + result.shape)
+        else:
+            return batch_method(n, dict(fwm_variables))
+
+    def _evaluate_log_prob_batch(self, **variables):
+
+        n = self._get_batch_size(variables)
+        fwm_variables, em_variables = self._split_variables(variables)
+        em_variables.update(mock_data=self._get_mock_data_batch(n, fwm_variables))
+
+        return self.error_model._log_prob_batch(n, em_variables)
+
+    def _get_mock_data_batch(self, n, fwm_variables):
+        """
+        Evaluates the forward model for a batch of n states
+        """
+        fwm = self.forward_model
+
+        return self._evaluate_fwm_batch(n, fwm_variables, fwm, fwm._call_batch)
+
+    def _pull_back_batch(self, n, fwm_variables, emgrad):
+        """
+        Pulls back the gradients of the error model for a batch of n
+        states to gradients w.r.t. the forward model variables
+        """
+        fwm = self.forward_model
+        if fwm.provides_vjp:
+            ## avoid setting up a stack of possibly huge Jacobi matrices
+            return fwm._vjp_batch(n, emgrad, dict(fwm_variables))
+
+        dfm = self._evaluate_fwm_batch(n, fwm_variables, fwm.jacobi_matrix,
+                                       fwm._jacobi_matrix_batch)
+        if dfm.dtype == object:
+            ## sparse or otherwise structured Jacobi matrices
+            return numpy.array([dfm[i].dot(emgrad[i]) for i in range(n)])
+
+        return numpy.einsum('nij,nj->ni', dfm, emgrad)
+
+    def _evaluate_gradient_batch(self, **variables):
+
+        n = self._get_batch_size(variables)
+        fwm_variables, em_variables = self._split_variables(variables)
+        em_variables.update(mock_data=self._get_mock_data_batch(n, fwm_variables))
+        emgrad = self.error_model._gradient_batch(n, em_variables)
+
+        return self._pull_back_batch(n, fwm_variables, emgrad)
+
+    def _evaluate_log_prob_and_gradient_batch(self, **variables):
+
+        n = self._get_batch_size(variables)
+        fwm_variables, em_variables = self._split_variables(variables)
+        em_variables.update(mock_data=self._get_mock_data_batch(n, fwm_variables))
+        log_probs, emgrad = self.error_model._log_prob_and_gradient_batch(
+            n, em_variables)
+
+        return log_probs, self._pull_back_batch(n, fwm_variables, emgrad)
+
     def _evaluate_gradient(self, **variables):
 
         fwm_variables, em_variables = self._split_variables(variables)
-        mock_data = self.forward_model(**fwm_variables)
-        dfm = self.forward_model.jacobi_matrix(**fwm_variables)
+        entry = self._get_fwm_entry(fwm_variables)
+        mock_data = self._get_mock_data(fwm_variables, entry)
         emgrad = self.error_model.gradient(mock_data=mock_data, **em_variables)
 
-        return dfm.dot(emgrad)
+        return self._pull_back(fwm_variables, emgrad, entry)
+
+    def _evaluate_gradient_into(self, out, **variables):
+
+        fwm_variables, em_variables = self._split_variables(variables)
+        entry = self._get_fwm_entry(fwm_variables)
+        mock_data = self._get_mock_data(fwm_variables, entry)
+        emgrad = self.error_model.gradient(mock_data=mock_data, **em_variables)
+
+        return self._pull_back(fwm_variables, emgrad, entry, out)
+
+    def _evaluate_log_prob_and_gradient(self, **variables):
+
+        return self._evaluate_log_prob_and_gradient_into(None, **variables)
+
+    def _evaluate_log_prob_and_gradient_into(self, out, **variables):
+
+        fwm_variables, em_variables = self._split_variables(variables)
+        entry = self._get_fwm_entry(fwm_variables)
+        mock_data = self._get_mock_data(fwm_variables, entry)
+        log_prob, emgrad = self.error_model.log_prob_and_gradient(
+            mock_data=mock_data, **em_variables)
+
+        return log_prob, self._pull_back(fwm_variables, emgrad, entry, out)
 
     def clone(self):
 
         copy = self.__class__(self.name,
                               self.forward_model.clone(),
-                              self.error_model.clone())
+                              self.error_model.clone(),
+                              cache_size=self.fwm_cache.max_size)
         
         return copy
 
@@ -169,7 +531,8 @@ class Likelihood(AbstractBinfPDF):
         old_em = self.error_model
         variables_intersection = old_em._get_variables_intersection(fixed_vars)
         em = old_em.conditional_factory(**variables_intersection)
-        result = self.__class__(self.name, fwm, em)
+        result = self.__class__(self.name, fwm, em,
+                                cache_size=self.fwm_cache.max_size)
 
         return result            
 
@@ -0,0 +1,202 @@
+"""
+This module contains functionality to map named variables to a single,
+contiguous parameter vector and back
+"""
+
+import numpy
+
+
+class VariablePacker(object):
+
+    def __init__(self, names, shapes):
+        """
+        Maps named variables of fixed shapes to slices of one contiguous
+        float64 vector. Offsets and shapes are computed once on
+        construction, so packing and unpacking boil down to slicing.
+
+        :param names: variable names in the order in which they are
+                      stored in the flat vector
+        :type names: list
+
+        :param shapes: shapes of the variables; () for scalars
+        :type shapes: list
+        """
+        if len(names) != len(shapes):
+            raise ValueError('Got {} variable names, but {} shapes'.format(
+                len(names), len(shapes)))
+
+        self._names = tuple(names)
+        self._shapes = tuple(tuple(s) for s in shapes)
+        self._slices = {}
+
+        offset = 0
+        for name, shape in zip(self._names, self._shapes):
+            size = int(numpy.prod(shape))
+            self._slices[name] = slice(offset, offset + size)
+            offset += size
+        self._size = offset
+
+    @classmethod
+    def from_variables(cls, **variables):
+        r"""
+        Creates a packer matching the shapes of the given variable values.
+        Variables are stored in alphabetical order.
+
+        :param \**variables: variable name / example value pairs
+
+        :returns: a packer for variables of the given shapes
+        :rtype: :class:`.VariablePacker`
+        """
+        names = sorted(variables.keys())
+
+        return cls(names, [numpy.shape(variables[n]) for n in names])
+
+    @property
+    def names(self):
+        """
+        Returns the variable names in storage order
+
+        :returns: variable names
+        :rtype: tuple
+        """
+        return self._names
+
+    @property
+    def shapes(self):
+        """
+        Returns the variable shapes in storage order
+
+        :returns: variable shapes
+        :rtype: tuple
+        """
+        return self._shapes
+
+    @property
+    def slices(self):
+        """
+        Returns the slice of the flat vector each variable occupies
+
+        :returns: variable name / slice pairs
+        :rtype: dict
+        """
+        return self._slices.copy()
+
+    @property
+    def size(self):
+        """
+        Returns the length of the flat vector
+
+        :returns: length of the flat vector
+        :rtype: int
+        """
+        return self._size
+
+    def empty(self):
+        """
+        Allocates a new flat vector
+
+        :returns: uninitialized flat vector
+        :rtype: :class:`numpy.ndarray`
+        """
+        return numpy.empty(self._size)
+
+    def matches(self, variables):
+        """
+        Checks whether variable values have the shapes this packer
+        has been set up for
+
+        :param variables: variable name / value pairs
+        :type variables: dict
+
+        :returns: whether all variables are present and have matching shapes
+        :rtype: bool
+        """
+        for name, shape in zip(self._names, self._shapes):
+            if name not in variables or numpy.shape(variables[name]) != shape:
+                return False
+
+        return True
+
+    def ravel(self, variables, out=None):
+        """
+        Packs variable values into a flat vector
+
+        :param variables: variable name / value pairs
+        :type variables: dict
+
+        :param out: optional preallocated flat vector to write into
+        :type out: :class:`numpy.ndarray`
+
+        :returns: flat vector
+        :rtype: :class:`numpy.ndarray`
+        """
+        if out is None:
+            out = self.empty()
+        for name in self._names:
+            out[self._slices[name]] = numpy.ravel(variables[name])
+
+        return out
+
+    def unravel(self, x):
+        """
+        Unpacks a flat vector into variable values. Array-valued variables
+        are returned as views on x, scalars as floats.
+
+        :param x: flat vector
+        :type x: :class:`numpy.ndarray`
+
+        :returns: variable name / value pairs
+        :rtype: dict
+        """
+        if len(x) != self._size:
+            raise ValueError('Flat vector has length {} instead of {}'.format(
+                len(x), self._size))
+
+        result = {}
+        for name, shape in zip(self._names, self._shapes):
+            sl = self._slices[name]
+            if shape == ():
+                result[name] = float(x[sl.start])
+            else:
+                result[name] = x[sl].reshape(shape)
+
+        return result
+
+    def add_gradient(self, out, names, gradient, variables):
+        """
+        Adds the gradient of a function w.r.t. some variables to the
+        matching slots of a flat vector. The gradient is expected to be
+        the concatenation of the partial gradients w.r.t. the variables
+        in the given order. Partial gradients w.r.t. variables this packer
+        does not hold are skipped.
+
+        Both out and gradient may have a leading batch axis, in which case
+        the variable values are expected to have one, too.
+
+        :param out: flat vector to add the gradient to
+        :type out: :class:`numpy.ndarray`
+
+        :param names: names of the variables the gradient has been
+                      taken w.r.t.
+        :type names: tuple
+
+        :param gradient: gradient
+        :type gradient: :class:`numpy.ndarray`
+
+        :param variables: variable name / value pairs used to infer the
+                          sizes of the partial gradients
+        :type variables: dict
+        """
+        batch_axes = out.ndim - 1
+        gradient = numpy.reshape(gradient, out.shape[:batch_axes] + (-1,))
+        if len(names) == 1:
+            if names[0] in self._slices:
+                out[..., self._slices[names[0]]] += gradient
+            return
+
+        offset = 0
+        for name in names:
+            size = int(numpy.prod(numpy.shape(variables[name])[batch_axes:]))
+            if name in self._slices:
+                out[..., self._slices[name]] += gradient[..., offset:offset + size]
+            offset += size
@@ -10,6 +10,9 @@ from csb.numeric import log, exp
 
 from binf import AbstractBinfNamedCallable
 from binf.pdf import AbstractBinfPDF
+from binf.pdf.packing import VariablePacker
+from binf.pdf.likelihoods import make_input_key, copy_input_key
+from binf.pdf.likelihoods import input_key_matches
 
 
 class Posterior(AbstractBinfPDF):
@@ -33,6 +36,17 @@ class Posterior(AbstractBinfPDF):
 
         self._likelihoods = likelihoods
         self._priors = priors
+        self._component_plan = None
+        self._gradient_packer = None
+        self._gradient_buffers = {}
+        self._packer = None
+        self._flat_gradient = None
+        self._executor = None
+        self._incremental = False
+        self._last_log_probs = {}
+        self._incremental_hits = 0
+        self._incremental_misses = 0
+        self._beta = 1.0
 
         self._setup_parameters()
         self._components = dict(**self.priors)
@@ -66,12 +80,12 @@ class Posterior(AbstractBinfPDF):
         vars = []
         fixed_vars = []
         diff_vars = []
-        var_param_types = []
+        var_param_types = {}
 
         for c in self._components:
             for v in self._components[c].variables:
                 vars.append(v)
-                var_param_types.append(self._components[c].var_param_types[v])
+                var_param_types[v] = self._components[c].var_param_types[v]
                 if v in self._components[c].differentiable_variables:
                     diff_vars.append(v)
             for p in self._components[c].parameters:
@@ -110,8 +124,7 @@ class Posterior(AbstractBinfPDF):
         for fixed_var in fixed_vars:
             self._original_variables.update({fixed_var})
 
-        self.update_var_param_types(**{var: _type for var, _type
-                                       in zip(vars, var_param_types)})
+        self.update_var_param_types(**var_param_types)
 
     def _get_component_variables_list(self):
         """
@@ -122,6 +135,93 @@ class Posterior(AbstractBinfPDF):
         """
         return {c: c.variables for c in self._components.values()}
 
+    def _invalidate_call_plan(self):
+        """
+        Discards the precompiled call plan and the precomputed
+        routing of variables to the components
+        """
+        super(Posterior, self)._invalidate_call_plan()
+        self._component_plan = None
+        self._gradient_buffers = {}
+
+    def _get_component_plan(self):
+        """
+        Returns, for each component (likelihood or prior), its name, the
+        component itself, the names of its variables and the names of the
+        variables its gradient is taken w.r.t., computing these if
+        necessary. Components are ordered by name, which fixes the order
+        in which their results are summed up.
+
+        :returns: (component name, component, variable names,
+                  differentiable variable names) tuples
+        :rtype: tuple
+        """
+        if self._component_plan is None:
+            plan = []
+            for name in sorted(self._components):
+                c = self._components[name]
+                if len(c.variables) > 0:
+                    diff_names = tuple(sorted(c.differentiable_variables))
+                else:
+                    diff_names = ()
+                plan.append((name, c, tuple(c.variables), diff_names))
+            self._component_plan = tuple(plan)
+
+        return self._component_plan
+
+    @property
+    def executor(self):
+        """
+        Returns the executor evaluating the components of this posterior
+
+        :returns: executor or None, if components are evaluated one after
+                  another without timing
+        :rtype: :class:`.AbstractComponentExecutor`
+        """
+        return self._executor
+    @executor.setter
+    def executor(self, value):
+        """
+        Sets the executor evaluating the components of this posterior.
+        Executors are not carried over by clone() and conditional_factory().
+        """
+        if value is not None:
+            value.setup(self._components)
+        self._executor = value
+
+    @property
+    def component_timings(self):
+        """
+        Returns the number of evaluations and the total wall time spent
+        in each component, as recorded by the executor
+
+        :returns: component name / (# calls, seconds) pairs
+        :rtype: dict
+        """
+        if self._executor is None:
+            return {}
+
+        return self._executor.timings
+
+    def _call_components(self, calls):
+        """
+        Calls component methods, using the executor if one is set
+
+        :param calls: (component name, method name, positional arguments,
+                      keyword arguments) tuples
+        :type calls: list
+
+        :returns: results in the order of the calls
+        :rtype: list
+        """
+        if self._executor is not None:
+            return self._executor.map(calls)
+
+        components = self._components
+
+        return [getattr(components[name], method)(*args, **kwargs)
+                for name, method, args, kwargs in calls]
+
     def _evaluate_components(self, **model_parameters):
         r"""
         Evaluates the log-probabilities of all components
@@ -134,22 +234,180 @@ class Posterior(AbstractBinfPDF):
         :rtype: list
         """
         mps = model_parameters
-        results = []
-
-        comp_vars = self._get_component_variables_list()
-        
-        for c in comp_vars:
-            single_result = c.log_prob(**{v: mps[v] for v in comp_vars[c]})
-            results.append(single_result)
+        calls = [(cname, 'log_prob', (), {v: mps[v] for v in names})
+                 for cname, _, names, _ in self._get_component_plan()]
+
+        if not self._incremental:
+            return self._call_components(calls)
+
+        results = [None] * len(calls)
+        missing = []
+        for i, call in enumerate(calls):
+            cname, _, _, kwargs = call
+            key = self._get_component_key(cname, kwargs)
+            last = self._last_log_probs.get(cname)
+            if last is not None and input_key_matches(last[0], key):
+                results[i] = last[1]
+                self._incremental_hits += 1
+            else:
+                missing.append((i, key))
+        self._incremental_misses += len(missing)
+
+        new_results = self._call_components([calls[i] for i, _ in missing])
+        for (i, key), result in zip(missing, new_results):
+            cname = calls[i][0]
+            last = self._last_log_probs.get(cname)
+            stored = copy_input_key(key, None if last is None else last[0])
+            results[i] = result
+            self._last_log_probs[cname] = (stored, result)
 
         return results
 
+    def _get_component_key(self, name, variables):
+        """
+        Makes a key from the version of a component, the current values
+        of its parameters and the variables passed to it, which
+        identifies the input the component's log-probability was
+        evaluated for. Parameter values are compared by identity and
+        only variables by content, so data are not copied.
+        """
+        component = self._components[name]
+        parameter_values = [component[p].value for p in component.parameters]
+
+        return make_input_key(component.version, parameter_values, variables)
+
+    @property
+    def incremental(self):
+        """
+        Returns whether the log-probability is evaluated incrementally,
+        that is, whether each component's log-probability is taken from
+        its last evaluation if neither the variables passed to it nor its
+        parameters changed since
+
+        :returns: whether incremental evaluation is switched on
+        :rtype: bool
+        """
+        return self._incremental
+    @incremental.setter
+    def incremental(self, value):
+        """
+        Switches incremental evaluation on or off
+        """
+        self._incremental = bool(value)
+        self.clear_component_cache()
+
+    @property
+    def incremental_stats(self):
+        """
+        Returns how many component log-probabilities were taken from
+        previous evaluations and how many were evaluated anew
+
+        :returns: # reused, # evaluated component log-probabilities
+        :rtype: tuple
+        """
+        return self._incremental_hits, self._incremental_misses
+
+    def clear_component_cache(self):
+        """
+        Forgets the last component log-probabilities, e.g., after data of
+        a likelihood have been changed, and resets the statistics
+        """
+        self._last_log_probs = {}
+        self._incremental_hits = 0
+        self._incremental_misses = 0
+
+    @property
+    def beta(self):
+        """
+        Returns the inverse temperature the log-probabilities of the
+        likelihoods are multiplied with. Priors are not tempered.
+
+        :returns: inverse temperature
+        :rtype: float
+        """
+        return self._beta
+    @beta.setter
+    def beta(self, value):
+        """
+        Sets the inverse temperature, e.g., for replica exchange or
+        thermodynamic integration. As the inverse temperature is not a
+        parameter, the version counter is increased, so that samplers
+        do not reuse energies cached for another one.
+        """
+        if float(value) != self._beta:
+            self._beta = float(value)
+            self._bump_version()
+
+    def _get_component_weight(self, name):
+        """
+        Returns the factor the log-probability of a component is
+        multiplied with, that is, the inverse temperature for likelihoods
+        and one for priors
+        """
+        return self._beta if name in self._likelihoods else 1.0
+
     def _evaluate_log_prob(self, **model_parameters):
 
         single_results = self._evaluate_components(**model_parameters)
+        if self._beta != 1.0:
+            single_results = [self._get_component_weight(entry[0]) * result
+                              for entry, result in
+                              zip(self._get_component_plan(), single_results)]
 
         return numpy.sum(single_results)
 
+    def log_likelihood(self, **variables):
+        r"""
+        Evaluates the sum of the log-probabilities of all likelihoods,
+        regardless of the inverse temperature
+
+        :param \**variables: list of variable name / value pairs
+
+        :returns: log-likelihood
+        :rtype: float
+        """
+        self._complete_variables(variables)
+        calls = [(cname, 'log_prob', (), {v: variables[v] for v in names})
+                 for cname, _, names, _ in self._get_component_plan()
+                 if cname in self._likelihoods]
+
+        return numpy.sum(self._call_components(calls))
+
+    def log_likelihood_batch(self, **variables):
+        r"""
+        Evaluates the sum of the log-probabilities of all likelihoods,
+        regardless of the inverse temperature, for many states at once
+
+        :param \**variables: list of variable name / value pairs, where
+                             each value has a leading axis running over
+                             the states
+
+        :returns: log-likelihoods of all states
+        :rtype: :class:`numpy.ndarray`
+        """
+        n = self._get_batch_size(variables)
+        self._complete_variables_batch(variables, n)
+        calls = [(cname, '_log_prob_batch', (n, {v: variables[v] for v in names}), {})
+                 for cname, _, names, _ in self._get_component_plan()
+                 if cname in self._likelihoods]
+        result = numpy.zeros(n)
+        for single_result in self._call_components(calls):
+            result += single_result
+
+        return result
+
+    def _evaluate_log_prob_batch(self, **model_parameters):
+
+        mps = model_parameters
+        n = self._get_batch_size(mps)
+        calls = [(cname, '_log_prob_batch', (n, {v: mps[v] for v in names}), {})
+                 for cname, _, names, _ in self._get_component_plan()]
+        result = numpy.zeros(n)
+        for call, single_result in zip(calls, self._call_components(calls)):
+            result += self._get_component_weight(call[0]) * single_result
+
+        return result
+
     @property
     def likelihoods(self):
         """
@@ -170,21 +428,328 @@ class Posterior(AbstractBinfPDF):
         """
         return self._priors
 
+    def _accumulate_gradient(self, variables, packer, out):
+        """
+        Sums up the gradients of all components in a flat vector laid
+        out by a packer
+
+        :param variables: values for all variables of the components
+        :type variables: dict
+
+        :param packer: layout of the flat gradient vector
+        :type packer: :class:`.VariablePacker`
+
+        :param out: flat vector to write the gradient into
+        :type out: :class:`numpy.ndarray`
+
+        :returns: the gradient
+        :rtype: :class:`numpy.ndarray`
+        """
+        plan = [entry for entry in self._get_component_plan()
+                if len(entry[3]) > 0]
+        calls = [(cname, 'gradient',
+                  self._get_gradient_buffer_args(cname, diff_names, variables),
+                  {x: variables[x] for x in names})
+                 for cname, _, names, diff_names in plan]
+        out.fill(0.0)
+        for entry, grad in zip(plan, self._call_components(calls)):
+            grad = self._weigh_gradient(entry[0], grad)
+            packer.add_gradient(out, entry[3], grad, variables)
+
+        return out
+
+    def _get_gradient_buffer_args(self, name, diff_names, variables):
+        """
+        Returns the positional arguments passing a scratch buffer for the
+        flat gradient of a component to its gradient methods, so that
+        gradients are not allocated anew in each evaluation. Buffers are
+        kept per component and set up anew if the variable sizes change.
+        Components evaluated by an executor get no buffer.
+
+        :param name: name of the component
+        :type name: str
+
+        :param diff_names: names of the variables the gradient of the
+                           component is taken w.r.t.
+        :type diff_names: tuple
+
+        :param variables: values for all variables of the components
+        :type variables: dict
+
+        :returns: positional arguments
+        :rtype: tuple
+        """
+        if self._executor is not None:
+            return ()
+
+        size = 0
+        for v in diff_names:
+            size += int(numpy.prod(numpy.shape(variables[v])))
+        buffer = self._gradient_buffers.get(name)
+        if buffer is None or buffer.size != size:
+            buffer = numpy.empty(size)
+            self._gradient_buffers[name] = buffer
+
+        return (buffer,)
+
+    def _weigh_gradient(self, name, gradient):
+        """
+        Multiplies the gradient of a component by its weight (see
+        :meth:`_get_component_weight`), in place if it has been written
+        into the component's scratch buffer
+        """
+        weight = self._get_component_weight(name)
+        if weight == 1.0:
+            return gradient
+        if gradient is self._gradient_buffers.get(name):
+            gradient *= weight
+            return gradient
+
+        return weight * gradient
+
+    def _get_gradient_packer(self, variables):
+        """
+        Returns the layout of the gradient vector w.r.t. the
+        differentiable variables, setting it up anew if the variable
+        shapes changed
+
+        :param variables: values of (a single state of) all variables
+        :type variables: dict
+
+        :returns: layout of the gradient vector
+        :rtype: :class:`.VariablePacker`
+        """
+        packer = self._gradient_packer
+        if packer is None or not packer.matches(variables):
+            packer = VariablePacker.from_variables(
+                **{v: variables[v] for v in self.differentiable_variables
+                   if v in variables})
+            self._gradient_packer = packer
+
+        return packer
+
     def _evaluate_gradient(self, **variables):
 
-        vars = variables
+        packer = self._get_gradient_packer(variables)
+
+        return self._accumulate_gradient(variables, packer, packer.empty())
+
+    def _evaluate_gradient_into(self, out, **variables):
+
+        packer = self._get_gradient_packer(variables)
+
+        return self._accumulate_gradient(variables, packer, out)
+
+    def _evaluate_log_prob_and_gradient(self, **variables):
+
+        return self._accumulate_log_prob_and_gradient(
+            variables, self._get_gradient_packer(variables))
+
+    def _evaluate_log_prob_and_gradient_into(self, out, **variables):
+
+        return self._accumulate_log_prob_and_gradient(
+            variables, self._get_gradient_packer(variables), out)
+
+    def _accumulate_log_prob_and_gradient(self, variables, packer, out=None):
+        """
+        Sums up the log-probabilities and the gradients of all components,
+        evaluating both in a single call to each component
+
+        :param variables: values for all variables of the components
+        :type variables: dict
+
+        :param packer: layout of the flat gradient vector
+        :type packer: :class:`.VariablePacker`
+
+        :param out: flat vector to write the gradient into; if not
+                    given, a new one is allocated
+        :type out: :class:`numpy.ndarray`
+
+        :returns: log-probability and gradient
+        :rtype: (float, :class:`numpy.ndarray`)
+        """
+        plan = self._get_component_plan()
+        calls = []
+        for cname, _, names, diff_names in plan:
+            kwargs = {x: variables[x] for x in names}
+            if len(diff_names) > 0:
+                args = self._get_gradient_buffer_args(cname, diff_names,
+                                                      variables)
+                calls.append((cname, 'log_prob_and_gradient', args, kwargs))
+            else:
+                calls.append((cname, 'log_prob', (), kwargs))
+        gradient = packer.empty() if out is None else out
+        gradient.fill(0.0)
+        log_probs = []
+        for entry, result in zip(plan, self._call_components(calls)):
+            weight = self._get_component_weight(entry[0])
+            if len(entry[3]) > 0:
+                log_prob, grad = result
+                grad = self._weigh_gradient(entry[0], grad)
+                packer.add_gradient(gradient, entry[3], grad, variables)
+            else:
+                log_prob = result
+            log_probs.append(weight * log_prob)
+
+        return numpy.sum(log_probs), gradient
+
+    def _evaluate_gradient_batch(self, **variables):
+
+        n = self._get_batch_size(variables)
+        packer = self._get_gradient_packer(
+            {v: variables[v][0] for v in self.differentiable_variables
+             if v in variables})
+
+        return self._accumulate_gradient_batch(n, variables, packer)
+
+    def _accumulate_gradient_batch(self, n, variables, packer):
+        """
+        Sums up the gradients of all components for a batch of n states
 
-        res = numpy.zeros(sum([len(variables[v])
-                               if hasattr(variables[v], '__len__') else 1 
-                               for v in variables
-                               if v in self.differentiable_variables]))
+        :param n: number of states
+        :type n: int
 
-        for n, f in self._components.iteritems():
-            if len(f.variables) > 0 and len(f.differentiable_variables) > 0:
-                res += f.gradient(**{x: vars[x] for x in vars 
-                                     if x in f.variables})
+        :param variables: batched values for all variables of the
+                          components
+        :type variables: dict
+
+        :param packer: layout of (a single row of) the gradient
+        :type packer: :class:`.VariablePacker`
+
+        :returns: gradients of all states, one per row
+        :rtype: :class:`numpy.ndarray`
+        """
+        plan = [entry for entry in self._get_component_plan()
+                if len(entry[3]) > 0]
+        calls = [(cname, '_gradient_batch', (n, {x: variables[x] for x in names}), {})
+                 for cname, _, names, _ in plan]
+        res = numpy.zeros((n, packer.size))
+        for entry, grad in zip(plan, self._call_components(calls)):
+            weight = self._get_component_weight(entry[0])
+            if weight != 1.0:
+                grad = weight * grad
+            packer.add_gradient(res, entry[3], grad, variables)
 
         return res
+
+    def _evaluate_log_prob_and_gradient_batch(self, **variables):
+
+        n = self._get_batch_size(variables)
+        packer = self._get_gradient_packer(
+            {v: variables[v][0] for v in self.differentiable_variables
+             if v in variables})
+
+        return self._accumulate_log_prob_and_gradient_batch(n, variables,
+                                                            packer)
+
+    def _accumulate_log_prob_and_gradient_batch(self, n, variables, packer):
+        """
+        Sums up the log-probabilities and the gradients of all components
+        for a batch of n states, evaluating both in a single call to
+        each component
+
+        :param n: number of states
+        :type n: int
+
+        :param variables: batched values for all variables of the
+                          components
+        :type variables: dict
+
+        :param packer: layout of (a single row of) the gradient
+        :type packer: :class:`.VariablePacker`
+
+        :returns: log-probabilities and gradients (one per row)
+        :rtype: (:class:`numpy.ndarray`, :class:`numpy.ndarray`)
+        """
+        plan = self._get_component_plan()
+        calls = [(cname,
+                  '_log_prob_and_gradient_batch' if len(diff_names) > 0
+                  else '_log_prob_batch',
+                  (n, {x: variables[x] for x in names}), {})
+                 for cname, _, names, diff_names in plan]
+        log_probs = numpy.zeros(n)
+        gradients = numpy.zeros((n, packer.size))
+        for entry, result in zip(plan, self._call_components(calls)):
+            weight = self._get_component_weight(entry[0])
+            if len(entry[3]) > 0:
+                log_prob, grad = result
+                if weight != 1.0:
+                    grad = weight * grad
+                packer.add_gradient(gradients, entry[3], grad, variables)
+            else:
+                log_prob = result
+            log_probs += weight * log_prob
+
+        return log_probs, gradients
+
+    @property
+    def packer(self):
+        """
+        Returns the packer mapping this posterior's variables to a flat
+        vector, as set up by :meth:`setup_packer`
+
+        :returns: packer or None, if not set up yet
+        :rtype: :class:`.VariablePacker`
+        """
+        return self._packer
+
+    def setup_packer(self, **variables):
+        r"""
+        Sets up a packer mapping all variables of this posterior to a
+        flat vector and preallocates a buffer for flat gradients
+
+        :param \**variables: example values for all variables, from
+                             which the variable shapes are taken
+
+        :returns: the new packer
+        :rtype: :class:`.VariablePacker`
+        """
+        if set(variables.keys()) != set(self.variables):
+            msg = 'Packer has to be set up with values for all variables ' + \
+                  '({})'.format(', '.join(sorted(self.variables)))
+            raise ValueError(msg)
+        self._packer = VariablePacker.from_variables(**variables)
+        self._flat_gradient = self._packer.empty()
+
+        return self._packer
+
+    def log_prob_flat(self, x):
+        """
+        Evaluates the log-probability at a flat vector holding the values
+        of all variables as laid out by :attr:`packer`
+
+        :param x: flat vector of variable values
+        :type x: :class:`numpy.ndarray`
+
+        :returns: log-probability
+        :rtype: float
+        """
+        return self.log_prob(**self._packer.unravel(x))
+
+    def gradient_flat(self, x, out=None):
+        """
+        Evaluates the gradient (in the same convention as :meth:`gradient`)
+        at a flat vector holding the values of all variables as laid out
+        by :attr:`packer`. Entries for variables no component can be
+        differentiated w.r.t. are zero.
+
+        :param x: flat vector of variable values
+        :type x: :class:`numpy.ndarray`
+
+        :param out: buffer to write the gradient into. If not given, a
+                    buffer owned by this object is used, which is
+                    overwritten on the next call.
+        :type out: :class:`numpy.ndarray`
+
+        :returns: flat gradient
+        :rtype: :class:`numpy.ndarray`
+        """
+        variables = self._packer.unravel(x)
+        self._complete_variables(variables)
+        if out is None:
+            out = self._flat_gradient
+
+        return self._accumulate_gradient(variables, self._packer, out)
     
     def clone(self):
 
@@ -195,6 +760,8 @@ class Posterior(AbstractBinfPDF):
                               self.name)
 
         copy.set_fixed_variables_from_pdf(self)
+        copy.incremental = self.incremental
+        copy.beta = self.beta
         
         return copy
 
@@ -206,6 +773,169 @@ class Posterior(AbstractBinfPDF):
                        for P in self.priors}
 
         copy = self.__class__(cond_likelihoods, cond_priors, self.name)
+        copy.incremental = self.incremental
+        copy.beta = self.beta
         
         return copy
+
+    def conditional_view(self, **fixed_vars):
+
+        return ConditionalPosterior(self, **fixed_vars)
+
+
+class ConditionalPosterior(AbstractBinfPDF):
+
+    def __init__(self, posterior, **fixed_vars):
+        r"""
+        A lightweight view of a posterior distribution conditioned on the
+        values of some of its variables. Unlike a conditional posterior
+        built by :meth:`.Posterior.conditional_factory`, which clones all
+        likelihoods, forward models and error models, a view shares
+        components, data and parameters with the full posterior and only
+        holds one parameter ('slot') per fixed variable. Setting such a
+        parameter changes the conditioning value without touching any
+        component.
+
+        As components are shared, their gradients are still taken
+        w.r.t. all their differentiable variables; entries for fixed
+        variables are dropped when summing them up.
+
+        :param posterior: full posterior distribution
+        :type posterior: :class:`.Posterior`
+
+        :param \**fixed_vars: name / value pairs of the variables to
+                              condition on. Names which are not variables
+                              of the posterior are ignored.
+        """
+        super(ConditionalPosterior, self).__init__(posterior.name)
+
+        self._posterior = posterior
+        self._gradient_packer = None
+
+        for v in posterior.variables:
+            self._register_variable(v, v in posterior.differentiable_variables)
+        self.update_var_param_types(**posterior.var_param_types)
+        self._set_original_variables()
+        self.fix_variables(**self._get_variables_intersection(fixed_vars))
+
+    @property
+    def posterior(self):
+        """
+        Returns the full posterior distribution this object is a view of
+
+        :returns: full posterior distribution
+        :rtype: :class:`.Posterior`
+        """
+        return self._posterior
+
+    @property
+    def version(self):
+        """
+        Returns a counter which increases whenever this view or the full
+        posterior distribution change in a way which is not reflected by
+        the values of the parameters of this view
+
+        :returns: version counter
+        :rtype: int
+        """
+        return self._version + self._posterior.version
+
+    @property
+    def likelihoods(self):
+        """
+        Returns the likelihoods of the full posterior distribution
+
+        :returns: likelihoods
+        :rtype: dict
+        """
+        return self._posterior.likelihoods
+
+    @property
+    def priors(self):
+        """
+        Returns the priors of the full posterior distribution
+
+        :returns: priors
+        :rtype: dict
+        """
+        return self._posterior.priors
+
+    def _get_gradient_packer(self, variables):
+        """
+        Returns the layout of the gradient vector w.r.t. the
+        differentiable variables which are not fixed
+        """
+        packer = self._gradient_packer
+        if packer is None or not packer.matches(variables):
+            packer = VariablePacker.from_variables(
+                **{v: variables[v] for v in self.differentiable_variables})
+            self._gradient_packer = packer
+
+        return packer
+
+    def _evaluate_log_prob(self, **variables):
+
+        return self._posterior.log_prob(**variables)
+
+    def _evaluate_log_prob_batch(self, **variables):
+
+        n = self._get_batch_size(variables)
+
+        return self._posterior._log_prob_batch(n, variables)
+
+    def _evaluate_gradient(self, **variables):
+
+        packer = self._get_gradient_packer(variables)
+        self._posterior._complete_variables(variables)
+
+        return self._posterior._accumulate_gradient(variables, packer,
+                                                    packer.empty())
+
+    def _evaluate_gradient_into(self, out, **variables):
+
+        packer = self._get_gradient_packer(variables)
+        self._posterior._complete_variables(variables)
+
+        return self._posterior._accumulate_gradient(variables, packer, out)
+
+    def _evaluate_log_prob_and_gradient(self, **variables):
+
+        packer = self._get_gradient_packer(variables)
+        self._posterior._complete_variables(variables)
+
+        return self._posterior._accumulate_log_prob_and_gradient(variables,
+                                                                 packer)
+
+    def _evaluate_log_prob_and_gradient_into(self, out, **variables):
+
+        packer = self._get_gradient_packer(variables)
+        self._posterior._complete_variables(variables)
+
+        return self._posterior._accumulate_log_prob_and_gradient(variables,
+                                                                 packer, out)
+
+    def _evaluate_gradient_batch(self, **variables):
+
+        n = self._get_batch_size(variables)
+        packer = self._get_gradient_packer(
+            {v: variables[v][0] for v in self.differentiable_variables})
+        self._posterior._complete_variables_batch(variables, n)
+
+        return self._posterior._accumulate_gradient_batch(n, variables,
+                                                          packer)
+
+    def _evaluate_log_prob_and_gradient_batch(self, **variables):
+
+        n = self._get_batch_size(variables)
+        packer = self._get_gradient_packer(
+            {v: variables[v][0] for v in self.differentiable_variables})
+        self._posterior._complete_variables_batch(variables, n)
+
+        return self._posterior._accumulate_log_prob_and_gradient_batch(
+            n, variables, packer)
+
+    def clone(self):
+
+        return self.__class__(self._posterior,
+                              **{p: self[p].value for p in self.parameters})
         
@@ -2,47 +2,238 @@
 This module contains implementations of various MCMC samplers
 """
 
+from collections import OrderedDict
+
+import numpy
+
 from csb.statistics.samplers import State
 from csb.statistics.samplers.mc.singlechain import AbstractSingleChainMC
 
+from binf.pdf.packing import VariablePacker
+from binf.samplers.trace import Trace, DiskTrace, TraceReader
+
+## layouts are shared between all states holding variables
+## of the same names and shapes. Only the most recently used
+## layouts are kept, so that states with ever-changing shapes
+## do not make this cache grow without bounds; states keep
+## their layout alive themselves.
+MAX_LAYOUTS = 128
+_layouts = OrderedDict()
+
+
+def get_state_layout(names, shapes):
+    """
+    Returns the layout for states holding variables of the given
+    names and shapes. Layouts are created only once and then shared,
+    as long as they are among the MAX_LAYOUTS most recently used ones.
+
+    :param names: variable names in storage order
+    :type names: list
+
+    :param shapes: shapes of the variables; () for scalars
+    :type shapes: list
+
+    :returns: layout mapping variable names to slices of a flat vector
+    :rtype: :class:`.VariablePacker`
+    """
+    key = (tuple(names), tuple(tuple(s) for s in shapes))
+    layout = _layouts.pop(key, None)
+    if layout is None:
+        layout = VariablePacker(*key)
+    _layouts[key] = layout
+
+    while len(_layouts) > MAX_LAYOUTS:
+        _layouts.popitem(last=False)
+
+    return layout
+
 
 class BinfState(object):
 
-    def __init__(self, variables={}, momenta={}):
+    __slots__ = ('_layout', '_slices', '_shapes', '_buffer', '_views',
+                 '_momenta')
+
+    def __init__(self, variables={}, momenta={}, layout=None):
         """
         Supposed to represent a state in a Markov chain, containing
-        named and typed variables, which hold model parameter values.
+        named variables, which hold model parameter values.
 
-        :param variables: named and typed variables and values
+        Variable values are stored in a single contiguous float64
+        vector, whose layout (the slice each variable occupies) is
+        shared between all states of the same model.
+
+        :param variables: named variables and values
         :type variables: dict
+
+        :param momenta: named momenta and values
+        :type momenta: dict
+
+        :param layout: layout of the flat vector holding the variable
+                       values. If not given, a shared layout matching
+                       the variable shapes is used.
+        :type layout: :class:`.VariablePacker`
         """
-        self._variables = {}
+        if layout is None:
+            names = sorted(variables.keys())
+            layout = get_state_layout(names,
+                                      [numpy.shape(variables[n]) for n in names])
+        self._set_layout(layout)
         self._momenta = {}
-        
+
         self.update_variables(**variables)
         self.update_momenta(**momenta)
 
+    def _set_layout(self, layout, buffer=None):
+        """
+        Sets the layout and the flat vector and makes read-only views
+        of the array-valued variables
+        """
+        self._layout = layout
+        self._slices = layout.slices
+        self._shapes = dict(zip(layout.names, layout.shapes))
+        self._buffer = layout.empty() if buffer is None else buffer
+        self._views = {}
+        for name, shape in self._shapes.items():
+            if shape != ():
+                view = self._buffer[self._slices[name]].reshape(shape)
+                view.flags.writeable = False
+                self._views[name] = view
+
+    def _relayout(self, **variables):
+        """
+        Moves to a new layout accommodating new variables or variables
+        whose shape changed
+        """
+        old = self.variables
+        old.update(variables)
+        names = sorted(old.keys())
+        layout = get_state_layout(names, [numpy.shape(old[n]) for n in names])
+        self._set_layout(layout)
+        layout.ravel(old, self._buffer)
+
+    @property
+    def layout(self):
+        """
+        Returns the layout of the flat vector holding the variable values
+
+        :returns: layout
+        :rtype: :class:`.VariablePacker`
+        """
+        return self._layout
+
+    @property
+    def names(self):
+        """
+        Returns the names of the variables held by this state
+
+        :returns: variable names in storage order
+        :rtype: tuple
+        """
+        return self._layout.names
+
+    @property
+    def buffer(self):
+        """
+        Returns a read-only view of the flat vector holding
+        the variable values
+
+        :returns: flat vector
+        :rtype: :class:`numpy.ndarray`
+        """
+        view = self._buffer.view()
+        view.flags.writeable = False
+
+        return view
+
+    def __getitem__(self, name):
+        """
+        Returns the value of a single variable; a read-only view for
+        array-valued variables, a float for scalars
+        """
+        view = self._views.get(name)
+        if view is not None:
+            return view
+
+        return float(self._buffer[self._slices[name].start])
+
+    def __contains__(self, name):
+
+        return name in self._slices
+
     @property
     def variables(self):
         """
-        Returns a copy (!) of the variables and their values
-        held by this state
+        Returns the variables and their values held by this state.
+        Array-valued variables are read-only views (!) of this state's
+        storage and thus reflect later updates; use :meth:`snapshot`
+        to keep values.
 
-        :returns: copy of variables
+        :returns: variables
         :rtype: dict
         """
-        return self._variables.copy()
+        return {name: self[name] for name in self._layout.names}
 
     def update_variables(self, **variables):
         r"""
         Updates variables
 
-        :param \**variables: named and typed variables to update
-                             this state with
+        :param \**variables: named variables to update this state with
         :type \**variables: dict
         """
-        self._variables.update(variables)
-        
+        slices = self._slices
+        shapes = self._shapes
+        for name, value in variables.items():
+            if name not in slices or numpy.shape(value) != shapes[name]:
+                self._relayout(**variables)
+                return
+        for name, value in variables.items():
+            self._buffer[slices[name]] = numpy.ravel(value)
+
+    def copy_into(self, buffer):
+        """
+        Copies the variable values into a flat vector laid out
+        as given by :attr:`layout`
+
+        :param buffer: flat vector to copy values into
+        :type buffer: :class:`numpy.ndarray`
+
+        :returns: buffer
+        :rtype: :class:`numpy.ndarray`
+        """
+        buffer[...] = self._buffer
+
+        return buffer
+
+    def snapshot(self):
+        """
+        Makes an independent copy of this state sharing its layout
+
+        :returns: copy of this state
+        :rtype: :class:`.BinfState`
+        """
+        state = BinfState.__new__(BinfState)
+        state._set_layout(self._layout, self._buffer.copy())
+        state._momenta = self._momenta.copy()
+
+        return state
+
+    def __copy__(self):
+
+        return self.snapshot()
+
+    def __deepcopy__(self, memo):
+
+        return self.snapshot()
+
+    def __getstate__(self):
+
+        return self.variables, self._momenta
+
+    def __setstate__(self, state):
+
+        variables, momenta = state
+        self.__init__(variables, momenta)
+
     @property
     def momenta(self):
         """
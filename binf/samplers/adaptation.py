@@ -0,0 +1,428 @@
+"""
+Adaptation of sampler settings during a warmup phase
+"""
+
+import numpy
+
+
+class WarmupSchedule(object):
+
+    def __init__(self, n_warmup, init_buffer=75, term_buffer=50,
+                 base_window=25):
+        """
+        Splits the warmup phase into an initial fast window, a series of
+        slow windows of doubling length and a terminal fast window.
+        Quantities which need many samples to be estimated (e.g., a mass
+        matrix) are adapted at the end of each slow window; the time
+        step is adapted throughout.
+
+        If the warmup phase is too short for the requested window sizes,
+        15% / 75% / 10% of it are used for the initial / slow / terminal
+        windows.
+
+        :param n_warmup: number of warmup iterations
+        :type n_warmup: int
+
+        :param init_buffer: length of the initial fast window
+        :type init_buffer: int
+
+        :param term_buffer: length of the terminal fast window
+        :type term_buffer: int
+
+        :param base_window: length of the first slow window
+        :type base_window: int
+        """
+        if n_warmup < 0:
+            raise ValueError('n_warmup has to be non-negative')
+
+        if init_buffer + base_window + term_buffer > n_warmup:
+            init_buffer = int(0.15 * n_warmup)
+            term_buffer = int(0.1 * n_warmup)
+            base_window = n_warmup - init_buffer - term_buffer
+
+        self._n_warmup = n_warmup
+        self._slow_start = init_buffer
+        self._slow_end = n_warmup - term_buffer
+        self._window_ends = []
+
+        start, size = init_buffer, base_window
+        while size > 0 and start + size <= self._slow_end:
+            ## extend the window if the next one would not fit
+            if start + 3 * size > self._slow_end:
+                size = self._slow_end - start
+            self._window_ends.append(start + size)
+            start += size
+            size *= 2
+
+    @property
+    def n_warmup(self):
+        """
+        Returns the number of warmup iterations
+
+        :returns: number of warmup iterations
+        :rtype: int
+        """
+        return self._n_warmup
+
+    @property
+    def window_ends(self):
+        """
+        Returns the iterations after which slow windows end
+
+        :returns: iteration counts
+        :rtype: list
+        """
+        return list(self._window_ends)
+
+    def in_slow_window(self, iteration):
+        """
+        Checks whether an iteration (counting from one) lies in a slow
+        window
+
+        :param iteration: iteration
+        :type iteration: int
+
+        :returns: whether the iteration lies in a slow window
+        :rtype: bool
+        """
+        return self._slow_start < iteration <= self._slow_end
+
+    def is_window_end(self, iteration):
+        """
+        Checks whether a slow window ends after an iteration (counting
+        from one)
+
+        :param iteration: iteration
+        :type iteration: int
+
+        :returns: whether a slow window ends after the iteration
+        :rtype: bool
+        """
+        return iteration in self._window_ends
+
+
+class DualAveragingAdapter(object):
+
+    def __init__(self, n_warmup, target_acceptance=0.8, gamma=0.05,
+                 t0=10.0, kappa=0.75, schedule=None):
+        """
+        Adapts the time step of an HMC sampler during warmup by Nesterov
+        dual averaging (Hoffman & Gelman, J Mach Learn Res 15, 2014)
+        such that the mean acceptance probability approaches a target
+        value. Dual averaging is restarted at the end of each slow
+        warmup window; after warmup, the time step is frozen to the
+        averaged value.
+
+        :param n_warmup: number of warmup iterations
+        :type n_warmup: int
+
+        :param target_acceptance: target acceptance probability
+        :type target_acceptance: float
+
+        :param gamma: regularization scale
+        :type gamma: float
+
+        :param t0: offset damping early iterations
+        :type t0: float
+
+        :param kappa: exponent of the averaging weights
+        :type kappa: float
+
+        :param schedule: warmup windows; defaults to a
+                         :class:`.WarmupSchedule` with default window sizes
+        :type schedule: :class:`.WarmupSchedule`
+        """
+        if not 0.0 < target_acceptance < 1.0:
+            raise ValueError('target_acceptance has to be in (0, 1)')
+
+        self.target_acceptance = target_acceptance
+        self.gamma = gamma
+        self.t0 = t0
+        self.kappa = kappa
+        if schedule is None:
+            schedule = WarmupSchedule(n_warmup)
+        self._schedule = schedule
+
+        self._iteration = 0
+        self._restart(1.0)
+
+    def _restart(self, timestep):
+        """
+        Restarts dual averaging, shrinking the time step towards a value
+        somewhat larger than the given one
+        """
+        self._mu = numpy.log(10.0 * timestep)
+        self._m = 0
+        self._h_bar = 0.0
+        self._log_timestep_bar = 0.0
+
+    def reset(self, timestep):
+        """
+        Starts a new warmup phase
+
+        :param timestep: initial time step
+        :type timestep: float
+        """
+        self._iteration = 0
+        self._restart(timestep)
+
+    @property
+    def schedule(self):
+        """
+        Returns the warmup windows
+
+        :returns: warmup windows
+        :rtype: :class:`.WarmupSchedule`
+        """
+        return self._schedule
+
+    @property
+    def iteration(self):
+        """
+        Returns the number of iterations seen so far
+
+        :returns: number of iterations
+        :rtype: int
+        """
+        return self._iteration
+
+    @property
+    def adapting(self):
+        """
+        Returns whether the warmup phase is still going on
+
+        :returns: whether the time step is still adapted
+        :rtype: bool
+        """
+        return self._iteration < self._schedule.n_warmup
+
+    def adapt(self, timestep, acceptance_probability):
+        """
+        Updates the time step after an iteration
+
+        :param timestep: time step used in the iteration
+        :type timestep: float
+
+        :param acceptance_probability: Metropolis acceptance probability
+                                       of the iteration
+        :type acceptance_probability: float
+
+        :returns: time step for the next iteration
+        :rtype: float
+        """
+        if not self.adapting:
+            return timestep
+
+        self._iteration += 1
+        self._m += 1
+        eta = 1.0 / (self._m + self.t0)
+        self._h_bar = ((1.0 - eta) * self._h_bar +
+                       eta * (self.target_acceptance - acceptance_probability))
+        log_timestep = self._mu - numpy.sqrt(self._m) / self.gamma * self._h_bar
+        weight = self._m ** -self.kappa
+        self._log_timestep_bar = (weight * log_timestep +
+                                  (1.0 - weight) * self._log_timestep_bar)
+
+        if not self.adapting:
+            return float(numpy.exp(self._log_timestep_bar))
+        if self._schedule.is_window_end(self._iteration):
+            self._restart(numpy.exp(log_timestep))
+
+        return float(numpy.exp(log_timestep))
+
+    def checkpoint(self):
+        """
+        Returns the adaptation state
+
+        :returns: adaptation state
+        :rtype: dict
+        """
+        return {'iteration': self._iteration, 'mu': self._mu, 'm': self._m,
+                'h_bar': self._h_bar,
+                'log_timestep_bar': self._log_timestep_bar}
+
+    def restore(self, checkpoint):
+        """
+        Restores the adaptation state
+
+        :param checkpoint: adaptation state as returned by :meth:`checkpoint`
+        :type checkpoint: dict
+        """
+        self._iteration = checkpoint['iteration']
+        self._mu = checkpoint['mu']
+        self._m = checkpoint['m']
+        self._h_bar = checkpoint['h_bar']
+        self._log_timestep_bar = checkpoint['log_timestep_bar']
+
+
+class WelfordEstimator(object):
+
+    def __init__(self, dense=False):
+        """
+        Streaming estimator of the mean and the (co)variance of
+        flat vectors by Welford's algorithm
+
+        :param dense: whether to estimate the full covariance matrix
+                      instead of the variances only
+        :type dense: bool
+        """
+        self.dense = dense
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets all samples
+        """
+        self.n = 0
+        self.mean = None
+        self.m2 = None
+
+    def update(self, x):
+        """
+        Adds a sample
+
+        :param x: sample
+        :type x: :class:`numpy.ndarray`
+        """
+        x = numpy.ravel(x).astype(float)
+        if self.mean is None:
+            self.mean = numpy.zeros_like(x)
+            self.m2 = numpy.zeros((len(x), len(x)) if self.dense else len(x))
+
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        if self.dense:
+            self.m2 += numpy.outer(x - self.mean, delta)
+        else:
+            self.m2 += (x - self.mean) * delta
+
+    def covariance(self):
+        """
+        Returns the sample (co)variance
+
+        :returns: variances or covariance matrix
+        :rtype: :class:`numpy.ndarray`
+        """
+        if self.n < 2:
+            raise ValueError('At least two samples are needed')
+
+        return self.m2 / (self.n - 1)
+
+
+class MassMatrixAdapter(object):
+
+    def __init__(self, n_warmup, dense=False, schedule=None):
+        """
+        Adapts the mass matrix of an HMC sampler during warmup. Positions
+        visited in each slow warmup window are used to estimate the
+        posterior (co)variance, which, shrunk towards a small multiple of
+        the identity, becomes the inverse mass matrix at the end of the
+        window.
+
+        :param n_warmup: number of warmup iterations
+        :type n_warmup: int
+
+        :param dense: whether to adapt a dense instead of a diagonal
+                      mass matrix
+        :type dense: bool
+
+        :param schedule: warmup windows; defaults to a
+                         :class:`.WarmupSchedule` with default window sizes.
+                         Should be the same as the one of the time step
+                         adapter.
+        :type schedule: :class:`.WarmupSchedule`
+        """
+        if schedule is None:
+            schedule = WarmupSchedule(n_warmup)
+        self._schedule = schedule
+        self._estimator = WelfordEstimator(dense)
+        self._iteration = 0
+
+    @property
+    def dense(self):
+        """
+        Returns whether a dense mass matrix is adapted
+
+        :returns: whether a dense mass matrix is adapted
+        :rtype: bool
+        """
+        return self._estimator.dense
+
+    @property
+    def adapting(self):
+        """
+        Returns whether the warmup phase is still going on
+
+        :returns: whether the mass matrix is still adapted
+        :rtype: bool
+        """
+        return self._iteration < self._schedule.n_warmup
+
+    def _make_metric(self):
+        """
+        Makes a metric from the current (co)variance estimate, regularized
+        as in Stan
+        """
+        from binf.samplers.metrics import DiagonalMetric, DenseMetric
+
+        n = self._estimator.n
+        covariance = self._estimator.covariance() * n / (n + 5.0)
+        if self.dense:
+            covariance += 1e-3 * 5.0 / (n + 5.0) * numpy.eye(len(covariance))
+            return DenseMetric(covariance)
+        else:
+            covariance += 1e-3 * 5.0 / (n + 5.0)
+            return DiagonalMetric(covariance)
+
+    def adapt(self, q):
+        """
+        Takes into account the position after an iteration
+
+        :param q: position after the iteration
+        :type q: :class:`numpy.ndarray`
+
+        :returns: new metric, if a slow window ended, else None
+        :rtype: :class:`.AbstractMetric`
+        """
+        if not self.adapting:
+            return None
+
+        self._iteration += 1
+        if self._schedule.in_slow_window(self._iteration):
+            self._estimator.update(q)
+        if (self._schedule.is_window_end(self._iteration)
+            and self._estimator.n > 1):
+            metric = self._make_metric()
+            self._estimator.reset()
+            return metric
+
+        return None
+
+    def checkpoint(self):
+        """
+        Returns the adaptation state
+
+        :returns: adaptation state
+        :rtype: dict
+        """
+        estimator = self._estimator
+
+        copy = lambda x: None if x is None else x.copy()
+
+        return {'iteration': self._iteration, 'n': estimator.n,
+                'mean': copy(estimator.mean), 'm2': copy(estimator.m2)}
+
+    def restore(self, checkpoint):
+        """
+        Restores the adaptation state
+
+        :param checkpoint: adaptation state as returned by :meth:`checkpoint`
+        :type checkpoint: dict
+        """
+        copy = lambda x: None if x is None else x.copy()
+
+        self._iteration = checkpoint['iteration']
+        self._estimator.n = checkpoint['n']
+        self._estimator.mean = copy(checkpoint['mean'])
+        self._estimator.m2 = copy(checkpoint['m2'])
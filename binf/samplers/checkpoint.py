@@ -0,0 +1,152 @@
+"""
+Checkpointing of samplers, so that interrupted simulations can be
+resumed exactly where they stopped
+"""
+
+import os
+import pickle
+
+import numpy
+
+CHECKPOINT_VERSION = 1
+
+
+def replace_file(source, destination):
+    """
+    Atomically moves a file to a destination, replacing any existing
+    file there. Uses os.replace where available (Python 3.3+), which
+    also replaces files on Windows, and os.rename, which replaces files
+    atomically on POSIX systems, else.
+
+    :param source: name of the file to move
+    :type source: str
+
+    :param destination: new file name
+    :type destination: str
+    """
+    getattr(os, 'replace', os.rename)(source, destination)
+
+
+def save_checkpoint(sampler, filename, n_steps=0):
+    """
+    Writes the mutable sampling state of a sampler, together with the
+    state of NumPy's random number generator, to a file. The file is
+    synced to disk and then replaced atomically, so that neither an
+    interruption while writing nor a crash leaves a broken checkpoint
+    behind.
+
+    :param sampler: sampler implementing checkpoint() and restore()
+    :type sampler: :class:`.GibbsSampler`, :class:`.HMCSampler`, ...
+
+    :param filename: checkpoint file name
+    :type filename: str
+
+    :param n_steps: number of sampling steps performed so far
+    :type n_steps: int
+    """
+    checkpoint = {'version': CHECKPOINT_VERSION,
+                  'n_steps': n_steps,
+                  'sampler': sampler.checkpoint(),
+                  'random_state': numpy.random.get_state()}
+    with open(filename + '.tmp', 'wb') as f:
+        pickle.dump(checkpoint, f, pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    replace_file(filename + '.tmp', filename)
+
+
+def load_checkpoint(sampler, filename):
+    """
+    Restores the mutable sampling state of a sampler and the state of
+    NumPy's random number generator from a file written by
+    :func:`save_checkpoint`
+
+    :param sampler: sampler to restore, set up with the same PDF and
+                    subsamplers as the checkpointed one
+    :type sampler: :class:`.GibbsSampler`, :class:`.HMCSampler`, ...
+
+    :param filename: checkpoint file name
+    :type filename: str
+
+    :returns: number of sampling steps performed before checkpointing
+    :rtype: int
+    """
+    with open(filename, 'rb') as f:
+        checkpoint = pickle.load(f)
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError('Unsupported checkpoint version {}'.format(
+            checkpoint.get('version')))
+
+    sampler.restore(checkpoint['sampler'])
+    numpy.random.set_state(checkpoint['random_state'])
+
+    return checkpoint['n_steps']
+
+
+class Checkpointer(object):
+
+    def __init__(self, sampler, filename, interval=1000):
+        """
+        Periodically checkpoints a sampler. Call :meth:`step` after each
+        sampling step; every interval steps, a checkpoint is written.
+
+        :param sampler: sampler implementing checkpoint() and restore()
+        :type sampler: :class:`.GibbsSampler`, :class:`.HMCSampler`, ...
+
+        :param filename: checkpoint file name
+        :type filename: str
+
+        :param interval: number of sampling steps between checkpoints
+        :type interval: int
+        """
+        if interval < 1:
+            raise ValueError('interval has to be a positive integer')
+
+        self._sampler = sampler
+        self._filename = filename
+        self._interval = interval
+        self._n_steps = 0
+
+    @property
+    def n_steps(self):
+        """
+        Returns the number of sampling steps performed so far,
+        including those before resuming
+
+        :returns: number of sampling steps
+        :rtype: int
+        """
+        return self._n_steps
+
+    def resume(self):
+        """
+        Restores the sampler from the checkpoint file, if it exists
+
+        :returns: number of sampling steps performed before checkpointing;
+                  0, if there is no checkpoint
+        :rtype: int
+        """
+        if os.path.exists(self._filename):
+            self._n_steps = load_checkpoint(self._sampler, self._filename)
+
+        return self._n_steps
+
+    def save(self):
+        """
+        Writes a checkpoint right away
+        """
+        save_checkpoint(self._sampler, self._filename, self._n_steps)
+
+    def step(self):
+        """
+        Counts a sampling step and writes a checkpoint if due
+
+        :returns: whether a checkpoint has been written
+        :rtype: bool
+        """
+        self._n_steps += 1
+        if self._n_steps % self._interval == 0:
+            self.save()
+            return True
+
+        return False
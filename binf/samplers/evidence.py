@@ -0,0 +1,381 @@
+"""
+Estimation of the model evidence (marginal likelihood) by thermodynamic
+integration and annealed importance sampling
+"""
+
+import numpy
+
+from csb.numeric import log_sum_exp
+
+from binf.samplers.hmc import MultiChainHMCSampler
+
+
+def _check_betas(betas):
+    """
+    Checks whether inverse temperatures increase from 0 to 1, as only
+    then the estimates are estimates of the log-evidence
+
+    :param betas: inverse temperatures
+    :type betas: list
+
+    :returns: inverse temperatures
+    :rtype: numpy.ndarray
+    """
+    betas = numpy.array(betas, dtype=float)
+    if betas.ndim != 1 or len(betas) < 2 or betas[0] != 0.0 or \
+       betas[-1] != 1.0 or numpy.any(numpy.diff(betas) <= 0.0):
+        msg = 'Inverse temperatures have to increase from 0 to 1, got {}'
+        raise ValueError(msg.format(betas))
+
+    return betas
+
+
+def _is_adapting(sampler):
+    """
+    Checks whether a sampler will adapt its time step or mass matrix
+    in its next move
+
+    :param sampler: HMC-like sampler
+    :type sampler: object
+
+    :returns: whether the sampler is still adapting
+    :rtype: bool
+    """
+    mass_matrix_adapter = getattr(sampler, 'mass_matrix_adapter', None)
+    if mass_matrix_adapter is not None and mass_matrix_adapter.adapting:
+        return True
+
+    adapters = getattr(sampler, 'adapters', None)
+    if adapters is None and getattr(sampler, 'adapter', None) is not None:
+        adapters = [sampler.adapter]
+    if adapters is not None:
+        return any(a.adapting for a in adapters)
+
+    limit = getattr(sampler, 'timestep_adaption_limit', 0)
+
+    return getattr(sampler, 'counter', 0) + 1 < limit
+
+
+def _stack_states(states):
+    """
+    Stacks the variable values of many states along a leading batch axis
+
+    :param states: states holding the same variables
+    :type states: list of :class:`.BinfState`
+
+    :returns: variable name / batched value pairs
+    :rtype: dict
+    """
+    return {var: numpy.array([state[var] for state in states])
+            for var in states[0].names}
+
+
+class ThermodynamicIntegration(object):
+
+    def __init__(self, sampler, betas, n_samples, n_burnin=0, thin=1):
+        r"""
+        Estimates the log-evidence by thermodynamic integration,
+
+        .. math::
+            \log Z = \int_0^1 \langle \log L \rangle_\beta \mathrm{d}\beta
+
+        where the average of the log-likelihood is taken w.r.t. the
+        posterior distribution with likelihoods tempered by the inverse
+        temperature beta (see :attr:`.Posterior.beta`). The Gibbs sampler
+        draws samples at each inverse temperature in turn, starting from
+        the final state of the previous one. The log-likelihoods of all
+        samples are evaluated in a single batched call, and the integral
+        is approximated by the trapezoidal rule.
+
+        :param sampler: Gibbs sampler for a posterior distribution
+        :type sampler: :class:`.GibbsSampler`
+
+        :param betas: increasing inverse temperatures, from 0 to 1
+        :type betas: list
+
+        :param n_samples: # of samples per inverse temperature
+        :type n_samples: int
+
+        :param n_burnin: # of Gibbs steps discarded after each change of
+                         the inverse temperature
+        :type n_burnin: int
+
+        :param thin: # of Gibbs steps per sample
+        :type thin: int
+        """
+        self.sampler = sampler
+        self.betas = _check_betas(betas)
+        self.n_samples = n_samples
+        self.n_burnin = n_burnin
+        self.thin = thin
+
+        self._log_likelihoods = None
+
+    @property
+    def log_likelihoods(self):
+        """
+        Returns the log-likelihoods of all samples
+
+        :returns: log-likelihoods, one row per inverse temperature
+        :rtype: numpy.ndarray
+        """
+        return self._log_likelihoods
+
+    @property
+    def mean_log_likelihoods(self):
+        """
+        Returns the average log-likelihood at each inverse temperature
+
+        :returns: average log-likelihoods
+        :rtype: numpy.ndarray
+        """
+        return self._log_likelihoods.mean(1)
+
+    def _get_quadrature_weights(self):
+        """
+        Returns the weights of the trapezoidal rule for the inverse
+        temperature ladder
+        """
+        d_betas = numpy.diff(self.betas)
+        weights = numpy.zeros(len(self.betas))
+        weights[:-1] += 0.5 * d_betas
+        weights[1:] += 0.5 * d_betas
+
+        return weights
+
+    @property
+    def log_evidence(self):
+        """
+        Returns the estimate of the log-evidence
+
+        :returns: log-evidence
+        :rtype: float
+        """
+        return numpy.dot(self._get_quadrature_weights(),
+                         self.mean_log_likelihoods)
+
+    @property
+    def standard_error(self):
+        """
+        Returns the standard error of the log-evidence estimate due to
+        the finite number of samples, neglecting autocorrelations. The
+        discretization error of the quadrature is not included.
+
+        :returns: standard error
+        :rtype: float
+        """
+        variances = self._log_likelihoods.var(1, ddof=1) / self.n_samples
+
+        return numpy.sqrt(numpy.dot(self._get_quadrature_weights() ** 2,
+                                    variances))
+
+    def run(self):
+        """
+        Samples at all inverse temperatures and estimates the log-evidence.
+        The inverse temperature of the posterior distribution is reset
+        afterwards.
+
+        :returns: log-evidence
+        :rtype: float
+        """
+        posterior = self.sampler.pdf
+        beta = posterior.beta
+        states = []
+        try:
+            for b in self.betas:
+                posterior.beta = b
+                for _ in range(self.n_burnin):
+                    self.sampler.sample()
+                for _ in range(self.n_samples):
+                    for _ in range(self.thin):
+                        self.sampler.sample()
+                    states.append(self.sampler.state.snapshot())
+        finally:
+            posterior.beta = beta
+
+        log_Ls = posterior.log_likelihood_batch(**_stack_states(states))
+        self._log_likelihoods = log_Ls.reshape(len(self.betas), self.n_samples)
+
+        return self.log_evidence
+
+
+class AnnealedImportanceSampling(object):
+
+    def __init__(self, sampler, betas, n_steps=1):
+        r"""
+        Estimates the log-evidence by annealed importance sampling. A
+        batch of particles, drawn from the prior distribution, is moved
+        along a ladder of inverse temperatures, while accumulating the
+        importance weights
+
+        .. math::
+            \log w = \sum_k (\beta_k - \beta_{k-1}) \log L(x_{k-1})
+
+        The log-likelihoods of all particles are evaluated in a single
+        batched call per inverse temperature.
+
+        With a :class:`.MultiChainHMCSampler`, whose PDF has to be a
+        :class:`.Posterior` with the sampled variable as its only
+        variable, all particles are moved together, one chain per
+        particle. With a :class:`.GibbsSampler`, which may sample
+        several variables, particles are moved one after another.
+
+        The sampler has to leave the tempered posterior distributions
+        invariant, so samplers which still adapt their time step or
+        mass matrix are rejected by :meth:`run`.
+
+        :param sampler: sampler for a posterior distribution
+        :type sampler: :class:`.MultiChainHMCSampler` or
+                       :class:`.GibbsSampler`
+
+        :param betas: increasing inverse temperatures, from 0 to 1
+        :type betas: list
+
+        :param n_steps: # of moves per inverse temperature
+        :type n_steps: int
+        """
+        self.sampler = sampler
+        self.betas = _check_betas(betas)
+        self.n_steps = n_steps
+
+        self._log_weights = None
+        self._states = None
+
+    @property
+    def _is_batched(self):
+        """
+        Returns whether all particles are moved together
+        """
+        return isinstance(self.sampler, MultiChainHMCSampler)
+
+    @property
+    def log_weights(self):
+        """
+        Returns the log-importance weights of the particles
+
+        :returns: log-importance weights
+        :rtype: numpy.ndarray
+        """
+        return self._log_weights
+
+    @property
+    def states(self):
+        """
+        Returns the final states of the particles, which, together with
+        the importance weights, represent the posterior distribution
+
+        :returns: final positions, one per row, for a
+                  :class:`.MultiChainHMCSampler` and final states else
+        :rtype: numpy.ndarray or list of :class:`.BinfState`
+        """
+        if self._is_batched:
+            return self._states.copy()
+        else:
+            return list(self._states)
+
+    @property
+    def log_evidence(self):
+        """
+        Returns the estimate of the log-evidence
+
+        :returns: log-evidence
+        :rtype: float
+        """
+        return log_sum_exp(self._log_weights) - numpy.log(len(self._log_weights))
+
+    @property
+    def effective_sample_size(self):
+        """
+        Returns the effective number of particles, which indicates how
+        reliable the estimate is
+
+        :returns: effective sample size
+        :rtype: float
+        """
+        w = numpy.exp(self._log_weights - self._log_weights.max())
+
+        return w.sum() ** 2 / numpy.sum(w ** 2)
+
+    def _check_not_adapting(self):
+        """
+        Raises a ValueError if the sampler or one of its subsamplers
+        still adapts its time step or mass matrix
+        """
+        if self._is_batched:
+            samplers = [self.sampler]
+        else:
+            samplers = list(self.sampler.subsamplers.values())
+        for sampler in samplers:
+            if _is_adapting(sampler):
+                msg = 'Sampler for variable "{}" is still adapting'
+                raise ValueError(msg.format(sampler.variable_name))
+
+    def _log_likelihoods(self, particles):
+        """
+        Evaluates the log-likelihoods of all particles in one batch
+        """
+        if self._is_batched:
+            variables = {self.sampler.variable_name: particles}
+        else:
+            variables = _stack_states(particles)
+
+        return self.sampler.pdf.log_likelihood_batch(**variables)
+
+    def _move(self, particles):
+        """
+        Performs n_steps moves of all particles
+        """
+        if self._is_batched:
+            self.sampler.states = particles
+            for _ in range(self.n_steps):
+                self.sampler.sample()
+
+            return self.sampler.states
+        else:
+            moved = []
+            for state in particles:
+                self.sampler.state.update_variables(**state.variables)
+                for _ in range(self.n_steps):
+                    self.sampler.sample()
+                moved.append(self.sampler.state.snapshot())
+
+            return moved
+
+    def run(self, initial_states):
+        """
+        Anneals the particles from the first to the last inverse
+        temperature and estimates the log-evidence. The inverse
+        temperature of the posterior distribution is reset afterwards.
+
+        :param initial_states: particles drawn from the distribution at
+                               the first inverse temperature, usually the
+                               prior distribution; positions, one per row,
+                               for a :class:`.MultiChainHMCSampler` and
+                               states else
+        :type initial_states: numpy.ndarray or list of :class:`.BinfState`
+
+        :returns: log-evidence
+        :rtype: float
+        """
+        self._check_not_adapting()
+
+        if self._is_batched:
+            particles = numpy.array(initial_states, dtype=float)
+        else:
+            particles = [state.snapshot() for state in initial_states]
+
+        posterior = self.sampler.pdf
+        beta = posterior.beta
+        log_weights = numpy.zeros(len(particles))
+        try:
+            for b_prev, b in zip(self.betas[:-1], self.betas[1:]):
+                log_weights += (b - b_prev) * self._log_likelihoods(particles)
+                posterior.beta = b
+                particles = self._move(particles)
+        finally:
+            posterior.beta = beta
+
+        self._log_weights = log_weights
+        self._states = particles
+
+        return self.log_evidence
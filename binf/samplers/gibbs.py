@@ -29,6 +29,8 @@ class GibbsSampler(AbstractSingleChainMC):
         self._pdf = None
         self._subsamplers = {}
         self._conditional_pdfs = {}
+        self._dependents = {}
+        self._variable_order = []
 
         self._state = state
         self._pdf = pdf
@@ -39,27 +41,82 @@ class GibbsSampler(AbstractSingleChainMC):
 
     def _setup_conditional_pdfs(self):
         """
-        Sets up the conditional PDFs from the full PDF 
+        Sets up the conditional PDFs from the full PDF. These are views
+        sharing components and data with the full PDF, if the latter
+        supports it (see :meth:`.AbstractBinfPDF.conditional_view`).
         """
-        for var in self.state.variables.keys():
-            fixed_vars = {x: self.state.variables[x]
-                          for x in self.state.variables if not x == var}
+        variables = self.state.variables
+        for var in variables:
+            fixed_vars = {x: variables[x] for x in variables if not x == var}
             fixed_vars.update(**{x: self._pdf[x].value
                                  for x in self._pdf.parameters 
                                  if x in self._pdf._original_variables})
-            cond_pdf = self._pdf.conditional_factory(**fixed_vars)
+            cond_pdf = self._pdf.conditional_view(**fixed_vars)
             self._conditional_pdfs.update({var: cond_pdf})
             self.subsamplers[var].pdf = self._conditional_pdfs[var]
 
+        self._variable_order = sorted(self._pdf.variables)
+        self._setup_dependency_graph()
+
+    def _get_neighbours(self):
+        """
+        For each variable, finds the variables it shares a component
+        (likelihood or prior) with. If the PDF does not consist of
+        components, all variables are considered neighbours.
+
+        :returns: variable name / set of neighbouring variable names pairs
+        :rtype: dict
+        """
+        variables = self.state.names
+        if not hasattr(self._pdf, '_get_component_variables_list'):
+            return {v: set(variables) for v in variables}
+
+        neighbours = {v: set() for v in variables}
+        for component_variables in self._pdf._get_component_variables_list().values():
+            shared = [v for v in component_variables if v in neighbours]
+            for v in shared:
+                neighbours[v].update(shared)
+
+        return neighbours
+
+    def _setup_dependency_graph(self):
+        """
+        Determines, for each variable, the conditional PDFs which depend
+        on it, so that a new value has to be pushed only to these.
+
+        Conditional PDFs do not track variables they do not share a
+        component with; the log-probability of components not depending
+        on the sampled variable then might be evaluated for outdated
+        values, which only shifts the conditional log-probability by a
+        constant.
+        """
+        neighbours = self._get_neighbours()
+        self._dependents = {}
+        for var, others in neighbours.items():
+            self._dependents[var] = [self._conditional_pdfs[x]
+                                     for x in sorted(others)
+                                     if x != var and x in self._conditional_pdfs
+                                     and var in self._conditional_pdfs[x].parameters]
+
+    def _push_variable(self, var, value):
+        """
+        Sets the value of a variable in all conditional PDFs depending
+        on it. PDFs already holding the value are left untouched, so that
+        subsamplers can keep results cached for them; the others get
+        their version counter increased.
+        """
+        for pdf in self._dependents.get(var, ()):
+            if not numpy.array_equal(pdf[var].value, value):
+                pdf[var].set(value)
+                pdf._bump_version()
+
     def _update_conditional_pdf_params(self):
         """
-        Updates parameters of the conditional PDFs to values set
-        in this object's PDF
+        Updates parameters of the conditional PDFs to the variable values
+        of this object's state
         """
-        for pdf in self._conditional_pdfs.values():
-            for param in pdf.parameters:
-                if param in self._state.variables.keys():
-                    pdf[param].set(self._state.variables[param])
+        for var in self._dependents:
+            self._push_variable(var, self._state[var])
         
     def _checkstate(self, state):
         """
@@ -118,11 +175,11 @@ class GibbsSampler(AbstractSingleChainMC):
         """
         from csb.statistics.samplers.mc import AbstractMC
 
-        for variable in self.state.variables:
+        for variable in self.state.names:
             if isinstance(self.subsamplers[variable], AbstractMC):
-                self.subsamplers[variable].state = State(self.state.variables[variable])
+                self.subsamplers[variable].state = State(self.state[variable])
             else:
-                self.subsamplers[variable].state = self.state.variables[variable]
+                self.subsamplers[variable].state = self.state[variable]
 
     def _update_state(self, **variables):
         """
@@ -142,14 +199,47 @@ class GibbsSampler(AbstractSingleChainMC):
         """
         ## needed for RE
         self._update_subsampler_states()
+        self._update_conditional_pdf_params()
         
-        for var in sorted(list(self._pdf.variables)):
-            self._update_conditional_pdf_params()
+        for var in self._variable_order:
             new = self.subsamplers[var].sample()
+            if type(new) == State:
+                new = new.position
             self._update_state(**{var: new})
+            self._push_variable(var, new)
 
         return self._state
 
+    def checkpoint(self):
+        """
+        Returns the mutable sampling state of this sampler, that is, a
+        copy of the current state and the sampling states of those
+        subsamplers which support checkpointing. Conditional PDFs are
+        not included, as they are updated from the state before each
+        sampling step.
+
+        :returns: sampling state
+        :rtype: dict
+        """
+        subsamplers = {var: sampler.checkpoint()
+                       for var, sampler in self.subsamplers.items()
+                       if hasattr(sampler, 'checkpoint')}
+
+        return {'state': self._state.snapshot(), 'subsamplers': subsamplers}
+
+    def restore(self, checkpoint):
+        """
+        Restores the mutable sampling state of this sampler
+
+        :param checkpoint: sampling state as returned by :meth:`checkpoint`
+        :type checkpoint: dict
+        """
+        self._state.update_variables(**checkpoint['state'].variables)
+        for var, sampler_checkpoint in checkpoint['subsamplers'].items():
+            self.subsamplers[var].restore(sampler_checkpoint)
+        self._update_subsampler_states()
+        self._update_conditional_pdf_params()
+
     def _calc_pacc():
         """
         Not applicable
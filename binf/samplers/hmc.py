@@ -9,13 +9,51 @@ import numpy as np
 
 from csb.numeric import exp
 
-HMCSampleStats = namedtuple('HMCSampleStats', 'accepted stepsize')
+from binf.samplers.metrics import IdentityMetric
+
+HMCSampleStats = namedtuple('HMCSampleStats',
+                            'accepted stepsize acceptance_probability adapting')
+MultiChainHMCSampleStats = namedtuple('MultiChainHMCSampleStats',
+                                      'accepted stepsize acceptance_probability')
+
+
+def _make_cache_key(pdf, q):
+    """
+    Makes a key identifying the input potential energies and gradients
+    are evaluated for: the version of the PDF, the current values of its
+    parameters and a position. Parameter values are compared by
+    identity, as setting a parameter replaces its value object, so no
+    conditioning data have to be copied or compared. Parameter arrays
+    modified in place thus are not noticed.
+    """
+    values = tuple(pdf[p].value for p in pdf.parameters)
+
+    return pdf.version, values, q
+
+
+def _cache_key_matches(pdf, key, q):
+    """
+    Checks whether a key made by :func:`_make_cache_key` matches a
+    position and the current state of a PDF
+    """
+    if key is None:
+        return False
+    version, values, cached_q = key
+    if version != pdf.version:
+        return False
+    current = [pdf[p].value for p in pdf.parameters]
+    if len(current) != len(values) or \
+       any(a is not b for a, b in zip(current, values)):
+        return False
+
+    return np.array_equal(cached_q, q)
 
 
 class HMCSampler(object):
 
     def __init__(self, pdf, state, timestep, nsteps, timestep_adaption_limit=0,
-                 adaption_uprate=1.05, adaption_downrate=0.95, variable_name=None):
+                 adaption_uprate=1.05, adaption_downrate=0.95, variable_name=None,
+                 adapter=None, metric=None, mass_matrix_adapter=None):
         """
         A Hamiltonian Monte Carlo implementation
 
@@ -47,6 +85,19 @@ class HMCSampler(object):
         :param variable_name: name of the variable this sampler is
                               supposed to draw random samples from
         :type variable_name: str
+
+        :param adapter: object adapting the time step during warmup. If
+                        given, timestep_adaption_limit, adaption_uprate
+                        and adaption_downrate are ignored.
+        :type adapter: :class:`.DualAveragingAdapter`
+
+        :param metric: mass matrix defining the kinetic energy; defaults
+                       to the identity
+        :type metric: :class:`.AbstractMetric`
+
+        :param mass_matrix_adapter: object adapting the mass matrix
+                                    during warmup
+        :type mass_matrix_adapter: :class:`.MassMatrixAdapter`
         """
         self.pdf = pdf
         self.state = state
@@ -56,11 +107,25 @@ class HMCSampler(object):
         self.adaption_uprate = adaption_uprate
         self.adaption_downrate = adaption_downrate
         self._variable_name = variable_name
+        self.adapter = adapter
+        if adapter is not None:
+            adapter.reset(timestep)
+        self.metric = IdentityMetric() if metric is None else metric
+        self.mass_matrix_adapter = mass_matrix_adapter
+
+        ## work buffers for position, gradient and intermediate results
+        self._position_buffer = None
+        self._gradient_buffer = None
+        self._step_buffer = None
 
         self._last_move_accepted = 0
+        self._last_acceptance_probability = 0.0
         self.n_accepted = 0
         self.counter = 0
 
+        self._cache_key = None
+        self._cached_potential_and_gradient = None
+
     @property
     def acceptance_rate(self):
         if self.counter > 0:
@@ -89,10 +154,67 @@ class HMCSampler(object):
         """
         return self._last_move_accepted
 
-    def _leapfrog(self, q, p, timestep, nsteps):
+    def _potential_and_gradient(self, q, out=None):
+        """
+        Evaluates the potential energy (the negative log-probability) and
+        its gradient in a single pass through the PDF
+
+        :param q: 'position'
+        :type q: numpy.ndarray
+
+        :param out: buffer to write the gradient into
+        :type out: numpy.ndarray
+
+        :returns: potential energy and its gradient
+        :rtype: (float, numpy.ndarray)
+        """
+        log_prob, gradient = self.pdf.log_prob_and_gradient(
+            out=out, **{self._variable_name: q})
+
+        return -log_prob, gradient
+
+    def _cached_potential_and_gradient_at(self, q):
+        """
+        Returns the potential energy and its gradient at the current
+        position, reusing the results of the previous iteration if
+        neither the position nor the PDF parameters (e.g., variables
+        fixed by a Gibbs sampler) changed since
+        """
+        if not _cache_key_matches(self.pdf, self._cache_key, q):
+            self._cached_potential_and_gradient = self._potential_and_gradient(q)
+            ## q is a work buffer, which the leap frog integrator overwrites
+            self._cache_key = _make_cache_key(self.pdf, np.array(q))
+
+        return self._cached_potential_and_gradient
+
+    def invalidate_cache(self):
+        """
+        Forgets the potential energy and gradient of the current position.
+        Only needed if the PDF changes in ways not reflected by its
+        parameters or its version, e.g., if data held by error models
+        or parameter arrays are changed in place.
+        """
+        self._cache_key = None
+        self._cached_potential_and_gradient = None
+
+    def _get_buffers(self, shape):
+        """
+        Returns the position, gradient and intermediate result buffers,
+        allocating them if they do not exist yet or have a wrong shape
+        """
+        for name in ('_position_buffer', '_gradient_buffer', '_step_buffer'):
+            buffer = getattr(self, name)
+            if buffer is None or buffer.shape != shape:
+                setattr(self, name, np.empty(shape))
+
+        return self._position_buffer, self._gradient_buffer, self._step_buffer
+
+    def _leapfrog(self, q, p, timestep, nsteps, initial_gradient=None):
         """
         Performs leap frog integration of Hamiltonian dynamics guided
-        by the gradient of the negative log-probability
+        by the gradient of the negative log-probability. Position and
+        momentum are updated in place; gradients are written into the
+        gradient buffer, so no arrays are allocated per step.
 
         :param q: initial 'position'
         :type q: numpy.ndarray
@@ -106,23 +228,32 @@ class HMCSampler(object):
         :param nsteps: # of integration steps
         :type nsteps: int
 
-        :returns: 'position' and 'momentum' at the end of the
-                  approximated MD trajectory
-        :rtype: (numpy.ndarray, numpy.ndarray)
+        :param initial_gradient: gradient at the initial position, if
+                                 already known
+        :type initial_gradient: numpy.ndarray
+
+        :returns: 'position', 'momentum', potential energy and its
+                  gradient at the end of the approximated MD trajectory
+        :rtype: (numpy.ndarray, numpy.ndarray, float, numpy.ndarray)
         """
+        _, grad, step = self._get_buffers(q.shape)
+        gradient = lambda x: self.pdf.gradient(out=grad,
+                                               **{self._variable_name: x})
+        velocity = self.metric.velocity
 
-        gradient = lambda x: self.pdf.gradient(**{self._variable_name: x})
-        
-        p -= 0.5 * timestep * gradient(q)
+        if initial_gradient is None:
+            initial_gradient = gradient(q)
+        p -= np.multiply(initial_gradient, 0.5 * timestep, out=step)
 
         for i in range(nsteps-1):
-            q += p * timestep
-            p -= timestep * gradient(q)
+            q += np.multiply(velocity(p), timestep, out=step)
+            p -= np.multiply(gradient(q), timestep, out=step)
 
-        q += p * timestep
-        p -= 0.5 * timestep * gradient(q)        
+        q += np.multiply(velocity(p), timestep, out=step)
+        E_pot, final_gradient = self._potential_and_gradient(q, grad)
+        p -= np.multiply(final_gradient, 0.5 * timestep, out=step)
 
-        return q, p
+        return q, p, E_pot, final_gradient
 
     def _copy_state(self, state):
         """
@@ -140,28 +271,118 @@ class HMCSampler(object):
         :returns: a sample
         :rtype: numpy.ndarray
         """
-        V = lambda x: -self.pdf.log_prob(**{self._variable_name: x})
+        q = self._get_buffers(np.shape(self.state))[0]
+        np.copyto(q, self.state)
+        p = self.metric.sample_momentum(q.shape)
+
+        E_pot, grad = self._cached_potential_and_gradient_at(q)
+        E_before = E_pot + self.metric.kinetic_energy(p)
+        q, p, E_pot, grad = self._leapfrog(q, p, self.timestep, self.nsteps, grad)
+        E_after = E_pot + self.metric.kinetic_energy(p)
+        p_acc = float(min(1.0, exp(-(E_after - E_before))))
+        if not np.isfinite(p_acc):
+            p_acc = 0.0
+        acc = np.random.uniform() < p_acc
+
+        return self._finish_draw(q, E_pot, grad, acc, p_acc)
+
+    def _finish_draw(self, q, E_pot, grad, acc, p_acc):
+        """
+        Records the outcome of a move, adapts the time step and the mass
+        matrix and moves to the new position if the move was accepted.
+        The new position becomes read-only, as it is handed out as
+        a sample.
+
+        :param q: proposed position
+        :type q: numpy.ndarray
 
-        q = self._copy_state(self.state)
-        p = np.random.normal(size=q.shape)
+        :param E_pot: potential energy at the proposed position
+        :type E_pot: float
 
-        E_before = V(q) + 0.5 * np.sum(p ** 2)
-        q, p = self._leapfrog(q, p, self.timestep, self.nsteps)
-        E_after = V(q) + 0.5 * np.sum(p ** 2)
-        acc = np.random.uniform() < exp(-(E_after - E_before))
+        :param grad: gradient of the potential energy at the proposed
+                     position
+        :type grad: numpy.ndarray
 
+        :param acc: whether the move was accepted
+        :type acc: bool
+
+        :param p_acc: acceptance probability (statistic) of the move,
+                      which the time step adapter aims to keep at
+                      its target
+        :type p_acc: float
+
+        :returns: a sample; the state of this sampler, which must not be
+                  modified
+        :rtype: numpy.ndarray
+        """
         self._last_move_accepted = acc
+        self._last_acceptance_probability = p_acc
         self.counter += 1
 
-        if self.counter < self.timestep_adaption_limit:
+        if self.adapter is not None:
+            self.timestep = self.adapter.adapt(self.timestep, p_acc)
+        elif self.counter < self.timestep_adaption_limit:
             self._adapt_timestep()
 
         if acc:
+            q.flags.writeable = False
             self.state = q
             self.n_accepted += 1
-            return self._copy_state(q)
-        else:
-            return self._copy_state(self.state)
+            ## the work buffers now hold the state and its gradient
+            if q is self._position_buffer:
+                self._position_buffer = None
+            if grad is self._gradient_buffer:
+                self._gradient_buffer = None
+            ## the PDF did not change during the move, so only the
+            ## position in the key of the previous one is replaced
+            self._cached_potential_and_gradient = E_pot, grad
+            self._cache_key = self._cache_key[:2] + (q,)
+
+        if self.mass_matrix_adapter is not None:
+            metric = self.mass_matrix_adapter.adapt(self.state)
+            if metric is not None:
+                self.metric = metric
+
+        return self.state
+
+    def checkpoint(self):
+        """
+        Returns the mutable sampling state of this sampler, that is,
+        the current position and the time step adaption state
+
+        :returns: sampling state
+        :rtype: dict
+        """
+        return {'state': self._copy_state(self.state),
+                'timestep': self.timestep,
+                'counter': self.counter,
+                'n_accepted': self.n_accepted,
+                'last_move_accepted': self._last_move_accepted,
+                'last_acceptance_probability': self._last_acceptance_probability,
+                'adapter': None if self.adapter is None
+                           else self.adapter.checkpoint(),
+                'metric': deepcopy(self.metric),
+                'mass_matrix_adapter': None if self.mass_matrix_adapter is None
+                                       else self.mass_matrix_adapter.checkpoint()}
+
+    def restore(self, checkpoint):
+        """
+        Restores the mutable sampling state of this sampler
+
+        :param checkpoint: sampling state as returned by :meth:`checkpoint`
+        :type checkpoint: dict
+        """
+        self.state = self._copy_state(checkpoint['state'])
+        self.timestep = checkpoint['timestep']
+        self.counter = checkpoint['counter']
+        self.n_accepted = checkpoint['n_accepted']
+        self._last_move_accepted = checkpoint['last_move_accepted']
+        self._last_acceptance_probability = checkpoint['last_acceptance_probability']
+        if checkpoint['adapter'] is not None:
+            self.adapter.restore(checkpoint['adapter'])
+        self.metric = deepcopy(checkpoint['metric'])
+        if checkpoint['mass_matrix_adapter'] is not None:
+            self.mass_matrix_adapter.restore(checkpoint['mass_matrix_adapter'])
 
     @property
     def last_draw_stats(self):
@@ -171,14 +392,20 @@ class HMCSampler(object):
         This is usually used by a replica exchange scheme to log
         sampling statistics.
 
-        :returns: whether the last move has been accepted and the current
-                  time step in the shape of a named tuple in a dictionary.
+        :returns: whether the last move has been accepted, the current
+                  time step, the acceptance probability of the last move
+                  and whether the time step is still adapted in the shape of a named tuple in a dictionary.
                   This contrived is needed for Gibbs sampling / replica
                   exchange statistics.
         :rtype: dict
         """
+        adapting = self.adapter.adapting if self.adapter is not None else \
+                   self.counter < self.timestep_adaption_limit
+
         return {self.variable_name: HMCSampleStats(self.last_move_accepted,
-                                                   self.timestep)}
+                                                   self.timestep,
+                                                   self._last_acceptance_probability,
+                                                   adapting)}
 
     def _adapt_timestep(self):
         """
@@ -189,3 +416,285 @@ class HMCSampler(object):
             self.timestep *= self.adaption_uprate
         else:
             self.timestep *= self.adaption_downrate
+
+
+class MultiChainHMCSampler(object):
+
+    def __init__(self, pdf, states, timestep, nsteps, timestep_adaption_limit=0,
+                 adaption_uprate=1.05, adaption_downrate=0.95, variable_name=None,
+                 adapters=None):
+        """
+        Runs several HMC chains for the same PDF in lockstep. The positions
+        of all chains are held in one array, and each leap frog step
+        evaluates the gradients of all chains in a single call to the
+        batched gradient of the PDF (see :meth:`.AbstractBinfPDF.gradient_batch`).
+        Acceptance and time steps are handled per chain.
+
+        :param pdf: object representing the PDF this sampler is
+                    supposed to sample from
+        :type pdf: :class:`.AbstractBinfPDF`
+
+        :param states: initial positions of all chains, one per row
+        :type states: numpy.ndarray
+
+        :param timestep: integration step size for leap frog integrator,
+                         either common to or given for each chain
+        :type timestep: float or numpy.ndarray
+
+        :param nsteps: number of integration steps for leap frog integrator
+        :type nsteps: int
+
+        :param timestep_adaption_limit: # of samples after which to stop
+                                        automatically adapting the timesteps
+        :type timestep_adaption_limit: int
+
+        :param adaption_uprate: factor with which to multiply the time step
+                                of a chain in case of an accepted move
+        :type adaption_uprate: float
+
+        :param adaption_downrate: factor with which to multiply the time
+                                  step of a chain in case of a rejected move
+        :type adaption_downrate: float
+
+        :param variable_name: name of the variable this sampler is
+                              supposed to draw random samples from
+        :type variable_name: str
+
+        :param adapters: objects adapting the time step of each chain
+                         during warmup. If given, timestep_adaption_limit,
+                         adaption_uprate and adaption_downrate are ignored.
+        :type adapters: list of :class:`.DualAveragingAdapter`
+        """
+        states = np.array(states, dtype=float)
+        n_chains = len(states)
+        if adapters is not None and len(adapters) != n_chains:
+            raise ValueError('Got {} adapters for {} chains'.format(
+                len(adapters), n_chains))
+
+        self.pdf = pdf
+        self.states = states
+        self.timestep = np.array(np.broadcast_to(timestep, (n_chains,)),
+                                 dtype=float)
+        self.nsteps = nsteps
+        self.timestep_adaption_limit = timestep_adaption_limit
+        self.adaption_uprate = adaption_uprate
+        self.adaption_downrate = adaption_downrate
+        self._variable_name = variable_name
+        self.adapters = adapters
+        if adapters is not None:
+            for adapter, t in zip(adapters, self.timestep):
+                adapter.reset(t)
+
+        self._last_moves_accepted = np.zeros(n_chains, dtype=bool)
+        self._last_acceptance_probabilities = np.zeros(n_chains)
+        self.n_accepted = np.zeros(n_chains, dtype=int)
+        self.counter = 0
+
+        self._cache_key = None
+        self._cached_potentials_and_gradients = None
+
+    @property
+    def n_chains(self):
+        """
+        Returns the number of chains
+
+        :returns: number of chains
+        :rtype: int
+        """
+        return len(self.states)
+
+    @property
+    def variable_name(self):
+        """
+        Returns the name of the variable this sampler is supposed
+        to draw random samples from
+
+        :returns: variable name
+        :rtype: str
+        """
+        return 'HMC' if self._variable_name is None else self._variable_name
+
+    @property
+    def acceptance_rate(self):
+        """
+        Returns the acceptance rate of each chain
+
+        :returns: acceptance rates
+        :rtype: numpy.ndarray
+        """
+        if self.counter > 0:
+            return self.n_accepted / float(self.counter)
+        else:
+            return np.zeros(self.n_chains)
+
+    def _gradients(self, Q):
+        """
+        Evaluates the gradients of the potential energy for all chains
+
+        :param Q: positions, one per row
+        :type Q: numpy.ndarray
+
+        :returns: gradients, one per row
+        :rtype: numpy.ndarray
+        """
+        return self.pdf.gradient_batch(**{self._variable_name: Q})
+
+    def _potentials_and_gradients(self, Q):
+        """
+        Evaluates the potential energies and their gradients for all
+        chains in a single pass through the PDF
+
+        :param Q: positions, one per row
+        :type Q: numpy.ndarray
+
+        :returns: potential energies and gradients, one per row
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        log_probs, gradients = self.pdf.log_prob_and_gradient_batch(
+            **{self._variable_name: Q})
+
+        return -np.asarray(log_probs), gradients
+
+    def _cached_potentials_and_gradients_at(self, Q):
+        """
+        Returns the potential energies and gradients at the current
+        positions, reusing those of the previous iteration if neither
+        the positions nor the PDF changed since
+        """
+        if not _cache_key_matches(self.pdf, self._cache_key, Q):
+            self._cached_potentials_and_gradients = self._potentials_and_gradients(Q)
+            self._cache_key = _make_cache_key(self.pdf, Q.copy())
+
+        return self._cached_potentials_and_gradients
+
+    def invalidate_cache(self):
+        """
+        Forgets the potential energies and gradients of the current
+        positions
+        """
+        self._cache_key = None
+        self._cached_potentials_and_gradients = None
+
+    def _leapfrog(self, Q, P, nsteps, initial_gradients):
+        """
+        Performs synchronized leap frog integration for all chains, each
+        with its own time step. Positions and momenta are updated in place.
+
+        :param Q: initial positions, one per row
+        :type Q: numpy.ndarray
+
+        :param P: initial momenta, one per row
+        :type P: numpy.ndarray
+
+        :param nsteps: # of integration steps
+        :type nsteps: int
+
+        :param initial_gradients: gradients at the initial positions
+        :type initial_gradients: numpy.ndarray
+
+        :returns: positions, momenta, potential energies and gradients at
+                  the end of the approximated MD trajectories
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        timestep = self.timestep.reshape((-1,) + (1,) * (Q.ndim - 1))
+        step = np.empty_like(Q)
+
+        P -= np.multiply(initial_gradients, 0.5 * timestep, out=step)
+        for i in range(nsteps-1):
+            Q += np.multiply(P, timestep, out=step)
+            P -= np.multiply(self._gradients(Q), timestep, out=step)
+        Q += np.multiply(P, timestep, out=step)
+        E_pot, gradients = self._potentials_and_gradients(Q)
+        P -= np.multiply(gradients, 0.5 * timestep, out=step)
+
+        return Q, P, E_pot, gradients
+
+    def sample(self):
+        """
+        Performs one HMC move for each chain
+
+        :returns: positions of all chains, one per row. The array is
+                  replaced, not modified, by later moves.
+        :rtype: numpy.ndarray
+        """
+        Q = self.states.copy()
+        P = np.random.normal(size=Q.shape)
+        axes = tuple(range(1, Q.ndim))
+
+        E_pot, gradients = self._cached_potentials_and_gradients_at(self.states)
+        E_before = E_pot + 0.5 * np.sum(P ** 2, axes)
+        Q, P, E_pot_new, gradients_new = self._leapfrog(Q, P, self.nsteps,
+                                                        gradients)
+        E_after = E_pot_new + 0.5 * np.sum(P ** 2, axes)
+        with np.errstate(over='ignore', invalid='ignore'):
+            p_acc = np.minimum(1.0, np.exp(-(E_after - E_before)))
+        p_acc[~np.isfinite(p_acc)] = 0.0
+        acc = np.random.uniform(size=self.n_chains) < p_acc
+
+        self._last_moves_accepted = acc
+        self._last_acceptance_probabilities = p_acc
+        self.counter += 1
+        self.n_accepted += acc
+
+        if self.adapters is not None:
+            self.timestep = np.array([a.adapt(t, p) for a, t, p in
+                                      zip(self.adapters, self.timestep, p_acc)])
+        elif self.counter < self.timestep_adaption_limit:
+            self.timestep = np.where(acc, self.timestep * self.adaption_uprate,
+                                     self.timestep * self.adaption_downrate)
+
+        if np.any(acc):
+            mask = acc.reshape((-1,) + (1,) * (Q.ndim - 1))
+            self.states = np.where(mask, Q, self.states)
+            self._cached_potentials_and_gradients = (
+                np.where(acc, E_pot_new, E_pot),
+                np.where(mask, gradients_new, gradients))
+            self._cache_key = self._cache_key[:2] + (self.states,)
+        self.states.flags.writeable = False
+
+        return self.states
+
+    @property
+    def last_draw_stats(self):
+        """
+        Returns information about the most recently performed moves
+
+        :returns: whether the last move of each chain has been accepted,
+                  the current time steps and the acceptance probabilities
+                  of the last moves in the shape of a named tuple in a
+                  dictionary
+        :rtype: dict
+        """
+        return {self.variable_name: MultiChainHMCSampleStats(
+            self._last_moves_accepted, self.timestep,
+            self._last_acceptance_probabilities)}
+
+    def checkpoint(self):
+        """
+        Returns the mutable sampling state of this sampler, that is,
+        the current positions and the time step adaption state
+
+        :returns: sampling state
+        :rtype: dict
+        """
+        return {'states': self.states.copy(),
+                'timestep': self.timestep.copy(),
+                'counter': self.counter,
+                'n_accepted': self.n_accepted.copy(),
+                'adapters': None if self.adapters is None
+                            else [a.checkpoint() for a in self.adapters]}
+
+    def restore(self, checkpoint):
+        """
+        Restores the mutable sampling state of this sampler
+
+        :param checkpoint: sampling state as returned by :meth:`checkpoint`
+        :type checkpoint: dict
+        """
+        self.states = checkpoint['states'].copy()
+        self.timestep = checkpoint['timestep'].copy()
+        self.counter = checkpoint['counter']
+        self.n_accepted = checkpoint['n_accepted'].copy()
+        if checkpoint['adapters'] is not None:
+            for adapter, c in zip(self.adapters, checkpoint['adapters']):
+                adapter.restore(c)
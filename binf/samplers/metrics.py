@@ -0,0 +1,134 @@
+"""
+Metrics (mass matrices) defining the kinetic energy in Hamiltonian
+Monte Carlo
+"""
+
+import numpy
+
+from abc import ABCMeta, abstractmethod
+
+
+class AbstractMetric(object):
+
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def sample_momentum(self, shape):
+        """
+        Draws a momentum from the Gaussian distribution with the mass
+        matrix as covariance
+
+        :param shape: shape of the position (and thus the momentum)
+        :type shape: tuple
+
+        :returns: momentum
+        :rtype: :class:`numpy.ndarray`
+        """
+        pass
+
+    @abstractmethod
+    def kinetic_energy(self, p):
+        """
+        Evaluates the kinetic energy 0.5 * p^T M^{-1} p
+
+        :param p: momentum
+        :type p: :class:`numpy.ndarray`
+
+        :returns: kinetic energy
+        :rtype: float
+        """
+        pass
+
+    @abstractmethod
+    def velocity(self, p):
+        """
+        Evaluates the time derivative M^{-1} p of the position
+
+        :param p: momentum
+        :type p: :class:`numpy.ndarray`
+
+        :returns: velocity
+        :rtype: :class:`numpy.ndarray`
+        """
+        pass
+
+
+class IdentityMetric(AbstractMetric):
+    """
+    Unit mass matrix
+    """
+
+    def sample_momentum(self, shape):
+
+        return numpy.random.normal(size=shape)
+
+    def kinetic_energy(self, p):
+
+        return 0.5 * numpy.sum(p ** 2)
+
+    def velocity(self, p):
+
+        return p
+
+
+class DiagonalMetric(AbstractMetric):
+
+    def __init__(self, inv_mass):
+        """
+        Diagonal mass matrix
+
+        :param inv_mass: diagonal of the inverse mass matrix, usually an
+                         estimate of the posterior variances. Has either
+                         the shape of the position or is flat.
+        :type inv_mass: :class:`numpy.ndarray`
+        """
+        self.inv_mass = numpy.array(inv_mass, dtype=float)
+        self._inv_sqrt_mass = numpy.sqrt(self.inv_mass)
+
+    def sample_momentum(self, shape):
+
+        z = numpy.random.normal(size=shape)
+
+        return z / self._inv_sqrt_mass.reshape(shape)
+
+    def kinetic_energy(self, p):
+
+        return 0.5 * numpy.sum(p.ravel() ** 2 * self.inv_mass.ravel())
+
+    def velocity(self, p):
+
+        return self.inv_mass.reshape(p.shape) * p
+
+
+class DenseMetric(AbstractMetric):
+
+    def __init__(self, inv_mass):
+        """
+        Dense mass matrix. Positions of more than one dimension are
+        flattened.
+
+        :param inv_mass: inverse mass matrix, usually an estimate of the
+                         posterior covariance
+        :type inv_mass: :class:`numpy.ndarray`
+        """
+        self.inv_mass = numpy.array(inv_mass, dtype=float)
+        ## with inv_mass = L L^T, momenta L^{-T} z have covariance
+        ## L^{-T} L^{-1} = inv_mass^{-1}
+        chol = numpy.linalg.cholesky(self.inv_mass)
+        self._momentum_transform = numpy.linalg.inv(chol).T
+
+    def sample_momentum(self, shape):
+
+        z = numpy.random.normal(size=len(self.inv_mass))
+
+        return self._momentum_transform.dot(z).reshape(shape)
+
+    def kinetic_energy(self, p):
+
+        p = p.ravel()
+
+        return 0.5 * p.dot(self.inv_mass.dot(p))
+
+    def velocity(self, p):
+
+        return self.inv_mass.dot(p.ravel()).reshape(p.shape)
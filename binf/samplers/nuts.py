@@ -0,0 +1,217 @@
+'''
+No-U-Turn sampler implementation
+'''
+
+from collections import namedtuple
+
+import numpy as np
+
+from csb.numeric import exp
+
+from binf.samplers.hmc import HMCSampler
+
+NUTSSampleStats = namedtuple('NUTSSampleStats',
+                             'accepted stepsize acceptance_probability adapting '
+                             'tree_depth n_gradients divergent')
+
+
+class NUTSSampler(HMCSampler):
+
+    def __init__(self, pdf, state, timestep, max_tree_depth=10,
+                 variable_name=None, adapter=None, metric=None,
+                 mass_matrix_adapter=None, max_energy_error=1000.0):
+        """
+        The No-U-Turn sampler (Hoffman & Gelman, J Mach Learn Res 15, 2014),
+        which chooses the length of the Hamiltonian trajectory on its own by
+        doubling it until it starts to turn back on itself. It can be used
+        wherever an :class:`.HMCSampler` can, e.g., as a subsampler of a
+        :class:`.GibbsSampler`.
+
+        :param pdf: object representing the PDF this sampler is
+                    supposed to sample from
+        :type pdf: :class:`.AbstractBinfPDF`
+
+        :param state: initial state
+        :type state: :class:`.BinfState`
+
+        :param timestep: integration step size for leap frog integrator
+        :type timestep: float
+
+        :param max_tree_depth: maximum number of trajectory doublings; at
+                               most 2 ** max_tree_depth - 1 gradients are
+                               evaluated per draw
+        :type max_tree_depth: int
+
+        :param variable_name: name of the variable this sampler is
+                              supposed to draw random samples from
+        :type variable_name: str
+
+        :param adapter: object adapting the time step during warmup
+        :type adapter: :class:`.DualAveragingAdapter`
+
+        :param metric: mass matrix defining the kinetic energy; defaults
+                       to the identity
+        :type metric: :class:`.AbstractMetric`
+
+        :param mass_matrix_adapter: object adapting the mass matrix
+                                    during warmup
+        :type mass_matrix_adapter: :class:`.MassMatrixAdapter`
+
+        :param max_energy_error: energy error beyond which a trajectory
+                                 is considered divergent and stopped
+        :type max_energy_error: float
+        """
+        super(NUTSSampler, self).__init__(pdf, state, timestep, None,
+                                          variable_name=variable_name,
+                                          adapter=adapter, metric=metric,
+                                          mass_matrix_adapter=mass_matrix_adapter)
+        self.max_tree_depth = max_tree_depth
+        self.max_energy_error = max_energy_error
+
+        self._last_tree_depth = 0
+        self._last_n_gradients = 0
+        self._last_divergent = False
+
+    def _leapfrog_step(self, point, timestep):
+        """
+        Performs a single leap frog step
+
+        :param point: 'position', 'momentum', gradient and potential energy
+        :type point: tuple
+
+        :param timestep: integration time step; negative for integrating
+                         backwards in time
+        :type timestep: float
+
+        :returns: 'position', 'momentum', gradient and potential energy
+                  after the step
+        :rtype: tuple
+        """
+        q, p, grad, _ = point
+        p = p - 0.5 * timestep * grad
+        q = q + timestep * self.metric.velocity(p)
+        E_pot, grad = self._potential_and_gradient(q)
+        p = p - 0.5 * timestep * grad
+        self._last_n_gradients += 1
+
+        return q, p, grad, E_pot
+
+    def _no_u_turn(self, minus, plus):
+        """
+        Checks whether a trajectory does not yet turn back on itself
+
+        :param minus: earliest point of the trajectory
+        :type minus: tuple
+
+        :param plus: latest point of the trajectory
+        :type plus: tuple
+
+        :returns: whether the trajectory can be extended further
+        :rtype: bool
+        """
+        dq = plus[0] - minus[0]
+
+        return (np.sum(dq * self.metric.velocity(minus[1])) >= 0 and
+                np.sum(dq * self.metric.velocity(plus[1])) >= 0)
+
+    def _build_tree(self, point, log_u, direction, depth, H0):
+        """
+        Builds a balanced binary tree of 2 ** depth leap frog steps
+        starting from a point of the trajectory
+
+        :returns: earliest and latest point of the subtrajectory, proposal,
+                  number of points in the slice, whether to continue, sum
+                  of acceptance probabilities and number of points visited
+        :rtype: tuple
+        """
+        if depth == 0:
+            point = self._leapfrog_step(point, direction * self.timestep)
+            H = point[3] + self.metric.kinetic_energy(point[1])
+            n = int(log_u <= -H)
+            s = bool(log_u < -H + self.max_energy_error)
+            if not s:
+                self._last_divergent = True
+            alpha = float(min(1.0, exp(H0 - H)))
+            if not np.isfinite(alpha):
+                alpha = 0.0
+            return point, point, point, n, s, alpha, 1
+
+        minus, plus, proposal, n, s, alpha, n_alpha = self._build_tree(
+            point, log_u, direction, depth - 1, H0)
+        if s:
+            if direction == -1:
+                minus, _, proposal2, n2, s2, alpha2, n_alpha2 = self._build_tree(
+                    minus, log_u, direction, depth - 1, H0)
+            else:
+                _, plus, proposal2, n2, s2, alpha2, n_alpha2 = self._build_tree(
+                    plus, log_u, direction, depth - 1, H0)
+            if n + n2 > 0 and np.random.uniform() < n2 / float(n + n2):
+                proposal = proposal2
+            alpha += alpha2
+            n_alpha += n_alpha2
+            s = s2 and self._no_u_turn(minus, plus)
+            n += n2
+
+        return minus, plus, proposal, n, s, alpha, n_alpha
+
+    def sample(self):
+        """
+        Draws a random sample
+
+        :returns: a sample
+        :rtype: numpy.ndarray
+        """
+        q = np.asarray(self.state, dtype=float)
+        p = self.metric.sample_momentum(q.shape)
+        E_pot, grad = self._cached_potential_and_gradient_at(q)
+        H0 = E_pot + self.metric.kinetic_energy(p)
+        log_u = -H0 + np.log(np.random.uniform())
+
+        self._last_n_gradients = 0
+        self._last_divergent = False
+        initial = minus = plus = proposal = (q, p, grad, E_pot)
+        n, s, depth = 1, True, 0
+        alpha, n_alpha = 0.0, 0
+
+        while s and depth < self.max_tree_depth:
+            direction = -1 if np.random.uniform() < 0.5 else 1
+            if direction == -1:
+                minus, _, proposal2, n2, s2, alpha, n_alpha = self._build_tree(
+                    minus, log_u, direction, depth, H0)
+            else:
+                _, plus, proposal2, n2, s2, alpha, n_alpha = self._build_tree(
+                    plus, log_u, direction, depth, H0)
+            if s2 and np.random.uniform() < n2 / float(n):
+                proposal = proposal2
+            n += n2
+            s = s2 and self._no_u_turn(minus, plus)
+            depth += 1
+
+        self._last_tree_depth = depth
+        p_acc = alpha / n_alpha if n_alpha > 0 else 0.0
+
+        return self._finish_draw(proposal[0], proposal[3], proposal[2],
+                                 proposal is not initial, p_acc)
+
+    @property
+    def last_draw_stats(self):
+        """
+        Returns information about the most recently performed move
+
+        :returns: whether the last move changed the state, the current
+                  time step, the mean acceptance probability over the
+                  last tree, whether the time step is still adapted, the
+                  tree depth, the number of gradient evaluations and
+                  whether the trajectory diverged in the shape of a named
+                  tuple in a dictionary
+        :rtype: dict
+        """
+        adapting = self.adapter is not None and self.adapter.adapting
+
+        return {self.variable_name: NUTSSampleStats(self.last_move_accepted,
+                                                    self.timestep,
+                                                    self._last_acceptance_probability,
+                                                    adapting,
+                                                    self._last_tree_depth,
+                                                    self._last_n_gradients,
+                                                    self._last_divergent)}
@@ -0,0 +1,336 @@
+"""
+Replica exchange (parallel tempering), running one Gibbs sampler per
+temperature in a worker process
+"""
+
+import numpy
+
+
+def _replica_loop(connection, sampler, beta, seed):
+    """
+    Main loop of a worker process of :class:`.ReplicaExchangeSampler`.
+    The sampler and its PDF stay resident in the worker; only states,
+    log-likelihoods and sampling statistics are sent between processes.
+    """
+    import traceback
+
+    numpy.random.seed(seed)
+    sampler.pdf.beta = beta
+
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        command, args = request
+        try:
+            if command == 'sample':
+                n_steps, state = args
+                if state is not None:
+                    sampler.state.update_variables(**state.variables)
+                for _ in range(n_steps):
+                    sampler.sample()
+                state = sampler.state
+                result = (state.snapshot(),
+                          sampler.pdf.log_likelihood(**state.variables),
+                          sampler.last_draw_stats)
+            elif command == 'checkpoint':
+                result = (sampler.checkpoint(), numpy.random.get_state())
+            elif command == 'restore':
+                sampler_checkpoint, random_state = args
+                sampler.restore(sampler_checkpoint)
+                numpy.random.set_state(random_state)
+                state = sampler.state
+                result = (state.snapshot(),
+                          sampler.pdf.log_likelihood(**state.variables))
+            else:
+                raise ValueError('Unknown command "{}"'.format(command))
+            connection.send((True, result))
+        except Exception:
+            connection.send((False, traceback.format_exc()))
+    connection.close()
+
+
+class ReplicaExchangeSampler(object):
+
+    def __init__(self, samplers, betas, swap_interval=10):
+        """
+        Implements replica exchange (parallel tempering). Each replica is
+        a Gibbs sampler for a posterior distribution whose likelihoods are
+        tempered with an inverse temperature (see :attr:`.Posterior.beta`).
+        Replicas run concurrently in persistent worker processes, which
+        receive their sampler (including PDF, data and subsamplers) once,
+        on :meth:`start`. After each swap_interval Gibbs steps, swaps of
+        the states of neighbouring replicas are attempted, alternating
+        between even and odd pairs. Swaps exchange only state values.
+
+        The PDF of each sampler has to be a :class:`.Posterior`. As every
+        worker process sets the inverse temperature of its own copy of
+        the PDF, all replicas may be set up with the same posterior object.
+
+        :param samplers: Gibbs samplers, one per inverse temperature
+        :type samplers: list of :class:`.GibbsSampler`
+
+        :param betas: inverse temperatures in decreasing order, usually
+                      starting at 1, which is the posterior of interest
+        :type betas: list
+
+        :param swap_interval: number of Gibbs steps between swap attempts
+        :type swap_interval: int
+        """
+        if len(samplers) != len(betas):
+            raise ValueError('Got {} samplers for {} inverse temperatures'.format(
+                len(samplers), len(betas)))
+        if len(betas) < 2:
+            raise ValueError('Replica exchange needs at least two replicas')
+
+        self._samplers = list(samplers)
+        self._betas = numpy.array(betas, dtype=float)
+        self.swap_interval = swap_interval
+
+        self._states = [s.state.snapshot() for s in self._samplers]
+        self._log_likelihoods = None
+        self._pending_states = [None] * len(self._samplers)
+        self._last_draw_stats = [{} for _ in self._samplers]
+        self._last_swaps_accepted = numpy.zeros(len(betas) - 1, dtype=bool)
+        self._n_swaps_attempted = numpy.zeros(len(betas) - 1, dtype=int)
+        self._n_swaps_accepted = numpy.zeros(len(betas) - 1, dtype=int)
+        self._connections = []
+        self._processes = []
+        self.counter = 0
+
+    @property
+    def betas(self):
+        """
+        Returns the inverse temperatures of the replicas
+
+        :returns: inverse temperatures
+        :rtype: numpy.ndarray
+        """
+        return self._betas.copy()
+
+    @property
+    def n_replicas(self):
+        """
+        Returns the number of replicas
+
+        :returns: number of replicas
+        :rtype: int
+        """
+        return len(self._betas)
+
+    @property
+    def states(self):
+        """
+        Returns the current states of all replicas, ordered by inverse
+        temperature
+
+        :returns: current states
+        :rtype: list of :class:`.BinfState`
+        """
+        return list(self._states)
+
+    @property
+    def state(self):
+        """
+        Returns the current state of the first replica, which usually
+        samples the posterior distribution of interest
+
+        :returns: current state
+        :rtype: :class:`.BinfState`
+        """
+        return self._states[0]
+
+    def start(self):
+        """
+        Starts the worker processes. Called by :meth:`sample`, if
+        necessary. Each worker's random number generator is seeded from
+        NumPy's global random number generator.
+        """
+        from multiprocessing import Process, Pipe
+
+        if len(self._processes) > 0:
+            return
+
+        seeds = numpy.random.randint(2 ** 31 - 1, size=self.n_replicas)
+        for sampler, beta, seed in zip(self._samplers, self._betas, seeds):
+            parent_connection, child_connection = Pipe()
+            process = Process(target=_replica_loop,
+                              args=(child_connection, sampler, beta, seed))
+            process.daemon = True
+            process.start()
+            child_connection.close()
+            self._connections.append(parent_connection)
+            self._processes.append(process)
+
+    def shutdown(self):
+        """
+        Stops the worker processes. The current states are kept, so that
+        sampling can be continued after calling :meth:`start` again,
+        though with freshly seeded random number generators.
+        """
+        for connection in self._connections:
+            try:
+                connection.send(None)
+                connection.close()
+            except (IOError, EOFError):
+                pass
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+        self._pending_states = list(self._states)
+
+    def __enter__(self):
+
+        self.start()
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.shutdown()
+
+    def _broadcast(self, requests):
+        """
+        Sends one request to each worker process and collects the results.
+        All replies are read before a failure is reported, so that the
+        next request is not paired with a stale reply. If a worker
+        process cannot be reached, all workers are shut down.
+
+        :param requests: (command, arguments) tuples, one per replica
+        :type requests: list
+
+        :returns: results, one per replica
+        :rtype: list
+        """
+        try:
+            for connection, request in zip(self._connections, requests):
+                connection.send(request)
+            replies = [connection.recv() for connection in self._connections]
+        except (IOError, EOFError):
+            self.shutdown()
+            raise RuntimeError('Lost connection to a replica worker process')
+
+        for i, (success, result) in enumerate(replies):
+            if not success:
+                msg = 'Replica {} failed in worker process:\n{}'
+                raise RuntimeError(msg.format(i, result))
+
+        return [result for _, result in replies]
+
+    def _swap_probability(self, i):
+        """
+        Calculates the probability to accept a swap of the states of
+        replicas i and i + 1
+
+        :param i: index of the replica with the higher inverse temperature
+        :type i: int
+
+        :returns: acceptance probability
+        :rtype: float
+        """
+        d_beta = self._betas[i] - self._betas[i+1]
+        d_log_L = self._log_likelihoods[i+1] - self._log_likelihoods[i]
+
+        return numpy.exp(min(0.0, d_beta * d_log_L))
+
+    def _attempt_swaps(self):
+        """
+        Attempts swaps between the even or, every other time, the odd
+        pairs of neighbouring replicas
+        """
+        self._last_swaps_accepted[:] = False
+        for i in range(self.counter % 2, self.n_replicas - 1, 2):
+            self._n_swaps_attempted[i] += 1
+            if numpy.random.uniform() < self._swap_probability(i):
+                self._n_swaps_accepted[i] += 1
+                self._last_swaps_accepted[i] = True
+                states, log_Ls = self._states, self._log_likelihoods
+                states[i], states[i+1] = states[i+1], states[i]
+                log_Ls[i], log_Ls[i+1] = log_Ls[i+1], log_Ls[i]
+                self._pending_states[i] = states[i]
+                self._pending_states[i+1] = states[i+1]
+
+    def sample(self):
+        """
+        Performs swap_interval Gibbs steps in all replicas concurrently,
+        followed by an attempt to swap neighbouring replica states
+
+        :returns: current states of all replicas, ordered by inverse
+                  temperature
+        :rtype: list of :class:`.BinfState`
+        """
+        self.start()
+
+        requests = [('sample', (self.swap_interval, state))
+                    for state in self._pending_states]
+        results = self._broadcast(requests)
+        self._pending_states = [None] * self.n_replicas
+        self._states = [r[0] for r in results]
+        self._log_likelihoods = [r[1] for r in results]
+        self._last_draw_stats = [r[2] for r in results]
+
+        self._attempt_swaps()
+        self.counter += 1
+
+        return self.states
+
+    @property
+    def swap_acceptance_rates(self):
+        """
+        Returns, for each pair of neighbouring replicas, the fraction of
+        accepted swap attempts
+
+        :returns: swap acceptance rates
+        :rtype: numpy.ndarray
+        """
+        attempted = numpy.maximum(self._n_swaps_attempted, 1)
+
+        return self._n_swaps_accepted / attempted.astype(float)
+
+    @property
+    def last_draw_stats(self):
+        """
+        Returns information about the most recent moves of all replicas
+        and whether the last swaps have been accepted
+
+        :returns: sampling statistics of each replica and swap outcomes
+                  of each pair of neighbouring replicas
+        :rtype: dict
+        """
+        return {'replicas': list(self._last_draw_stats),
+                'swaps': self._last_swaps_accepted.copy()}
+
+    def checkpoint(self):
+        """
+        Returns the mutable sampling state of this sampler, including
+        that of the replica samplers and of their random number generators
+
+        :returns: sampling state
+        :rtype: dict
+        """
+        self.start()
+        replicas = self._broadcast([('checkpoint', ())] * self.n_replicas)
+
+        return {'replicas': replicas,
+                'pending_states': list(self._pending_states),
+                'counter': self.counter,
+                'n_swaps_attempted': self._n_swaps_attempted.copy(),
+                'n_swaps_accepted': self._n_swaps_accepted.copy()}
+
+    def restore(self, checkpoint):
+        """
+        Restores the mutable sampling state of this sampler
+
+        :param checkpoint: sampling state as returned by :meth:`checkpoint`
+        :type checkpoint: dict
+        """
+        self.start()
+        results = self._broadcast([('restore', replica)
+                                   for replica in checkpoint['replicas']])
+        self._states = [r[0] for r in results]
+        self._log_likelihoods = [r[1] for r in results]
+        self._pending_states = list(checkpoint['pending_states'])
+        self.counter = checkpoint['counter']
+        self._n_swaps_attempted = checkpoint['n_swaps_attempted'].copy()
+        self._n_swaps_accepted = checkpoint['n_swaps_accepted'].copy()
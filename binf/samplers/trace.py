@@ -0,0 +1,529 @@
+"""
+Recording of sampled states, either in memory or streamed to disk
+"""
+
+import os
+import json
+import time
+
+import numpy
+
+from binf.samplers.checkpoint import replace_file
+
+
+class Trace(object):
+
+    def __init__(self, burnin=0, thin=1, chunk_size=1000, capacity=None):
+        """
+        Records states of a Markov chain in preallocated columns, one
+        per variable. Columns grow by chunks of at least chunk_size
+        samples as needed, so no Python objects are created per
+        recorded state.
+
+        Further quantities such as log-probabilities or sampler
+        statistics can be recorded alongside each state.
+
+        :param burnin: number of states to discard before recording
+        :type burnin: int
+
+        :param thin: record only every thin-th state after burn-in
+        :type thin: int
+
+        :param chunk_size: minimum number of samples the columns grow by
+        :type chunk_size: int
+
+        :param capacity: number of samples to allocate storage for
+                         initially; defaults to chunk_size
+        :type capacity: int
+        """
+        if thin < 1:
+            raise ValueError('thin has to be a positive integer')
+        if chunk_size < 1:
+            raise ValueError('chunk_size has to be a positive integer')
+
+        self._burnin = burnin
+        self._thin = thin
+        self._chunk_size = chunk_size
+        self._capacity = chunk_size if capacity is None else capacity
+        self._columns = None
+        self._variable_names = ()
+        self._quantity_names = ()
+        self._length = 0
+        self._n_seen = 0
+
+    @property
+    def burnin(self):
+        """
+        Returns the number of states discarded before recording
+
+        :returns: burn-in length
+        :rtype: int
+        """
+        return self._burnin
+
+    @property
+    def thin(self):
+        """
+        Returns the thinning interval
+
+        :returns: thinning interval
+        :rtype: int
+        """
+        return self._thin
+
+    @property
+    def names(self):
+        """
+        Returns the names of the recorded variables and quantities
+
+        :returns: variable and quantity names
+        :rtype: tuple
+        """
+        return self._variable_names + self._quantity_names
+
+    @property
+    def n_seen(self):
+        """
+        Returns the number of states passed to :meth:`record`,
+        including those discarded
+
+        :returns: number of states seen
+        :rtype: int
+        """
+        return self._n_seen
+
+    def __len__(self):
+
+        return self._length
+
+    def _get_shapes(self, state, quantities):
+        """
+        Infers variable and quantity names and shapes from the first
+        recorded state and quantities
+        """
+        variable_names = tuple(sorted(state.variables.keys()))
+        quantity_names = tuple(sorted(quantities.keys()))
+        clashes = set(variable_names) & set(quantity_names)
+        if clashes:
+            raise ValueError('Quantities {} clash with variable names'.format(
+                sorted(clashes)))
+        self._variable_names = variable_names
+        self._quantity_names = quantity_names
+
+        shapes = [numpy.shape(state[n]) for n in variable_names]
+        shapes += [numpy.shape(quantities[n]) for n in quantity_names]
+
+        return shapes
+
+    def _allocate(self, shapes):
+        """
+        Allocates the columns
+        """
+        self._columns = {name: numpy.empty((self._capacity,) + shape)
+                         for name, shape in zip(self.names, shapes)}
+
+    def _grow(self):
+        """
+        Enlarges the columns by at least one chunk
+        """
+        capacity = self._capacity + max(self._chunk_size, self._capacity // 2)
+        for name, column in self._columns.items():
+            new = numpy.empty((capacity,) + column.shape[1:])
+            new[:self._length] = column[:self._length]
+            self._columns[name] = new
+        self._capacity = capacity
+
+    def _count(self):
+        """
+        Counts a state passed to :meth:`record` and decides whether
+        to record it
+        """
+        self._n_seen += 1
+        n = self._n_seen - self._burnin - 1
+
+        return n >= 0 and n % self._thin == 0
+
+    def _store(self, state, quantities, row):
+        """
+        Writes a state and quantities into a row of the columns
+        """
+        for name in self._variable_names:
+            self._columns[name][row] = state[name]
+        for name in self._quantity_names:
+            self._columns[name][row] = quantities[name]
+
+    def record(self, state, **quantities):
+        r"""
+        Records a state, if it is neither part of the burn-in nor
+        discarded due to thinning
+
+        :param state: state to record
+        :type state: :class:`.BinfState`
+
+        :param \**quantities: further named quantities to record, e.g.,
+                              log_prob=-3.2. Have to be the same for
+                              all recorded states.
+        :type \**quantities: dict
+
+        :returns: whether the state has been recorded
+        :rtype: bool
+        """
+        if not self._count():
+            return False
+
+        if self._columns is None:
+            self._allocate(self._get_shapes(state, quantities))
+        if self._length == self._capacity:
+            self._grow()
+        self._store(state, quantities, self._length)
+        self._length += 1
+
+        return True
+
+    def __getitem__(self, name):
+        """
+        Returns a read-only view of the recorded values of a variable
+        or quantity, with the sample index as first axis
+        """
+        if self._columns is None:
+            raise KeyError(name)
+        view = self._columns[name][:self._length]
+        view.flags.writeable = False
+
+        return view
+
+    def __contains__(self, name):
+
+        return name in self.names
+
+    @property
+    def variables(self):
+        """
+        Returns read-only views of the recorded values of all variables
+
+        :returns: variable name / recorded values pairs
+        :rtype: dict
+        """
+        return {name: self[name] for name in self._variable_names}
+
+    @property
+    def quantities(self):
+        """
+        Returns read-only views of the recorded values of all further
+        quantities
+
+        :returns: quantity name / recorded values pairs
+        :rtype: dict
+        """
+        return {name: self[name] for name in self._quantity_names}
+
+    def state(self, index):
+        """
+        Makes a state from a recorded sample
+
+        :param index: index of the sample
+        :type index: int
+
+        :returns: recorded state
+        :rtype: :class:`.BinfState`
+        """
+        return _make_state(self, self._variable_names, index)
+
+
+def _make_state(trace, names, index):
+    """
+    Makes a state from the values of the given variables in a
+    recorded sample
+    """
+    from binf.samplers import BinfState
+
+    n = len(trace)
+    if not -n <= index < n:
+        raise IndexError(index)
+
+    return BinfState({name: numpy.array(trace[name][index]) for name in names})
+
+
+def _write_metadata(path, metadata):
+    """
+    Atomically replaces the metadata file of an on-disk trace, so that
+    readers never see a partially written file. The new file is synced
+    to disk before it replaces the old one, so that a crash does not
+    leave an empty metadata file behind.
+    """
+    filename = os.path.join(path, DiskTrace.METADATA)
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(metadata, f)
+        f.flush()
+        os.fsync(f.fileno())
+    replace_file(filename + '.tmp', filename)
+
+
+def _append_chunk(path, metadata, chunk):
+    """
+    Appends a chunk of recorded values to the column files of an on-disk
+    trace, syncs them to disk and then announces the new length in the
+    metadata file
+    """
+    for name, values in chunk.items():
+        with open(os.path.join(path, name + DiskTrace.EXTENSION), 'ab') as f:
+            numpy.ascontiguousarray(values, dtype=numpy.float64).tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+    _write_metadata(path, metadata)
+
+
+class DiskTrace(Trace):
+
+    METADATA = 'trace.json'
+    EXTENSION = '.dat'
+
+    def __init__(self, path, burnin=0, thin=1, chunk_size=1000,
+                 flush_interval=None):
+        """
+        Streams recorded states to disk. Each variable and quantity is
+        stored in its own raw float64 file, to which chunks of recorded
+        values are appended; a small JSON file holds names, shapes and
+        the number of samples written so far.
+
+        Full chunks are written by a background thread, so the sampling
+        loop does not wait for the disk. Traces can be read with
+        :class:`.TraceReader` while they are still being written.
+
+        :param path: directory to write the trace to. Is created if
+                     necessary; an existing trace in it is overwritten.
+        :type path: str
+
+        :param burnin: number of states to discard before recording
+        :type burnin: int
+
+        :param thin: record only every thin-th state after burn-in
+        :type thin: int
+
+        :param chunk_size: number of samples kept in memory before
+                           writing them to disk
+        :type chunk_size: int
+
+        :param flush_interval: time in seconds after which recorded
+                               samples are written to disk, even if the
+                               current chunk is not full yet
+        :type flush_interval: float
+        """
+        super(DiskTrace, self).__init__(burnin, thin, chunk_size, chunk_size)
+
+        from multiprocessing.pool import ThreadPool
+
+        self._path = path
+        self._flush_interval = flush_interval
+        self._n_buffered = 0
+        self._shapes = None
+        self._last_flush = time.time()
+        self._pending = []
+        self._pool = ThreadPool(1)
+
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    @property
+    def path(self):
+        """
+        Returns the directory the trace is written to
+
+        :returns: trace directory
+        :rtype: str
+        """
+        return self._path
+
+    def _metadata(self, length):
+        """
+        Makes the metadata describing a trace of the given length
+        """
+        return {'variables': self._variable_names,
+                'quantities': self._quantity_names,
+                'shapes': [list(s) for s in self._shapes],
+                'length': length,
+                'burnin': self._burnin,
+                'thin': self._thin}
+
+    def _allocate(self, shapes):
+
+        self._shapes = shapes
+        for name in self.names:
+            filename = os.path.join(self._path, name + self.EXTENSION)
+            open(filename, 'wb').close()
+        _write_metadata(self._path, self._metadata(0))
+
+        super(DiskTrace, self)._allocate(shapes)
+
+    def _check_pending(self, wait=False):
+        """
+        Forgets finished writes, raising errors which occurred in them
+        """
+        pending = []
+        for result in self._pending:
+            if wait or result.ready():
+                result.get()
+            else:
+                pending.append(result)
+        self._pending = pending
+
+    def record(self, state, **quantities):
+
+        if not self._count():
+            return False
+
+        if self._columns is None:
+            self._allocate(self._get_shapes(state, quantities))
+        self._store(state, quantities, self._n_buffered)
+        self._n_buffered += 1
+        self._length += 1
+
+        interval = self._flush_interval
+        if (self._n_buffered == self._capacity or interval is not None
+            and time.time() - self._last_flush > interval):
+            self.flush()
+
+        return True
+
+    def flush(self, wait=False):
+        """
+        Hands recorded samples held in memory over to the background
+        thread writing them to disk
+
+        :param wait: whether to wait until all samples are written
+        :type wait: bool
+        """
+        self._check_pending()
+        if self._n_buffered > 0:
+            chunk = {name: column[:self._n_buffered]
+                     for name, column in self._columns.items()}
+            result = self._pool.apply_async(
+                _append_chunk, (self._path, self._metadata(self._length), chunk))
+            self._pending.append(result)
+            self._n_buffered = 0
+            ## the background thread still reads the old columns
+            super(DiskTrace, self)._allocate(self._shapes)
+        self._last_flush = time.time()
+        if wait:
+            self._check_pending(wait=True)
+
+    def close(self):
+        """
+        Writes all remaining samples to disk and stops the background
+        thread
+        """
+        if self._pool is None:
+            return
+        self.flush(wait=True)
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def __getitem__(self, name):
+        """
+        Returns a read-only, memory-mapped view of the recorded values
+        of a variable or quantity, after writing all samples to disk
+        """
+        if self._columns is None:
+            raise KeyError(name)
+        if self._pool is not None:
+            self.flush(wait=True)
+
+        return TraceReader(self._path)[name]
+
+
+class TraceReader(object):
+
+    def __init__(self, path):
+        """
+        Gives access to a trace written by :class:`.DiskTrace`, possibly
+        while it is still being written. Values are memory-mapped, so
+        traces larger than the main memory can be analyzed.
+
+        :param path: directory the trace has been written to
+        :type path: str
+        """
+        self._path = path
+        self._metadata = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        Updates the number of available samples from the trace metadata
+        """
+        with open(os.path.join(self._path, DiskTrace.METADATA)) as f:
+            self._metadata = json.load(f)
+        self._shapes = dict(zip(self.names, (tuple(s) for s in
+                                             self._metadata['shapes'])))
+
+    @property
+    def names(self):
+        """
+        Returns the names of the recorded variables and quantities
+
+        :returns: variable and quantity names
+        :rtype: tuple
+        """
+        return (tuple(self._metadata['variables']) +
+                tuple(self._metadata['quantities']))
+
+    def __len__(self):
+
+        return self._metadata['length']
+
+    def __contains__(self, name):
+
+        return name in self._shapes
+
+    def __getitem__(self, name):
+        """
+        Returns a read-only, memory-mapped view of the recorded values of
+        a variable or quantity, with the sample index as first axis
+        """
+        shape = (len(self),) + self._shapes[name]
+        if shape[0] == 0:
+            return numpy.empty(shape)
+
+        return numpy.memmap(os.path.join(self._path, name + DiskTrace.EXTENSION),
+                            dtype=numpy.float64, mode='r', shape=shape)
+
+    @property
+    def variables(self):
+        """
+        Returns memory-mapped views of the recorded values of all variables
+
+        :returns: variable name / recorded values pairs
+        :rtype: dict
+        """
+        return {name: self[name] for name in self._metadata['variables']}
+
+    @property
+    def quantities(self):
+        """
+        Returns memory-mapped views of the recorded values of all further
+        quantities
+
+        :returns: quantity name / recorded values pairs
+        :rtype: dict
+        """
+        return {name: self[name] for name in self._metadata['quantities']}
+
+    def state(self, index):
+        """
+        Makes a state from a recorded sample
+
+        :param index: index of the sample
+        :type index: int
+
+        :returns: recorded state
+        :rtype: :class:`.BinfState`
+        """
+        return _make_state(self, self._metadata['variables'], index)
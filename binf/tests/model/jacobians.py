@@ -0,0 +1,59 @@
+'''
+'''
+import unittest, numpy
+
+from binf.model.jacobians import BlockDiagonalJacobian, BandedJacobian
+
+
+class testBlockDiagonalJacobian(unittest.TestCase):
+
+    def setUp(self):
+
+        self.J = BlockDiagonalJacobian([numpy.arange(6.0).reshape(2, 3),
+                                        numpy.array([[2.0, -1.0]])])
+
+    def testShape(self):
+
+        self.assertEqual(self.J.shape, (3, 5))
+        self.assertEqual(self.J.T.shape, (5, 3))
+
+    def testDot(self):
+
+        v = numpy.arange(5.0) - 2.0
+        self.assertTrue(numpy.allclose(self.J.dot(v), self.J.toarray().dot(v)))
+        w = numpy.array([1.0, -2.0, 0.5])
+        self.assertTrue(numpy.allclose(self.J.T.dot(w), self.J.toarray().T.dot(w)))
+
+
+class testBandedJacobian(unittest.TestCase):
+
+    def setUp(self):
+
+        data = numpy.arange(15.0).reshape(3, 5) + 1.0
+        self.J = BandedJacobian(data, [-1, 0, 2], (4, 5))
+
+    def testToarray(self):
+
+        dense = self.J.toarray()
+        self.assertEqual(dense[0, 0], 6.0)
+        self.assertEqual(dense[1, 0], 1.0)
+        self.assertEqual(dense[0, 2], 13.0)
+        self.assertEqual(numpy.sum(dense != 0.0), 10)
+
+    def testDot(self):
+
+        v = numpy.arange(5.0) - 2.0
+        self.assertTrue(numpy.allclose(self.J.dot(v), self.J.toarray().dot(v)))
+        w = numpy.array([1.0, -2.0, 0.5, 3.0])
+        self.assertTrue(numpy.allclose(self.J.T.dot(w), self.J.toarray().T.dot(w)))
+        self.assertTrue(numpy.allclose(self.J.T.toarray(), self.J.toarray().T))
+
+    def testInvalid_data(self):
+
+        self.assertRaises(ValueError, BandedJacobian, numpy.ones((2, 4)),
+                          [0, 1], (4, 5))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
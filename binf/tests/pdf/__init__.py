@@ -104,6 +104,17 @@ class testAbstractBinfPDF(unittest.TestCase):
         self.assertTrue('x' in variables)
         self.assertTrue(variables['x'] == 7.0)
 
+    def testCall_plan_invalidation(self):
+
+        pdf = MockBinfPDF()
+        self.assertEqual(pdf.log_prob(x=1.0, y=2.0), -5.0)
+        pdf.fix_variables(x=3.0)
+        self.assertEqual(pdf.log_prob(y=2.0), -13.0)
+        pdf['x'] = Parameter(1.0, 'x')
+        self.assertEqual(pdf.log_prob(y=2.0), -5.0)
+        pdf['x'].set(0.0)
+        self.assertEqual(pdf.log_prob(y=2.0), -4.0)
+
         
 if __name__ == '__main__':
 
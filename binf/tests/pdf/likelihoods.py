@@ -6,6 +6,7 @@ from binf import ArrayParameter
 from binf.pdf.likelihoods import Likelihood
 from binf.model.errormodels import AbstractErrorModel
 from binf.model.forwardmodels import AbstractForwardModel
+from binf.model.jacobians import BandedJacobian
 
 class MockErrorModel(AbstractErrorModel):
 
@@ -64,6 +65,29 @@ class MockForwardModel(AbstractForwardModel):
         pass
 
 
+class MockVJPForwardModel(MockForwardModel):
+
+    def _evaluate_jacobi_matrix(self, X, b):
+
+        raise AssertionError('Jacobi matrix must not be built')
+
+    def _evaluate_vjp(self, cotangent, X, b):
+
+        return b * numpy.array([[2.0, 1.0, 1.0],
+                                [1.0, 2.0, 2.0]]).dot(cotangent)
+
+
+class MockBandedForwardModel(MockForwardModel):
+
+    def _evaluate_jacobi_matrix(self, X, b):
+
+        return BandedJacobian(b * numpy.array([[1.0, 0.0, 0.0],
+                                               [2.0, 2.0, 0.0],
+                                               [0.0, 1.0, 2.0],
+                                               [0.0, 0.0, 1.0]]),
+                              [-1, 0, 1, 2], (2, 3))
+
+
 class NoAutomaticParamsLikelihood(Likelihood):
 
     def __init__(self, name, forward_model, error_model):
@@ -118,6 +142,151 @@ class testLikelihood(unittest.TestCase):
         expected = numpy.array([14 * a * b ** 2, 22 * a * b ** 2])
         self.assertTrue(numpy.all(self.L.gradient(X=numpy.array([1.2, 4.2]), a=a, b=b) == expected))
 
+    def testEvaluate_gradient_vjp(self):
+
+        L = Likelihood('testL', MockVJPForwardModel(), MockErrorModel())
+        self.assertTrue(L.forward_model.provides_vjp)
+        self.assertFalse(self.L.forward_model.provides_vjp)
+        variables = dict(X=numpy.array([1.2, 4.2]), a=2.0, b=3.0)
+        self.assertTrue(numpy.all(L.gradient(**variables) ==
+                                  self.L.gradient(**variables)))
+        jvp = self.L.forward_model.jvp(numpy.array([1.0, 0.0]), X=variables['X'], b=3.0)
+        self.assertTrue(numpy.all(jvp == numpy.array([6.0, 3.0, 3.0])))
+
+    def testEvaluate_gradient_batch_vjp(self):
+
+        L = Likelihood('testL', MockVJPForwardModel(), MockErrorModel())
+        batch = dict(X=numpy.ones((3, 2)), a=numpy.array([2.0, 1.0, 0.5]),
+                     b=numpy.array([3.0, 1.0, 2.0]))
+        self.assertTrue(numpy.allclose(L.gradient_batch(**batch),
+                                       self.L.gradient_batch(**batch)))
+
+        calls = []
+        fwm = L.forward_model
+        def vjp_batch(cotangents, X, b):
+            calls.append(len(cotangents))
+            return MockVJPForwardModel._evaluate_vjp_batch(fwm, cotangents,
+                                                           X=X, b=b)
+        fwm._evaluate_vjp_batch = vjp_batch
+        L.gradient_batch(**batch)
+        self.assertEqual(calls, [3])
+
+    def testEvaluate_gradient_structured(self):
+
+        L = Likelihood('testL', MockBandedForwardModel(), MockErrorModel())
+        variables = dict(X=numpy.array([1.2, 4.2]), a=2.0, b=3.0)
+        self.assertTrue(numpy.all(L.gradient(**variables) ==
+                                  self.L.gradient(**variables)))
+
+        batch = dict(X=numpy.ones((2, 2)), a=numpy.array([2.0, 1.0]),
+                     b=numpy.array([3.0, 1.0]))
+        self.assertTrue(numpy.allclose(L.gradient_batch(**batch),
+                                       self.L.gradient_batch(**batch)))
+
+    def testForward_model_cache(self):
+
+        X = numpy.array([1.2, 4.2])
+        self.L.log_prob(X=X, a=2.0, b=3.0)
+        self.assertEqual((self.L.fwm_cache.hits, self.L.fwm_cache.misses), (0, 1))
+        self.L.log_prob(X=X, a=5.0, b=3.0)
+        self.assertEqual((self.L.fwm_cache.hits, self.L.fwm_cache.misses), (1, 1))
+        X[0] = 2.0
+        self.L.log_prob(X=X, a=5.0, b=3.0)
+        self.assertEqual(self.L.fwm_cache.misses, 2)
+        self.L['ParamA'].set(1.0)
+        self.L.log_prob(X=X, a=5.0, b=3.0)
+        self.assertEqual(self.L.fwm_cache.misses, 3)
+
+        L = Likelihood('testL', MockForwardModel(), MockErrorModel(), cache_size=1)
+        L.log_prob(X=X, a=2.0, b=1.0)
+        L.log_prob(X=X, a=2.0, b=2.0)
+        L.log_prob(X=X, a=2.0, b=1.0)
+        self.assertEqual(len(L.fwm_cache), 1)
+        self.assertEqual(L.fwm_cache.misses, 3)
+
+    def testForward_model_cache_key(self):
+
+        L = Likelihood('testL', MockForwardModel(), MockErrorModel(),
+                       cache_size=2)
+        X = numpy.array([1.2, 4.2])
+        L.log_prob(X=X, a=2.0, b=3.0)
+        L.log_prob(X=X, a=2.0, b=3.0)
+        self.assertEqual((L.fwm_cache.hits, L.fwm_cache.misses), (1, 1))
+        L._bump_version()
+        L.log_prob(X=X, a=2.0, b=3.0)
+        self.assertEqual(L.fwm_cache.misses, 2)
+
+        ## stored variable values are copies, whose arrays are reused
+        ## once their entry is evicted
+        stored = [k[2]['X'] for k, _ in L.fwm_cache._entries]
+        self.assertFalse(any(x is X for x in stored))
+        for x in (X + 1.0, X + 2.0):
+            L.log_prob(X=x, a=2.0, b=3.0)
+        reused = [k[2]['X'] for k, _ in L.fwm_cache._entries]
+        self.assertTrue(all(any(x is y for y in stored) for x in reused))
+        self.assertTrue(numpy.all(reused[1] == X + 2.0))
+
+    def testEvaluate_log_prob_and_gradient(self):
+
+        variables = dict(X=numpy.array([1.2, 4.2]), a=2.0, b=3.0)
+        log_prob, gradient = self.L.log_prob_and_gradient(**variables)
+        self.assertEqual(log_prob, self.L.log_prob(**variables))
+        self.assertTrue(numpy.all(gradient == self.L.gradient(**variables)))
+
+    def testEvaluate_gradient_out(self):
+
+        variables = dict(X=numpy.array([1.2, 4.2]), a=2.0, b=3.0)
+        expected = self.L.gradient(**variables)
+        for L in (self.L, Likelihood('testL', MockVJPForwardModel(), MockErrorModel()),
+                  Likelihood('testL', MockBandedForwardModel(), MockErrorModel())):
+            out = numpy.empty(2)
+            self.assertTrue(L.gradient(out=out, **variables) is out)
+            self.assertTrue(numpy.all(out == expected))
+            out = numpy.empty(2)
+            log_prob, gradient = L.log_prob_and_gradient(out=out, **variables)
+            self.assertTrue(gradient is out)
+            self.assertTrue(numpy.all(out == expected))
+
+    def testEvaluate_log_prob_batch(self):
+
+        X = numpy.ones((3, 2))
+        a = numpy.array([2.0, 1.0, 0.5])
+        b = numpy.array([3.0, 1.0, 2.0])
+        expected = [self.L.log_prob(X=X[i], a=a[i], b=b[i]) for i in range(3)]
+        self.assertTrue(numpy.all(self.L.log_prob_batch(X=X, a=a, b=b) == expected))
+
+        self.L.fix_variables(X=X[0], b=3.0)
+        self.assertTrue(numpy.all(self.L.log_prob_batch(a=a) == 14.0 * 9.0 * a))
+        self.assertRaises(ValueError, self.L.log_prob_batch, a=a, b=b[:2])
+
+    def testEvaluate_log_prob_and_gradient_batch(self):
+
+        batch = dict(X=numpy.ones((3, 2)), a=numpy.array([2.0, 1.0, 0.5]),
+                     b=numpy.array([3.0, 1.0, 2.0]))
+        fwm = self.L.forward_model
+        calls = []
+        call_batch = fwm._call_batch
+        def counting(n, variables):
+            calls.append(n)
+            return call_batch(n, variables)
+        fwm._call_batch = counting
+
+        log_probs, gradients = self.L.log_prob_and_gradient_batch(**batch)
+        self.assertEqual(calls, [3])
+        self.assertTrue(numpy.allclose(log_probs, self.L.log_prob_batch(**batch)))
+        self.assertTrue(numpy.allclose(gradients, self.L.gradient_batch(**batch)))
+
+    def testEvaluate_gradient_batch(self):
+
+        X = numpy.ones((3, 2))
+        a = numpy.array([2.0, 1.0, 0.5])
+        b = numpy.array([3.0, 1.0, 2.0])
+        result = self.L.gradient_batch(X=X, a=a, b=b)
+        self.assertEqual(result.shape, (3, 2))
+        for i in range(3):
+            expected = self.L.gradient(X=X[i], a=a[i], b=b[i])
+            self.assertTrue(numpy.all(result[i] == expected))
+
         
 if __name__ == '__main__':
 
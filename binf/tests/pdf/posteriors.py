@@ -0,0 +1,324 @@
+'''
+'''
+import unittest, numpy
+
+from csb.statistics.pdf.parameterized import Parameter
+
+from binf import ArrayParameter
+from binf.pdf.priors import AbstractPrior
+from binf.pdf.posteriors import Posterior
+from binf.pdf.packing import VariablePacker
+from binf.pdf.likelihoods import Likelihood
+from binf.pdf.executors import SerialExecutor, ThreadPoolExecutor
+from binf.pdf.executors import ProcessPoolExecutor
+from binf.tests.pdf.likelihoods import MockForwardModel, MockErrorModel
+
+
+class MockPrior(AbstractPrior):
+
+    def __init__(self, name, variable, k, param_type=ArrayParameter):
+
+        super(MockPrior, self).__init__(name)
+
+        self.k = k
+        self.variable = variable
+        self._register_variable(variable, differentiable=True)
+        self.update_var_param_types(**{variable: param_type})
+        self._set_original_variables()
+
+    def _evaluate_log_prob(self, **variables):
+
+        return -0.5 * numpy.sum(self.k * variables[self.variable] ** 2)
+
+    def _evaluate_gradient(self, **variables):
+
+        return self.k * variables[self.variable]
+
+    def clone(self):
+
+        copy = self.__class__(self.name, self.variable, self.k)
+        copy.set_fixed_variables_from_pdf(self)
+
+        return copy
+
+
+def make_posterior():
+
+    return Posterior({}, {'x_prior': MockPrior('x_prior', 'x', 2.0),
+                          'y_prior': MockPrior('y_prior', 'y', 3.0, Parameter)})
+
+
+class testVariablePacker(unittest.TestCase):
+
+    def testRavel_unravel(self):
+
+        packer = VariablePacker.from_variables(b=numpy.ones((2, 2)), a=3.0)
+        self.assertEqual(packer.names, ('a', 'b'))
+        self.assertEqual(packer.size, 5)
+
+        x = packer.ravel({'a': 2.0, 'b': numpy.arange(4.0).reshape(2, 2)})
+        self.assertTrue(numpy.all(x == numpy.array([2.0, 0.0, 1.0, 2.0, 3.0])))
+
+        unpacked = packer.unravel(x)
+        self.assertEqual(unpacked['a'], 2.0)
+        self.assertEqual(unpacked['b'].shape, (2, 2))
+        unpacked['b'][0, 0] = 7.0
+        self.assertEqual(x[1], 7.0)
+
+    def testMatches(self):
+
+        packer = VariablePacker.from_variables(a=3.0, b=numpy.ones(2))
+        self.assertTrue(packer.matches({'a': 1.0, 'b': numpy.zeros(2)}))
+        self.assertFalse(packer.matches({'a': 1.0, 'b': numpy.zeros(3)}))
+        self.assertFalse(packer.matches({'a': 1.0}))
+
+
+class testPosterior(unittest.TestCase):
+
+    def testJoint_gradient(self):
+
+        P = make_posterior()
+        grad = P.gradient(x=numpy.array([1.0, 2.0]), y=1.5)
+        self.assertTrue(numpy.all(grad == numpy.array([2.0, 4.0, 4.5])))
+
+    def testLog_prob_and_gradient(self):
+
+        P = make_posterior()
+        log_prob, grad = P.log_prob_and_gradient(x=numpy.array([1.0, 2.0]), y=1.5)
+        self.assertEqual(log_prob, P.log_prob(x=numpy.array([1.0, 2.0]), y=1.5))
+        self.assertTrue(numpy.all(grad == numpy.array([2.0, 4.0, 4.5])))
+
+    def testGradient_out(self):
+
+        P = make_posterior()
+        variables = dict(x=numpy.array([1.0, 2.0]), y=1.5)
+        out = numpy.empty(3)
+        self.assertTrue(P.gradient(out=out, **variables) is out)
+        self.assertTrue(numpy.all(out == numpy.array([2.0, 4.0, 4.5])))
+
+        out = numpy.empty(2)
+        cond = P.conditional_view(y=1.5)
+        log_prob, grad = cond.log_prob_and_gradient(out=out, x=variables['x'])
+        self.assertTrue(grad is out)
+        self.assertEqual(log_prob, P.log_prob(**variables))
+        self.assertTrue(numpy.all(out == numpy.array([2.0, 4.0])))
+
+    def testFlat_evaluation(self):
+
+        P = make_posterior()
+        packer = P.setup_packer(x=numpy.zeros(2), y=0.0)
+        x = packer.ravel({'x': numpy.array([1.0, 2.0]), 'y': 1.5})
+
+        self.assertEqual(P.log_prob_flat(x), P.log_prob(x=x[:2], y=1.5))
+        out = numpy.empty(3)
+        grad = P.gradient_flat(x, out=out)
+        self.assertTrue(grad is out)
+        self.assertTrue(numpy.all(out == numpy.array([2.0, 4.0, 4.5])))
+        self.assertRaises(ValueError, P.setup_packer, x=numpy.zeros(2))
+
+    def testLog_prob_batch(self):
+
+        P = make_posterior()
+        xs = numpy.random.normal(size=(4, 2))
+        ys = numpy.random.normal(size=4)
+        expected = [P.log_prob(x=x, y=y) for x, y in zip(xs, ys)]
+        self.assertTrue(numpy.allclose(P.log_prob_batch(x=xs, y=ys), expected))
+
+        cond = P.conditional_factory(y=2.0)
+        expected = [cond.log_prob(x=x) for x in xs]
+        self.assertTrue(numpy.allclose(cond.log_prob_batch(x=xs), expected))
+
+    def testGradient_batch(self):
+
+        P = make_posterior()
+        xs = numpy.random.normal(size=(4, 2))
+        ys = numpy.random.normal(size=4)
+        result = P.gradient_batch(x=xs, y=ys)
+        self.assertEqual(result.shape, (4, 3))
+        self.assertTrue(numpy.allclose(result[:, :2], 2.0 * xs))
+        self.assertTrue(numpy.allclose(result[:, 2], 3.0 * ys))
+
+    def testLog_prob_and_gradient_batch(self):
+
+        P = make_posterior()
+        xs = numpy.random.normal(size=(4, 2))
+        ys = numpy.random.normal(size=4)
+        log_probs, gradients = P.log_prob_and_gradient_batch(x=xs, y=ys)
+        self.assertTrue(numpy.allclose(log_probs, P.log_prob_batch(x=xs, y=ys)))
+        self.assertTrue(numpy.allclose(gradients, P.gradient_batch(x=xs, y=ys)))
+
+        view = P.conditional_view(y=2.0)
+        log_probs, gradients = view.log_prob_and_gradient_batch(x=xs)
+        self.assertTrue(numpy.allclose(log_probs, view.log_prob_batch(x=xs)))
+        self.assertTrue(numpy.allclose(gradients, 2.0 * xs))
+
+    def testIncremental_evaluation(self):
+
+        P = make_posterior()
+        P.incremental = True
+        x = numpy.array([1.0, 2.0])
+        self.assertEqual(P.log_prob(x=x, y=1.5), -5.0 - 3.375)
+        self.assertEqual(P.incremental_stats, (0, 2))
+        self.assertEqual(P.log_prob(x=x.copy(), y=0.5), -5.0 - 0.375)
+        self.assertEqual(P.incremental_stats, (1, 3))
+
+        cond = P.conditional_factory(y=0.5)
+        self.assertTrue(cond.incremental)
+        cond.log_prob(x=x)
+        cond['y'].set(1.5)
+        self.assertEqual(cond.log_prob(x=x), -5.0 - 3.375)
+        self.assertEqual(cond.incremental_stats, (1, 3))
+
+        ## variables are compared by content, so that arrays modified
+        ## in place are evaluated anew
+        x[0] = 0.0
+        self.assertEqual(P.log_prob(x=x, y=0.5), -4.0 - 0.375)
+        self.assertEqual(P.incremental_stats, (2, 4))
+        P.priors['x_prior']._bump_version()
+        P.log_prob(x=x, y=0.5)
+        self.assertEqual(P.incremental_stats, (3, 5))
+
+    def testTempering(self):
+
+        P = Posterior({'L': MockPrior('L', 'x', 3.0)},
+                      {'x_prior': MockPrior('x_prior', 'x', 2.0)})
+        x = numpy.array([1.0, 2.0])
+        P.beta = 0.5
+        self.assertEqual(P.log_prob(x=x), -0.5 * 3.5 * 5.0)
+        self.assertEqual(P.log_likelihood(x=x), -0.5 * 3.0 * 5.0)
+        self.assertTrue(numpy.all(P.gradient(x=x) == 3.5 * x))
+        log_prob, grad = P.log_prob_and_gradient(x=x)
+        self.assertEqual(log_prob, -0.5 * 3.5 * 5.0)
+        self.assertTrue(numpy.all(grad == 3.5 * x))
+        X = numpy.array([x, 2 * x])
+        self.assertTrue(numpy.allclose(P.log_prob_batch(x=X),
+                                       [-8.75, -35.0]))
+        self.assertTrue(numpy.all(P.gradient_batch(x=X) == 3.5 * X))
+        self.assertTrue(numpy.allclose(P.log_likelihood_batch(x=X),
+                                       [-7.5, -30.0]))
+        self.assertEqual(P.clone().beta, 0.5)
+        self.assertEqual(P.conditional_factory().beta, 0.5)
+
+    def testGradient_buffers(self):
+
+        P = Posterior({'L': MockPrior('L', 'x', 3.0)},
+                      {'x_prior': MockPrior('x_prior', 'x', 2.0)})
+        P.beta = 0.5
+        x = numpy.array([1.0, 2.0])
+        P.gradient(x=x)
+        buffers = dict(P._gradient_buffers)
+        self.assertEqual(sorted(buffers), ['L', 'x_prior'])
+        ## component gradients are written into and weighed in the
+        ## same buffers in each evaluation
+        self.assertTrue(numpy.all(P.gradient(x=2 * x) == 7.0 * x))
+        self.assertTrue(numpy.all(P.log_prob_and_gradient(x=x)[1] == 3.5 * x))
+        self.assertTrue(all(P._gradient_buffers[name] is buffers[name]
+                            for name in buffers))
+        self.assertTrue(numpy.all(buffers['L'] == 1.5 * x))
+
+    def testConditional_view_version(self):
+
+        P = make_posterior()
+        view = P.conditional_view(y=1.5)
+        own_version = view._version
+        for _ in range(3):
+            P._bump_version()
+        view._bump_version()
+        self.assertEqual(view._version, own_version + 1)
+        self.assertEqual(view.version, own_version + 1 + P.version)
+        P._bump_version()
+        self.assertEqual(view.version, own_version + 1 + P.version)
+
+    def testConditional_view(self):
+
+        P = make_posterior()
+        x = numpy.array([1.0, 2.0])
+        view = P.conditional_view(y=1.5, z=3.0)
+        cond = P.conditional_factory(y=1.5)
+        self.assertEqual(view.variables, set(['x']))
+        self.assertEqual(list(view.parameters), ['y'])
+        self.assertTrue(view.priors is P.priors)
+        self.assertEqual(view.log_prob(x=x), cond.log_prob(x=x))
+        self.assertTrue(numpy.all(view.gradient(x=x) == cond.gradient(x=x)))
+        log_prob, grad = view.log_prob_and_gradient(x=x)
+        self.assertEqual(log_prob, cond.log_prob(x=x))
+        self.assertTrue(numpy.all(grad == numpy.array([2.0, 4.0])))
+
+        view['y'].set(0.5)
+        self.assertEqual(view.log_prob(x=x), -5.0 - 0.375)
+        xs = numpy.random.normal(size=(3, 2))
+        self.assertTrue(numpy.allclose(view.gradient_batch(x=xs), 2.0 * xs))
+        self.assertTrue(numpy.allclose(view.log_prob_batch(x=xs),
+                                       [view.log_prob(x=x) for x in xs]))
+
+    def testThreadPoolExecutor(self):
+
+        P = make_posterior()
+        x, y = numpy.array([1.0, 2.0]), 1.5
+        expected = P.log_prob(x=x, y=y), P.gradient(x=x, y=y)
+
+        executor = ThreadPoolExecutor(n_workers=2)
+        P.executor = executor
+        self.assertEqual(P.log_prob(x=x, y=y), expected[0])
+        self.assertTrue(numpy.all(P.gradient(x=x, y=y) == expected[1]))
+        log_prob, grad = P.log_prob_and_gradient(x=x, y=y)
+        self.assertEqual(log_prob, expected[0])
+        self.assertTrue(numpy.all(grad == expected[1]))
+        executor.shutdown()
+
+        timings = P.component_timings
+        self.assertEqual(sorted(timings.keys()), ['x_prior', 'y_prior'])
+        self.assertEqual(timings['x_prior'][0], 3)
+        self.assertEqual(executor.wall_time[0], 3)
+
+    def testProcessPoolExecutor(self):
+
+        L = Likelihood('L', MockForwardModel(), MockErrorModel())
+        L.fix_variables(a=2.0)
+        P = Posterior({'L': L}, {'x_prior': MockPrior('x_prior', 'x', 2.0)})
+        variables = dict(X=numpy.array([1.2, 4.2]), b=3.0, x=numpy.ones(2))
+        expected = P.log_prob(**variables)
+        expected_gradient = P.gradient(**variables)
+
+        executor = ProcessPoolExecutor(n_workers=2)
+        P.executor = executor
+        try:
+            self.assertEqual(executor.assignment, {'L': 0})
+            self.assertEqual(P.log_prob(**variables), expected)
+            self.assertTrue(numpy.all(P.gradient(**variables) ==
+                                      expected_gradient))
+            P['a'].set(5.0)
+            self.assertEqual(P.log_prob(**variables), 630.0 - 2.0)
+            self.assertEqual(P.component_timings['L'][0], 2)
+            self.assertEqual(P.component_timings['x_prior'][0], 3)
+        finally:
+            executor.shutdown()
+
+    def testProcessPoolExecutor_failure(self):
+
+        components = {'a': MockPrior('a', 'x', 2.0), 'b': MockPrior('b', 'x', 3.0)}
+        x = numpy.ones(2)
+        for remote in (['a', 'b'], ['b']):
+            executor = ProcessPoolExecutor(n_workers=2, remote=remote)
+            executor.setup(components)
+            try:
+                self.assertRaises((RuntimeError, AttributeError), executor.map,
+                                  [('a', 'unknown', (), {}),
+                                   ('b', 'log_prob', (), {'x': x})])
+                self.assertEqual(executor.map([('b', 'log_prob', (), {'x': 2 * x})]),
+                                 [-12.0])
+            finally:
+                executor.shutdown()
+
+    def testSerialExecutor(self):
+
+        P = make_posterior()
+        self.assertEqual(P.component_timings, {})
+        P.executor = SerialExecutor()
+        P.log_prob_batch(x=numpy.ones((3, 2)), y=numpy.ones(3))
+        self.assertEqual(P.component_timings['y_prior'][0], 1)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
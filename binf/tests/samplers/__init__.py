@@ -1,2 +1,95 @@
 '''
 '''
+import unittest, numpy
+
+from binf.samplers import BinfState
+
+
+class testBinfState(unittest.TestCase):
+
+    def _create_state(self):
+
+        return BinfState({'x': numpy.array([1.0, 2.0]), 'y': 3.0})
+
+    def testVariables(self):
+
+        state = self._create_state()
+        variables = state.variables
+
+        self.assertEqual(variables['y'], 3.0)
+        self.assertTrue(numpy.all(variables['x'] == numpy.array([1.0, 2.0])))
+        self.assertFalse(variables['x'].flags.writeable)
+        self.assertEqual(state['y'], 3.0)
+        self.assertTrue(state['x'] is variables['x'])
+
+    def testUpdate_variables(self):
+
+        state = self._create_state()
+        x = state['x']
+        state.update_variables(x=numpy.array([4.0, 5.0]), y=6.0)
+
+        self.assertTrue(numpy.all(x == numpy.array([4.0, 5.0])))
+        self.assertEqual(state['y'], 6.0)
+        self.assertTrue(numpy.all(state.buffer == numpy.array([4.0, 5.0, 6.0])))
+
+        state.update_variables(x=numpy.ones(3), z=1.0)
+        self.assertEqual(state.names, ('x', 'y', 'z'))
+        self.assertTrue(numpy.all(state['x'] == numpy.ones(3)))
+        self.assertEqual(state['y'], 6.0)
+
+    def testShared_layout(self):
+
+        state1 = self._create_state()
+        state2 = self._create_state()
+
+        self.assertTrue(state1.layout is state2.layout)
+        self.assertTrue(state1.snapshot().layout is state1.layout)
+
+    def testBounded_layouts(self):
+
+        from binf.samplers import _layouts, MAX_LAYOUTS
+
+        state = self._create_state()
+        for i in range(2 * MAX_LAYOUTS):
+            BinfState({'x': numpy.zeros(i + 3)})
+            self._create_state()
+        self.assertEqual(len(_layouts), MAX_LAYOUTS)
+        ## recently used layouts are kept
+        self.assertTrue(self._create_state().layout is state.layout)
+        ## evicted layouts stay valid for the states using them
+        self.assertEqual(state['y'], 3.0)
+
+    def testSnapshot(self):
+
+        from copy import deepcopy
+
+        state = self._create_state()
+        snapshot = state.snapshot()
+        copied = deepcopy(state)
+        state.update_variables(x=numpy.zeros(2))
+
+        self.assertTrue(numpy.all(snapshot['x'] == numpy.array([1.0, 2.0])))
+        self.assertTrue(numpy.all(copied['x'] == numpy.array([1.0, 2.0])))
+
+    def testCopy_into(self):
+
+        state = self._create_state()
+        buffer = numpy.zeros((2, state.layout.size))
+        state.copy_into(buffer[1])
+
+        self.assertTrue(numpy.all(buffer[0] == 0.0))
+        self.assertTrue(numpy.all(buffer[1] == numpy.array([1.0, 2.0, 3.0])))
+
+    def testPickle(self):
+
+        import pickle
+
+        state = pickle.loads(pickle.dumps(self._create_state()))
+
+        self.assertEqual(state['y'], 3.0)
+        self.assertTrue(numpy.all(state['x'] == numpy.array([1.0, 2.0])))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
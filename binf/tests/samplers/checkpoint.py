@@ -0,0 +1,94 @@
+import os, unittest, numpy
+
+from binf.samplers import BinfState
+from binf.samplers.gibbs import GibbsSampler
+from binf.samplers.hmc import HMCSampler
+from binf.samplers.checkpoint import Checkpointer, save_checkpoint
+from binf.samplers.checkpoint import load_checkpoint
+
+
+def make_sampler():
+
+    from binf.pdf.posteriors import Posterior
+    from binf.tests.pdf.posteriors import MockPrior
+
+    posterior = Posterior({}, {'x_prior': MockPrior('x_prior', 'x', 2.0),
+                               'y_prior': MockPrior('y_prior', 'y', 3.0)})
+    subsamplers = {'x': HMCSampler(None, None, 0.1, 5, 100, variable_name='x'),
+                   'y': HMCSampler(None, None, 0.1, 5, 100, variable_name='y')}
+
+    return GibbsSampler(posterior,
+                        BinfState({'x': numpy.ones(2), 'y': numpy.ones(1)}),
+                        subsamplers)
+
+
+class testCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+
+        import tempfile
+
+        handle, self.filename = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+
+        os.remove(self.filename)
+
+    def _run(self, sampler, n):
+
+        return [sampler.sample().snapshot() for _ in range(n)]
+
+    def testResume(self):
+
+        numpy.random.seed(42)
+        gips = make_sampler()
+        self._run(gips, 5)
+        save_checkpoint(gips, self.filename, 5)
+        expected = self._run(gips, 5)
+
+        numpy.random.seed(1)
+        resumed_gips = make_sampler()
+        self.assertEqual(load_checkpoint(resumed_gips, self.filename), 5)
+        resumed = self._run(resumed_gips, 5)
+
+        for s1, s2 in zip(expected, resumed):
+            self.assertTrue(numpy.all(s1.buffer == s2.buffer))
+        for var in ('x', 'y'):
+            sampler = gips.subsamplers[var]
+            resumed_sampler = resumed_gips.subsamplers[var]
+            self.assertEqual(sampler.timestep, resumed_sampler.timestep)
+            self.assertEqual(sampler.counter, resumed_sampler.counter)
+            self.assertEqual(sampler.n_accepted, resumed_sampler.n_accepted)
+
+    def testCheckpointer(self):
+
+        numpy.random.seed(42)
+        gips = make_sampler()
+        checkpointer = Checkpointer(gips, self.filename, interval=3)
+        written = [checkpointer.step() for _ in range(7)]
+        self.assertEqual(written, [False, False, True, False, False, True, False])
+
+        checkpointer = Checkpointer(make_sampler(), self.filename)
+        self.assertEqual(checkpointer.resume(), 6)
+
+    def testReplace_file_without_os_replace(self):
+
+        ## Python 2.7 has no os.replace
+        replace = getattr(os, 'replace', None)
+        if replace is not None:
+            del os.replace
+        try:
+            gips = make_sampler()
+            save_checkpoint(gips, self.filename, 1)
+            save_checkpoint(gips, self.filename, 2)
+        finally:
+            if replace is not None:
+                os.replace = replace
+        self.assertEqual(load_checkpoint(make_sampler(), self.filename), 2)
+        self.assertFalse(os.path.exists(self.filename + '.tmp'))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest, numpy
+
+from binf.samplers import BinfState
+from binf.samplers.gibbs import GibbsSampler
+from binf.samplers.hmc import HMCSampler, MultiChainHMCSampler
+from binf.samplers.evidence import ThermodynamicIntegration
+from binf.samplers.evidence import AnnealedImportanceSampling
+
+
+def make_sampler():
+
+    from binf.pdf.posteriors import Posterior
+    from binf.tests.pdf.posteriors import MockPrior
+
+    ## with a standard normal prior and an unnormalized Gaussian
+    ## "likelihood" of precision 3, the evidence is 1 / 4
+    posterior = Posterior({'L': MockPrior('L', 'x', 3.0)},
+                          {'x_prior': MockPrior('x_prior', 'x', 1.0)})
+    subsamplers = {'x': HMCSampler(None, None, 0.2, 5, variable_name='x')}
+
+    return GibbsSampler(posterior, BinfState({'x': numpy.zeros(2)}),
+                        subsamplers)
+
+
+class testThermodynamicIntegration(unittest.TestCase):
+
+    def testRun(self):
+
+        numpy.random.seed(42)
+        sampler = make_sampler()
+        ti = ThermodynamicIntegration(sampler, numpy.linspace(0, 1, 11) ** 2,
+                                      200, n_burnin=20, thin=2)
+        log_Z = ti.run()
+        self.assertEqual(ti.log_likelihoods.shape, (11, 200))
+        self.assertEqual(sampler.pdf.beta, 1.0)
+        self.assertAlmostEqual(log_Z, numpy.log(0.25), delta=0.15)
+        self.assertTrue(ti.standard_error > 0.0)
+
+    def testQuadrature(self):
+
+        ti = ThermodynamicIntegration(make_sampler(), [0.0, 0.5, 1.0], 2)
+        ti._log_likelihoods = numpy.array([[1.0, 3.0], [4.0, 4.0], [0.0, 2.0]])
+        self.assertEqual(ti.log_evidence, 0.25 * 2.0 + 0.5 * 4.0 + 0.25 * 1.0)
+
+    def testInvalid_betas(self):
+
+        for betas in ([0.0, 0.5], [0.1, 1.0], [0.0, 0.6, 0.4, 1.0],
+                      [0.0, 0.0, 1.0], [1.0]):
+            self.assertRaises(ValueError, ThermodynamicIntegration,
+                              make_sampler(), betas, 10)
+            self.assertRaises(ValueError, AnnealedImportanceSampling,
+                              make_sampler(), betas)
+
+
+class testAnnealedImportanceSampling(unittest.TestCase):
+
+    def testRun(self):
+
+        numpy.random.seed(42)
+        sampler = make_sampler()
+        ais = AnnealedImportanceSampling(sampler,
+                                         numpy.linspace(0, 1, 11) ** 2)
+        particles = [BinfState({'x': numpy.random.normal(size=2)})
+                     for _ in range(100)]
+        log_Z = ais.run(particles)
+        self.assertEqual(sampler.pdf.beta, 1.0)
+        self.assertEqual(len(ais.states), 100)
+        self.assertEqual(ais.log_weights.shape, (100,))
+        self.assertAlmostEqual(log_Z, numpy.log(0.25), delta=0.15)
+        self.assertTrue(1.0 < ais.effective_sample_size <= 100.0)
+
+    def testRun_batched(self):
+
+        numpy.random.seed(42)
+        posterior = make_sampler().pdf
+        particles = numpy.random.normal(size=(100, 2))
+        sampler = MultiChainHMCSampler(posterior, particles, 0.2, 5,
+                                       variable_name='x')
+        ais = AnnealedImportanceSampling(sampler,
+                                         numpy.linspace(0, 1, 11) ** 2)
+        log_Z = ais.run(particles)
+        self.assertEqual(posterior.beta, 1.0)
+        self.assertEqual(ais.states.shape, (100, 2))
+        self.assertEqual(ais.log_weights.shape, (100,))
+        self.assertAlmostEqual(log_Z, numpy.log(0.25), delta=0.15)
+        self.assertTrue(1.0 < ais.effective_sample_size <= 100.0)
+
+    def testAdapting_sampler(self):
+
+        sampler = make_sampler()
+        sampler.subsamplers['x'].timestep_adaption_limit = 10
+        ais = AnnealedImportanceSampling(sampler, [0.0, 1.0])
+        particles = [BinfState({'x': numpy.zeros(2)})]
+        self.assertRaises(ValueError, ais.run, particles)
+
+        sampler.subsamplers['x'].counter = 9
+        ais.run(particles)
+
+        sampler = MultiChainHMCSampler(make_sampler().pdf, numpy.zeros((3, 2)),
+                                       0.2, 5, timestep_adaption_limit=10,
+                                       variable_name='x')
+        ais = AnnealedImportanceSampling(sampler, [0.0, 1.0])
+        self.assertRaises(ValueError, ais.run, numpy.zeros((3, 2)))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -69,6 +69,32 @@ class testGibbsSampler(unittest.TestCase):
         gips._update_conditional_pdf_params()
         self.assertEqual(gips._conditional_pdfs['y']['x'].value, 5.0)
 
+    def testPush_variable(self):
+
+        gips = self._create_sampler()
+        pdf = gips._conditional_pdfs['y']
+        value, version = pdf['x'].value, pdf.version
+
+        gips._push_variable('x', 2.0)
+        self.assertTrue(pdf['x'].value is value)
+        self.assertEqual(pdf.version, version)
+
+        gips._push_variable('x', 4.0)
+        self.assertEqual(pdf['x'].value, 4.0)
+        self.assertEqual(pdf.version, version + 1)
+
+    def testDependency_graph(self):
+
+        from binf.tests.pdf.posteriors import make_posterior
+
+        gips = self._create_sampler()
+        self.assertEqual(gips._dependents['x'], [gips._conditional_pdfs['y']])
+        
+        gips = GibbsSampler(make_posterior(),
+                            BinfState({'x': numpy.ones(2), 'y': 3.0}),
+                            {'x': MockSampler('x'), 'y': MockSampler('y')})
+        self.assertEqual(gips._dependents, {'x': [], 'y': []})
+
     def testUpdate_samplers(self):
 
         gips = self._create_sampler()
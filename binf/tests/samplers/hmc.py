@@ -0,0 +1,269 @@
+import unittest, numpy
+
+from binf.samplers.hmc import HMCSampler, MultiChainHMCSampler
+from binf.samplers.adaptation import WarmupSchedule, DualAveragingAdapter
+from binf.samplers.adaptation import MassMatrixAdapter, WelfordEstimator
+from binf.samplers.metrics import DiagonalMetric, DenseMetric
+
+
+class testHMCSampler(unittest.TestCase):
+
+    def _create_sampler(self, adapter=None, k=2.0, **kwargs):
+
+        from binf.pdf.posteriors import Posterior
+        from binf.tests.pdf.posteriors import MockPrior
+
+        posterior = Posterior({}, {'x_prior': MockPrior('x_prior', 'x', k),
+                                   'y_prior': MockPrior('y_prior', 'y', 3.0)})
+        pdf = posterior.conditional_view(y=numpy.ones(1))
+        sampler = HMCSampler(pdf, numpy.ones(2), 0.1, 5, variable_name='x',
+                             adapter=adapter, **kwargs)
+
+        calls = []
+        evaluate = sampler._potential_and_gradient
+        def counting(q, out=None):
+            calls.append(q.copy())
+            return evaluate(q, out)
+        sampler._potential_and_gradient = counting
+
+        return sampler, calls
+
+    def testReuse_potential_and_gradient(self):
+
+        sampler, calls = self._create_sampler()
+        for _ in range(4):
+            sampler.sample()
+        ## one evaluation at the initial state, one at the end
+        ## of each trajectory
+        self.assertEqual(len(calls), 5)
+
+        sampler.state = sampler.state + 1.0
+        sampler.sample()
+        self.assertEqual(len(calls), 7)
+
+        sampler.pdf['y'].set(numpy.zeros(1))
+        sampler.sample()
+        self.assertEqual(len(calls), 9)
+
+        sampler.invalidate_cache()
+        sampler.sample()
+        self.assertEqual(len(calls), 11)
+
+        sampler.pdf._bump_version()
+        sampler.sample()
+        self.assertEqual(len(calls), 13)
+
+        ## setting a parameter to an equal value replaces its value object
+        sampler.pdf['y'].set(numpy.zeros(1))
+        sampler.sample()
+        self.assertEqual(len(calls), 15)
+
+    def testTempering_invalidates_cache(self):
+
+        from binf.pdf.posteriors import Posterior
+        from binf.tests.pdf.posteriors import MockPrior
+
+        numpy.random.seed(42)
+        posterior = Posterior({'L': MockPrior('L', 'x', 3.0)},
+                              {'x_prior': MockPrior('x_prior', 'x', 1.0)})
+        sampler = HMCSampler(posterior.conditional_view(), numpy.ones(2),
+                             0.1, 5, variable_name='x')
+        sampler.sample()
+        q = sampler.state
+        posterior.beta = 0.0
+        E_pot, grad = sampler._cached_potential_and_gradient_at(q)
+        self.assertAlmostEqual(E_pot, 0.5 * numpy.sum(q ** 2))
+        self.assertTrue(numpy.allclose(grad, q))
+
+        multi = MultiChainHMCSampler(posterior.conditional_view(),
+                                     numpy.ones((2, 2)), 0.1, 5,
+                                     variable_name='x')
+        multi.sample()
+        Q = multi.states
+        posterior.beta = 1.0
+        E_pots, grads = multi._cached_potentials_and_gradients_at(Q)
+        self.assertTrue(numpy.allclose(E_pots, 2.0 * numpy.sum(Q ** 2, 1)))
+        self.assertTrue(numpy.allclose(grads, 4.0 * Q))
+
+    def testDual_averaging(self):
+
+        numpy.random.seed(42)
+        adapter = DualAveragingAdapter(100)
+        sampler, _ = self._create_sampler(adapter)
+        for _ in range(99):
+            sampler.sample()
+        self.assertTrue(sampler.last_draw_stats['x'].adapting)
+        sampler.sample()
+        self.assertFalse(sampler.last_draw_stats['x'].adapting)
+
+        timestep = sampler.timestep
+        sampler.sample()
+        self.assertEqual(sampler.timestep, timestep)
+        self.assertEqual(sampler.last_draw_stats['x'].stepsize, timestep)
+
+    def testMass_matrix_adaptation(self):
+
+        numpy.random.seed(42)
+        schedule = WarmupSchedule(500)
+        for dense in (False, True):
+            sampler, _ = self._create_sampler(
+                DualAveragingAdapter(500, schedule=schedule),
+                k=numpy.array([1.0, 100.0]),
+                mass_matrix_adapter=MassMatrixAdapter(500, dense, schedule))
+            for _ in range(500):
+                sampler.sample()
+            variances = sampler.metric.inv_mass
+            if dense:
+                self.assertTrue(isinstance(sampler.metric, DenseMetric))
+                variances = numpy.diag(variances)
+            else:
+                self.assertTrue(isinstance(sampler.metric, DiagonalMetric))
+            ratio = variances / numpy.array([1.0, 0.01])
+            self.assertTrue(numpy.all((ratio > 0.5) & (ratio < 2.0)))
+
+
+class testMultiChainHMCSampler(unittest.TestCase):
+
+    def _create_pdf(self):
+
+        from binf.pdf.posteriors import Posterior
+        from binf.tests.pdf.posteriors import MockPrior
+
+        posterior = Posterior({}, {'x_prior': MockPrior('x_prior', 'x',
+                                                        numpy.array([1.0, 4.0])),
+                                   'y_prior': MockPrior('y_prior', 'y', 3.0)})
+
+        return posterior.conditional_view(y=numpy.ones(1))
+
+    def testSample(self):
+
+        numpy.random.seed(42)
+        sampler = MultiChainHMCSampler(self._create_pdf(), numpy.zeros((50, 2)),
+                                       [0.1, 0.2] * 25, 7, variable_name='x')
+        samples = numpy.array([sampler.sample() for _ in range(400)])
+        samples = samples[100:].reshape(-1, 2)
+        self.assertTrue(numpy.allclose(samples.mean(0), 0.0, atol=0.05))
+        self.assertTrue(numpy.allclose(samples.var(0), [1.0, 0.25], rtol=0.1))
+
+    def testSingle_chain_matches_HMCSampler(self):
+
+        pdf = self._create_pdf()
+        multi = MultiChainHMCSampler(pdf, numpy.zeros((1, 2)), 0.3, 10,
+                                     variable_name='x')
+        single = HMCSampler(pdf, numpy.zeros(2), 0.3, 10, variable_name='x')
+        numpy.random.seed(3)
+        a = [multi.sample()[0] for _ in range(20)]
+        numpy.random.seed(3)
+        b = [single.sample() for _ in range(20)]
+        self.assertTrue(numpy.array_equal(a, b))
+
+    def testMasks(self):
+
+        numpy.random.seed(42)
+        sampler = MultiChainHMCSampler(self._create_pdf(), numpy.ones((3, 2)),
+                                       [0.1, 0.1, 10.0], 5, variable_name='x',
+                                       timestep_adaption_limit=10)
+        before = sampler.states
+        after = sampler.sample()
+        stats = sampler.last_draw_stats['x']
+        self.assertTrue(stats.accepted[0])
+        self.assertFalse(stats.accepted[2])
+        self.assertTrue(numpy.array_equal(after[2], before[2]))
+        self.assertFalse(numpy.array_equal(after[0], before[0]))
+        self.assertTrue(numpy.allclose(sampler.timestep,
+                                       [0.105, 0.105, 9.5]))
+        self.assertFalse(after.flags.writeable)
+
+    def testCheckpoint(self):
+
+        numpy.random.seed(42)
+        adapters = [DualAveragingAdapter(100) for _ in range(2)]
+        sampler = MultiChainHMCSampler(self._create_pdf(), numpy.ones((2, 2)),
+                                       0.1, 5, variable_name='x',
+                                       adapters=adapters)
+        for _ in range(10):
+            sampler.sample()
+        checkpoint = sampler.checkpoint()
+        numpy.random.seed(1)
+        expected = [sampler.sample() for _ in range(5)]
+        sampler.restore(checkpoint)
+        numpy.random.seed(1)
+        actual = [sampler.sample() for _ in range(5)]
+        self.assertTrue(numpy.array_equal(expected, actual))
+
+
+class testMetrics(unittest.TestCase):
+
+    def testKinetic_energy(self):
+
+        p = numpy.array([1.0, 2.0])
+        inv_mass = numpy.array([[2.0, 0.5], [0.5, 1.0]])
+
+        metric = DiagonalMetric(numpy.diag(inv_mass))
+        self.assertEqual(metric.kinetic_energy(p), 3.0)
+        self.assertTrue(numpy.all(metric.velocity(p) == numpy.array([2.0, 2.0])))
+
+        metric = DenseMetric(inv_mass)
+        self.assertEqual(metric.kinetic_energy(p), 4.0)
+        self.assertTrue(numpy.all(metric.velocity(p) == numpy.array([3.0, 2.5])))
+
+    def testSample_momentum(self):
+
+        numpy.random.seed(42)
+        inv_mass = numpy.array([[2.0, 0.5], [0.5, 1.0]])
+        metric = DenseMetric(inv_mass)
+        p = numpy.array([metric.sample_momentum((2,)) for _ in range(20000)])
+        self.assertTrue(numpy.allclose(numpy.cov(p.T), numpy.linalg.inv(inv_mass),
+                                       atol=0.05))
+
+
+class testWelfordEstimator(unittest.TestCase):
+
+    def testCovariance(self):
+
+        numpy.random.seed(42)
+        x = numpy.random.normal(size=(50, 3))
+        for dense in (False, True):
+            estimator = WelfordEstimator(dense)
+            for sample in x:
+                estimator.update(sample)
+            expected = numpy.cov(x.T)
+            if not dense:
+                expected = numpy.diag(expected)
+            self.assertTrue(numpy.allclose(estimator.covariance(), expected))
+            self.assertTrue(numpy.allclose(estimator.mean, x.mean(0)))
+
+
+class testDualAveragingAdapter(unittest.TestCase):
+
+    def testAdapt(self):
+
+        ## acceptance probability falling off with the time step,
+        ## such that the target is reached for a time step of -log(0.7)
+        adapter = DualAveragingAdapter(1000, target_acceptance=0.7)
+        timestep = 1.0
+        for _ in range(1000):
+            timestep = adapter.adapt(timestep, numpy.exp(-timestep))
+        self.assertFalse(adapter.adapting)
+        self.assertAlmostEqual(timestep, -numpy.log(0.7), delta=0.02)
+        self.assertEqual(adapter.adapt(timestep, 0.0), timestep)
+
+
+class testWarmupSchedule(unittest.TestCase):
+
+    def testWindows(self):
+
+        schedule = WarmupSchedule(1000)
+        self.assertEqual(schedule.window_ends, [100, 150, 250, 450, 950])
+        self.assertFalse(schedule.in_slow_window(75))
+        self.assertTrue(schedule.in_slow_window(76))
+        self.assertTrue(schedule.in_slow_window(950))
+        self.assertFalse(schedule.in_slow_window(951))
+
+        schedule = WarmupSchedule(100)
+        self.assertEqual(schedule.window_ends, [90])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest, numpy
+
+from binf.samplers import BinfState
+from binf.samplers.gibbs import GibbsSampler
+from binf.samplers.nuts import NUTSSampler
+
+
+def make_posterior(k=2.0):
+
+    from binf.pdf.posteriors import Posterior
+    from binf.tests.pdf.posteriors import MockPrior
+
+    return Posterior({}, {'x_prior': MockPrior('x_prior', 'x', k),
+                          'y_prior': MockPrior('y_prior', 'y', 3.0)})
+
+
+class testNUTSSampler(unittest.TestCase):
+
+    def testSample(self):
+
+        numpy.random.seed(42)
+        precisions = numpy.array([1.0, 25.0])
+        pdf = make_posterior(precisions).conditional_view(y=numpy.ones(1))
+        sampler = NUTSSampler(pdf, numpy.ones(2), 0.1, variable_name='x')
+
+        samples = numpy.array([sampler.sample() for _ in range(2000)])
+        stats = sampler.last_draw_stats['x']
+
+        self.assertTrue(numpy.all(numpy.abs(samples.mean(0)) < 0.15))
+        ratio = samples.var(0) * precisions
+        self.assertTrue(numpy.all((ratio > 0.8) & (ratio < 1.2)))
+        self.assertTrue(0 < stats.tree_depth <= 10)
+        self.assertTrue(stats.n_gradients <= 2 ** stats.tree_depth - 1)
+        self.assertEqual(stats.stepsize, 0.1)
+        self.assertFalse(stats.divergent)
+
+    def testMax_tree_depth(self):
+
+        numpy.random.seed(42)
+        pdf = make_posterior().conditional_view(y=numpy.ones(1))
+        sampler = NUTSSampler(pdf, numpy.ones(2), 0.001, max_tree_depth=3,
+                              variable_name='x')
+        sampler.sample()
+
+        stats = sampler.last_draw_stats['x']
+        self.assertEqual(stats.tree_depth, 3)
+        self.assertEqual(stats.n_gradients, 7)
+
+    def testGibbs_subsampler(self):
+
+        numpy.random.seed(42)
+        subsamplers = {v: NUTSSampler(None, None, 0.2, variable_name=v)
+                       for v in ('x', 'y')}
+        gips = GibbsSampler(make_posterior(),
+                            BinfState({'x': numpy.ones(2), 'y': numpy.ones(1)}),
+                            subsamplers)
+        samples = numpy.array([gips.sample().buffer.copy() for _ in range(1000)])
+
+        self.assertTrue(numpy.all(numpy.abs(samples.mean(0)) < 0.15))
+        self.assertEqual(set(gips.last_draw_stats), set(['x', 'y']))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
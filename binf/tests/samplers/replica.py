@@ -0,0 +1,80 @@
+import unittest, numpy
+
+from binf.samplers import BinfState
+from binf.samplers.gibbs import GibbsSampler
+from binf.samplers.hmc import HMCSampler
+from binf.samplers.replica import ReplicaExchangeSampler
+
+
+def make_replicas(betas):
+
+    from binf.pdf.posteriors import Posterior
+    from binf.tests.pdf.posteriors import MockPrior
+
+    ## the "likelihood" is a Gaussian, too, so that the tempered
+    ## posterior has precision 1 + 3 * beta
+    posterior = Posterior({'L': MockPrior('L', 'x', 3.0)},
+                          {'x_prior': MockPrior('x_prior', 'x', 1.0)})
+
+    return [GibbsSampler(posterior, BinfState({'x': numpy.zeros(1)}),
+                         {'x': HMCSampler(None, None, 0.3, 7, variable_name='x')})
+            for _ in betas]
+
+
+class testReplicaExchangeSampler(unittest.TestCase):
+
+    def testSample(self):
+
+        numpy.random.seed(42)
+        betas = [1.0, 0.5, 0.1, 0.0]
+        with ReplicaExchangeSampler(make_replicas(betas), betas, 5) as re:
+            samples = [[s['x'][0] for s in re.sample()] for _ in range(1000)]
+            rates = re.swap_acceptance_rates
+            stats = re.last_draw_stats
+        samples = numpy.array(samples[100:])
+
+        expected = 1.0 / (1.0 + 3.0 * numpy.array(betas))
+        self.assertTrue(numpy.allclose(samples.var(0), expected, rtol=0.2))
+        self.assertEqual(len(rates), 3)
+        self.assertTrue(numpy.all((rates > 0.3) & (rates < 1.0)))
+        self.assertEqual(len(stats['replicas']), 4)
+        self.assertTrue('x' in stats['replicas'][0])
+
+    def testCheckpoint(self):
+
+        numpy.random.seed(42)
+        betas = [1.0, 0.2]
+        with ReplicaExchangeSampler(make_replicas(betas), betas, 3) as re:
+            for _ in range(5):
+                re.sample()
+            checkpoint = re.checkpoint()
+            state = numpy.random.get_state()
+            expected = [[s['x'][0] for s in re.sample()] for _ in range(5)]
+            re.restore(checkpoint)
+            numpy.random.set_state(state)
+            actual = [[s['x'][0] for s in re.sample()] for _ in range(5)]
+        self.assertEqual(expected, actual)
+
+    def testFailure_keeps_workers_in_sync(self):
+
+        numpy.random.seed(42)
+        betas = [1.0, 0.2]
+        with ReplicaExchangeSampler(make_replicas(betas), betas, 2) as re:
+            self.assertRaises(RuntimeError, re._broadcast,
+                              [('unknown', ()), ('checkpoint', ())])
+            states = re.sample()
+            self.assertEqual(len(states), 2)
+            self.assertEqual(len(re.last_draw_stats['replicas']), 2)
+            self.assertTrue('x' in re.last_draw_stats['replicas'][1])
+
+    def testInvalid(self):
+
+        self.assertRaises(ValueError, ReplicaExchangeSampler,
+                          make_replicas([1.0, 0.5]), [1.0])
+        self.assertRaises(ValueError, ReplicaExchangeSampler,
+                          make_replicas([1.0]), [1.0])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest, numpy
+
+from binf.samplers import BinfState, Trace, DiskTrace, TraceReader
+
+
+def record_states(trace, n, **quantities):
+
+    state = BinfState({'x': numpy.zeros(2), 'y': 0.0})
+    for i in range(n):
+        state.update_variables(x=numpy.array([i, -i]), y=float(i))
+        trace.record(state, **quantities)
+
+
+class testTrace(unittest.TestCase):
+
+    def testRecord(self):
+
+        trace = Trace()
+        record_states(trace, 5)
+
+        self.assertEqual(len(trace), 5)
+        self.assertEqual(trace.names, ('x', 'y'))
+        self.assertEqual(trace['x'].shape, (5, 2))
+        self.assertTrue(numpy.all(trace['y'] == numpy.arange(5)))
+        self.assertTrue(numpy.all(trace['x'][:,1] == -numpy.arange(5)))
+        self.assertFalse(trace['y'].flags.writeable)
+
+    def testBurnin_thin(self):
+
+        trace = Trace(burnin=3, thin=2)
+        record_states(trace, 10)
+
+        self.assertEqual(trace.n_seen, 10)
+        self.assertTrue(numpy.all(trace['y'] == numpy.array([3.0, 5.0, 7.0, 9.0])))
+
+    def testGrow(self):
+
+        trace = Trace(chunk_size=2, capacity=1)
+        record_states(trace, 7)
+
+        self.assertEqual(len(trace), 7)
+        self.assertTrue(numpy.all(trace['y'] == numpy.arange(7)))
+
+    def testState(self):
+
+        trace = Trace()
+        record_states(trace, 3)
+        state = trace.state(-1)
+
+        self.assertEqual(state['y'], 2.0)
+        self.assertTrue(numpy.all(state['x'] == numpy.array([2.0, -2.0])))
+        self.assertRaises(IndexError, trace.state, 3)
+
+    def testQuantities(self):
+
+        trace = Trace()
+        record_states(trace, 3, log_prob=-1.0)
+
+        self.assertEqual(trace.names, ('x', 'y', 'log_prob'))
+        self.assertEqual(sorted(trace.variables.keys()), ['x', 'y'])
+        self.assertTrue(numpy.all(trace.quantities['log_prob'] == -1.0))
+        self.assertRaises(ValueError, record_states, Trace(), 1, y=1.0)
+
+
+class testDiskTrace(unittest.TestCase):
+
+    def setUp(self):
+
+        import tempfile
+
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        import shutil
+
+        shutil.rmtree(self.path)
+
+    def testRecord(self):
+
+        trace = DiskTrace(self.path, burnin=1, chunk_size=2)
+        record_states(trace, 6, log_prob=-2.0)
+        trace.flush(wait=True)
+        reader = TraceReader(self.path)
+
+        self.assertEqual(len(reader), 5)
+        self.assertTrue(numpy.all(reader['y'] == numpy.arange(1, 6)))
+        self.assertEqual(reader['x'].shape, (5, 2))
+        self.assertTrue(isinstance(reader['x'], numpy.memmap))
+        self.assertTrue(numpy.all(reader.quantities['log_prob'] == -2.0))
+        self.assertEqual(reader.state(0)['y'], 1.0)
+        trace.close()
+
+    def testRead_while_writing(self):
+
+        with DiskTrace(self.path, chunk_size=4) as trace:
+            record_states(trace, 5)
+            trace._check_pending(wait=True)
+            reader = TraceReader(self.path)
+            self.assertEqual(len(reader), 4)
+            self.assertEqual(len(trace), 5)
+
+        reader.refresh()
+        self.assertEqual(len(reader), 5)
+        self.assertTrue(numpy.all(reader['y'] == numpy.arange(5)))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
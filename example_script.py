@@ -5,10 +5,9 @@ and samplers you would need to implement for your applcation
 """
 
 import numpy as np
-from copy import deepcopy
 import matplotlib.pyplot as plt
 
-from binf.samplers import BinfState
+from binf.samplers import BinfState, Trace
 from binf.example.samplers import make_sampler
 from binf.example.plots import plot_fit, plot_hists
 from binf.example.plots import plot_prediction_tube
@@ -29,17 +28,16 @@ posterior = make_posterior(xses, ys, polynomial)
 
 gips = make_sampler(posterior, 0.1, start)
 
-samples = []
+samples_thin = Trace(burnin=20000, thin=20, capacity=500)
 for i in range(30000):
-    samples.append(deepcopy(gips.sample()))
+    samples_thin.record(gips.sample())
     if i % 500 == 0 and i > 0:
         print "#### Gibbs sampling step {} ####".format(i) 
         print 'RWMC acceptance rate: {}'.format(gips.last_draw_stats['coefficients'].acceptance_rate)
 
 
 
-samples_thin = samples[20000::20]
-log_probs = np.array([posterior.log_prob(**x.variables) for x in samples_thin])
+log_probs = posterior.log_prob_batch(**samples_thin.variables)
 
 fig = plt.figure()
 plot_hists(samples_thin, real_coeffs, real_precision, 30, fig)
@@ -49,7 +47,7 @@ plt.show()
 fig = plt.figure()
 ax = fig.add_subplot(111)
 plot_fit(xses, ys, polynomial, xses, log_probs, samples_thin, real_coeffs, real_precision, ax)
-MAP_coeffs, _ = get_MAP(samples, log_probs)
+MAP_coeffs, _ = get_MAP(samples_thin, log_probs)
 MAP_fit = polynomial(xses, MAP_coeffs)
 plot_prediction_tube(samples_thin, polynomial, xses, 
                      MAP_fit - 10, MAP_fit + 10, 150, ax)